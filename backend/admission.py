@@ -0,0 +1,215 @@
+"""
+Admission control for /ws/realtime
+Caps concurrent relay sessions per worker and per tenant, parks the excess
+in a FIFO waiting room that reports each candidate's position, and sheds
+load when the event loop is running late.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Concurrent sessions per worker process (a node holds WEB_CONCURRENCY times this; 0 = unlimited)
+REALTIME_MAX_SESSIONS = int(os.getenv("REALTIME_MAX_SESSIONS", "200"))
+# Default per-tenant cap and per-tenant overrides ("acme=50,beta=5"); 0 = unlimited
+REALTIME_MAX_SESSIONS_PER_TENANT = int(os.getenv("REALTIME_MAX_SESSIONS_PER_TENANT", "0"))
+REALTIME_TENANT_LIMITS = os.getenv("REALTIME_TENANT_LIMITS", "")
+# Tenants a client may name with ?tenant= / X-Tenant-Id, besides those in
+# REALTIME_TENANT_LIMITS ("acme,beta"); any other name counts as the default tenant
+REALTIME_TENANTS = os.getenv("REALTIME_TENANTS", "")
+REALTIME_WAITING_ROOM_MAX = int(os.getenv("REALTIME_WAITING_ROOM_MAX", "500"))
+REALTIME_WAITING_ROOM_TIMEOUT = float(os.getenv("REALTIME_WAITING_ROOM_TIMEOUT", "120"))
+# How often waiting browsers hear their position (also detects dropped browsers)
+REALTIME_WAITING_ROOM_UPDATE = float(os.getenv("REALTIME_WAITING_ROOM_UPDATE", "2"))
+# Smoothed loop lag above which new sessions wait instead of starting,
+# and above which they are turned away outright
+REALTIME_SHED_LAG_MS = float(os.getenv("REALTIME_SHED_LAG_MS", "150"))
+REALTIME_REJECT_LAG_MS = float(os.getenv("REALTIME_REJECT_LAG_MS", "1000"))
+
+DEFAULT_TENANT = "default"
+
+
+class AdmissionRejected(Exception):
+    """The session cannot be admitted now; the browser should retry later"""
+
+
+def parse_tenant_limits(spec: str) -> Dict[str, int]:
+    """Parse "tenant=N,tenant=N" into {tenant: N}"""
+    limits = {}
+    for item in spec.split(","):
+        tenant, _, limit = item.partition("=")
+        if tenant.strip() and limit.strip().isdigit():
+            limits[tenant.strip()] = int(limit)
+    return limits
+
+
+class _Waiter:
+    def __init__(self, tenant: str):
+        self.tenant = tenant
+        self.enqueued_at = time.monotonic()
+        self.admitted = asyncio.get_running_loop().create_future()
+
+
+class AdmissionController:
+    """
+    admit() returns once the caller holds a session slot; release() gives it
+    back. Waiters are admitted in arrival order, except that one whose
+    tenant is at its cap does not block waiters from other tenants.
+    """
+
+    def __init__(self, lag_monitor=None, max_sessions: int = REALTIME_MAX_SESSIONS,
+                 tenant_limit: int = REALTIME_MAX_SESSIONS_PER_TENANT,
+                 tenant_limits: Optional[Dict[str, int]] = None,
+                 known_tenants: Optional[Iterable[str]] = None,
+                 max_waiting: int = REALTIME_WAITING_ROOM_MAX,
+                 wait_timeout: float = REALTIME_WAITING_ROOM_TIMEOUT,
+                 update_interval: float = REALTIME_WAITING_ROOM_UPDATE,
+                 shed_lag_ms: float = REALTIME_SHED_LAG_MS,
+                 reject_lag_ms: float = REALTIME_REJECT_LAG_MS):
+        self.lag_monitor = lag_monitor
+        self.max_sessions = max_sessions
+        self.tenant_limit = tenant_limit
+        self.tenant_limits = parse_tenant_limits(REALTIME_TENANT_LIMITS) if tenant_limits is None else tenant_limits
+        if known_tenants is None:
+            known_tenants = (t.strip() for t in REALTIME_TENANTS.split(","))
+        self.known_tenants = {t for t in known_tenants if t} | set(self.tenant_limits)
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.update_interval = update_interval
+        self.shed_lag = shed_lag_ms / 1000
+        self.reject_lag = reject_lag_ms / 1000
+        self.active = 0
+        self.tenants: Dict[str, int] = {}
+        self._waiters: Deque[_Waiter] = deque()
+        self._stats = {"admitted": 0, "queued": 0, "queue_admitted": 0, "rejected_full": 0,
+                       "rejected_lag": 0, "timed_out": 0, "abandoned": 0, "unknown_tenants": 0,
+                       "wait_total": 0.0, "wait_max": 0.0}
+
+    def resolve_tenant(self, requested: Optional[str]) -> str:
+        """
+        Tenant a session is admitted under. The name comes from the client,
+        so only configured tenants are honoured; inventing new names would
+        sidestep the per-tenant caps and grow the per-tenant metrics.
+        """
+        if requested and requested in self.known_tenants:
+            return requested
+        if requested and requested != DEFAULT_TENANT:
+            self._stats["unknown_tenants"] += 1
+        return DEFAULT_TENANT
+
+    def limit_for(self, tenant: str) -> int:
+        return self.tenant_limits.get(tenant, self.tenant_limit)
+
+    def overloaded(self) -> bool:
+        """Loop lag says the worker should not take on more sessions right now"""
+        return self.lag_monitor is not None and self.lag_monitor.lag_smoothed >= self.shed_lag
+
+    async def admit(self, tenant: str, on_position: Callable[[int, int], Awaitable[None]]):
+        """
+        Wait for a session slot. on_position(position, waiting) is awaited
+        when the caller joins the line and then every update_interval; if it
+        raises (browser gone) the caller leaves the line and the error
+        propagates. Raises AdmissionRejected when the
+        room is full, the wait times out, or the loop is badly overloaded.
+        """
+        if self.lag_monitor is not None and self.lag_monitor.lag_smoothed >= self.reject_lag:
+            self._stats["rejected_lag"] += 1
+            raise AdmissionRejected(f"server overloaded (loop lag {self.lag_monitor.lag_smoothed * 1000:.0f}ms)")
+        if not self._waiters and self._can_admit(tenant):
+            self._take(tenant)
+            return
+        if len(self._waiters) >= self.max_waiting:
+            self._stats["rejected_full"] += 1
+            raise AdmissionRejected("waiting room full")
+
+        waiter = _Waiter(tenant)
+        self._waiters.append(waiter)
+        self._stats["queued"] += 1
+        deadline = waiter.enqueued_at + self.wait_timeout
+        reported = False
+        try:
+            while True:
+                self._dispatch()
+                if waiter.admitted.done():
+                    break
+                if not reported:
+                    await on_position(self._waiters.index(waiter) + 1, len(self._waiters))
+                    reported = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timed_out"] += 1
+                    raise AdmissionRejected(f"no session slot within {self.wait_timeout:.0f}s")
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter.admitted),
+                                           timeout=min(self.update_interval, remaining))
+                    break
+                except asyncio.TimeoutError:
+                    # Heartbeat: resend the position so a dropped browser is noticed
+                    reported = False
+        except AdmissionRejected:
+            raise
+        except BaseException:
+            # Browser went away (or we were cancelled) while waiting
+            if waiter.admitted.done():
+                self.release(tenant)
+            self._stats["abandoned"] += 1
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+        waited = time.monotonic() - waiter.enqueued_at
+        self._stats["queue_admitted"] += 1
+        self._stats["wait_total"] += waited
+        self._stats["wait_max"] = max(self._stats["wait_max"], waited)
+
+    def release(self, tenant: str):
+        """Give a session slot back and admit whoever can go next"""
+        self.active = max(0, self.active - 1)
+        count = self.tenants.get(tenant, 0) - 1
+        if count > 0:
+            self.tenants[tenant] = count
+        else:
+            self.tenants.pop(tenant, None)
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        queue_admitted = self._stats["queue_admitted"]
+        return {
+            **{k: v for k, v in self._stats.items() if k != "wait_total"},
+            "wait_avg": round(self._stats["wait_total"] / queue_admitted, 3) if queue_admitted else 0.0,
+            "wait_max": round(self._stats["wait_max"], 3),
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "max_sessions": self.max_sessions,
+            "overloaded": int(self.overloaded()),
+            "tenants": dict(self.tenants),
+        }
+
+    def _can_admit(self, tenant: str) -> bool:
+        if self.max_sessions and self.active >= self.max_sessions:
+            return False
+        limit = self.limit_for(tenant)
+        if limit and self.tenants.get(tenant, 0) >= limit:
+            return False
+        return not self.overloaded()
+
+    def _take(self, tenant: str):
+        self.active += 1
+        self.tenants[tenant] = self.tenants.get(tenant, 0) + 1
+        self._stats["admitted"] += 1
+
+    def _dispatch(self):
+        for waiter in list(self._waiters):
+            if self.max_sessions and self.active >= self.max_sessions:
+                return
+            if waiter.admitted.done() or not self._can_admit(waiter.tenant):
+                continue
+            self._waiters.remove(waiter)
+            self._take(waiter.tenant)
+            waiter.admitted.set_result(None)
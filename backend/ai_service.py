@@ -6,16 +6,42 @@ import logging
 import base64
 import re
 import json
+import functools
 import io
-import struct
-from typing import List, Optional, Dict, Any
+import os
+import random
+import time
+from typing import AsyncIterator, List, Optional, Dict, Any
+import httpx
 from openai import AsyncOpenAI
 
+from audio_preprocess import WHISPER_PREPROCESS, prepare_for_whisper
+from input_analyzer import (
+    LocalInputAnalyzer,
+    INPUT_ANALYZER,
+    INPUT_ANALYZER_CALIBRATION_RATE,
+    speaking_pace,
+)
+
 logger = logging.getLogger(__name__)
 
+EMPTY_RESPONSE_TEXT = "I didn't quite catch that. Could you please repeat or elaborate?"
+ERROR_RESPONSE_TEXT = "I apologize, but I'm having trouble processing that. Could we try again?"
+
+# "inline": analyze the answer, then generate the reply (two LLM round trips per turn).
+# "concurrent": analyze while the reply is generated; a result that is not ready within
+# ANALYSIS_WAIT_MS steers the next turn instead of this one.
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "concurrent").lower()
+ANALYSIS_WAIT_MS = float(os.getenv("ANALYSIS_WAIT_MS", "0"))
+
 class AIService:
-    def __init__(self, api_key: str, model: str = "gpt-4o-realtime-preview", voice: str = "alloy"):
-        self.client = AsyncOpenAI(api_key=api_key)
+    def __init__(self, api_key: str, model: str = "gpt-4o-realtime-preview", voice: str = "alloy",
+                 http_client: Optional[httpx.AsyncClient] = None, analysis_mode: str = ANALYSIS_MODE,
+                 analysis_wait_ms: float = ANALYSIS_WAIT_MS, input_analyzer: str = INPUT_ANALYZER,
+                 calibration_rate: float = INPUT_ANALYZER_CALIBRATION_RATE,
+                 preprocess_audio: bool = WHISPER_PREPROCESS):
+        # Reuse the app's pooled connections to api.openai.com when given one
+        self.client = AsyncOpenAI(api_key=api_key, http_client=http_client)
         self.model = model
         self.voice = voice
         self.conversation_history: List[dict] = []
@@ -28,6 +54,24 @@ class AIService:
             "current_area_index": 0
         }
         
+        # Local heuristics by default; the LLM analyzer is optional (or sampled for calibration)
+        self.input_analyzer = input_analyzer if input_analyzer in ("local", "llm") else "local"
+        self.local_analyzer = LocalInputAnalyzer()
+        self.calibration_rate = calibration_rate
+        self._calibrations: set = set()
+        self.analysis_mode = analysis_mode if analysis_mode in ("inline", "concurrent") else "concurrent"
+        self.analysis_wait = analysis_wait_ms / 1000
+        # Latest finished analysis (concurrent mode), the turn it belongs to and the one still running
+        self._last_analysis: Dict[str, Any] = {}
+        self._last_analysis_turn = 0
+        self._analysis_turn = 0
+        self._pending_analysis: Optional[asyncio.Task] = None
+        self._analysis_stats = {"fresh": 0, "carried_over": 0, "analyses": 0, "stale": 0}
+        self._analysis_ms_total = 0.0
+        
+        self.preprocess_audio = preprocess_audio
+        self._uploads = {"turns": 0, "original_bytes": 0, "bytes": 0, "skipped_silent": 0, "trimmed_seconds": 0.0}
+        
         self.available_voices = ["alloy", "echo", "fable", "onyx", "nova", "shimmer"]
         
         if voice not in self.available_voices:
@@ -39,6 +83,11 @@ class AIService:
     def clear_conversation_history(self):
         """Clear conversation history for new interview"""
         self.conversation_history.clear()
+        if self._pending_analysis and not self._pending_analysis.done():
+            self._pending_analysis.cancel()
+        self._pending_analysis = None
+        self._last_analysis = {}
+        self._last_analysis_turn = self._analysis_turn
         self.interview_context.update({
             "current_topic": "introduction",
             "difficulty_level": "beginner",
@@ -52,21 +101,8 @@ class AIService:
         """Generate AI response with conversational context and emotional intelligence"""
         try:
             # Analyze user input for emotional cues and content
-            analysis = await self.analyze_user_input(user_input, audio_duration)
-            
-            # Build dynamic system prompt based on conversation flow
-            system_prompt = self._build_dynamic_system_prompt(analysis)
-            
-            messages = [
-                {"role": "system", "content": system_prompt}
-            ]
-            
-            # Add conversation history
-            messages.extend(self.conversation_history)
-            
-            # Add current user input with context
-            contextual_input = self._add_context_to_input(user_input, analysis)
-            messages.append({"role": "user", "content": contextual_input})
+            analysis = await self._analysis_for_turn(user_input, audio_duration)
+            messages = self._build_messages(user_input, analysis)
             
             logger.info(f"[AI] Generating conversational response for: {user_input[:50]}...")
             
@@ -84,44 +120,212 @@ class AIService:
             
             if not ai_response:
                 logger.warning("[AI] Empty response from OpenAI")
-                ai_response = "I didn't quite catch that. Could you please repeat or elaborate?"
-            
-            # Update conversation state
-            self._update_conversation_state(user_input, ai_response, analysis)
-            
-            # Update conversation history
-            self.conversation_history.append({"role": "user", "content": user_input})
-            self.conversation_history.append({"role": "assistant", "content": ai_response})
-            
-            # Keep conversation history manageable
-            if len(self.conversation_history) > 8:
-                self.conversation_history = self.conversation_history[-8:]
-            
-            # Determine if we should ask follow-up or move to next topic
-            next_action = self._determine_next_action(analysis)
+                ai_response = EMPTY_RESPONSE_TEXT
             
             logger.info(f"[AI] Generated response: {ai_response[:50]}...")
-            
-            return {
-                "text": ai_response,
-                "should_ask_followup": next_action["ask_followup"],
-                "next_topic": next_action["next_topic"],
-                "emotional_tone": analysis.get("emotional_tone", "neutral"),
-                "conversation_flow": next_action["flow_direction"]
-            }
+            return self._record_turn(user_input, ai_response, analysis)
             
         except Exception as e:
             logger.error(f"[AI] Error generating conversational response: {e}")
             return {
-                "text": "I apologize, but I'm having trouble processing that. Could we try again?",
+                "text": ERROR_RESPONSE_TEXT,
                 "should_ask_followup": False,
                 "next_topic": "technical",
                 "emotional_tone": "neutral",
                 "conversation_flow": "continue"
             }
 
+    async def stream_conversational_response(self, user_input: str, audio_duration: float = 0) -> AsyncIterator[str]:
+        """
+        Same as generate_conversational_response, but yields the reply text
+        as the model generates it. The turn is recorded in the conversation
+        history once the stream completes, or with the text so far if the
+        caller closes the generator early (aclose()).
+        """
+        analysis = await self._analysis_for_turn(user_input, audio_duration)
+        messages = self._build_messages(user_input, analysis)
+        logger.info(f"[AI] Streaming conversational response for: {user_input[:50]}...")
+
+        parts: List[str] = []
+        stream = None
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=250,
+                temperature=0.8,
+                presence_penalty=0.1,
+                frequency_penalty=0.1,
+                stream=True
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        except GeneratorExit:
+            # The caller stopped listening: release the HTTP stream and keep what was said
+            if stream is not None and hasattr(stream, "close"):
+                await stream.close()
+            if parts:
+                logger.info("[AI] Stream closed early, recording partial response")
+                self._record_turn(user_input, "".join(parts).strip(), analysis)
+            raise
+        except Exception as e:
+            logger.error(f"[AI] Error streaming conversational response: {e}")
+            if not parts:
+                yield ERROR_RESPONSE_TEXT
+                return
+
+        ai_response = "".join(parts).strip()
+        if not ai_response:
+            logger.warning("[AI] Empty response from OpenAI")
+            ai_response = EMPTY_RESPONSE_TEXT
+            yield ai_response
+
+        logger.info(f"[AI] Streamed response: {ai_response[:50]}...")
+        self._record_turn(user_input, ai_response, analysis)
+
+    def upload_stats(self) -> Dict[str, Any]:
+        """Whisper upload sizes before and after preprocessing"""
+        uploads = self._uploads
+        return {
+            **uploads,
+            "trimmed_seconds": round(uploads["trimmed_seconds"], 1),
+            "saved_bytes": uploads["original_bytes"] - uploads["bytes"],
+            "saved_ratio": round(1 - uploads["bytes"] / uploads["original_bytes"], 3) if uploads["original_bytes"] else 0.0,
+        }
+
+    def _record_upload(self, prepared: Dict[str, Any]):
+        self._uploads["turns"] += 1
+        self._uploads["original_bytes"] += prepared["original_bytes"]
+        self._uploads["bytes"] += prepared["bytes"]
+        self._uploads["trimmed_seconds"] += prepared["trimmed_seconds"]
+        self._uploads["skipped_silent"] += not prepared["speech"]
+
+    def analysis_stats(self) -> Dict[str, Any]:
+        """How turns were steered: by their own analysis (fresh) or the previous one"""
+        analyses = self._analysis_stats["analyses"]
+        return {
+            "analyzer": self.input_analyzer,
+            "mode": self.analysis_mode,
+            **self._analysis_stats,
+            "analysis_avg_ms": round(self._analysis_ms_total / analyses, 3) if analyses else 0.0,
+            "local": self.local_analyzer.stats(),
+        }
+
+    async def _analysis_for_turn(self, user_input: str, audio_duration: float) -> Dict[str, Any]:
+        """
+        Analysis that steers this turn's prompt. The local analyzer and inline
+        mode wait for it. Concurrent mode starts the LLM analysis in the
+        background and waits at most analysis_wait; if it is not ready, the
+        previous turn's analysis is used (marked carried_over) and this one
+        is applied when it finishes.
+        """
+        if self.analysis_mode == "inline" or self.input_analyzer == "local":
+            analysis = await self._timed_analysis(user_input, audio_duration)
+            self._analysis_stats["fresh"] += 1
+            return analysis
+
+        self._analysis_turn += 1
+        task = asyncio.create_task(self._timed_analysis(user_input, audio_duration))
+        task.add_done_callback(functools.partial(self._apply_analysis, self._analysis_turn))
+        self._pending_analysis = task
+        if self.analysis_wait > 0:
+            await asyncio.wait({task}, timeout=self.analysis_wait)
+        if task.done() and not task.cancelled():
+            self._analysis_stats["fresh"] += 1
+            return task.result()
+
+        self._analysis_stats["carried_over"] += 1
+        return {**self._last_analysis, "carried_over": True} if self._last_analysis else {}
+
+    async def _timed_analysis(self, user_input: str, audio_duration: float) -> Dict[str, Any]:
+        started = time.monotonic()
+        analysis = await self.analyze_user_input(user_input, audio_duration)
+        self._analysis_stats["analyses"] += 1
+        self._analysis_ms_total += (time.monotonic() - started) * 1000
+        return analysis
+
+    def _apply_analysis(self, turn: int, task: asyncio.Task):
+        """Background analysis finished: keep it for the next turn's prompt"""
+        if task.cancelled() or task.exception() is not None:
+            return
+        if turn <= self._last_analysis_turn:
+            # A newer turn's analysis landed first; this one is out of date
+            self._analysis_stats["stale"] += 1
+            return
+        analysis = task.result()
+        self._last_analysis = analysis
+        self._last_analysis_turn = turn
+        self._update_candidate_level(analysis)
+        if self._pending_analysis is task:
+            self._pending_analysis = None
+
+    def _build_messages(self, user_input: str, analysis: Dict[str, Any]) -> List[dict]:
+        """System prompt, recent history and the contextualized user input"""
+        # Build dynamic system prompt based on conversation flow
+        messages = [
+            {"role": "system", "content": self._build_dynamic_system_prompt(analysis)}
+        ]
+        
+        # Add conversation history
+        messages.extend(self.conversation_history)
+        
+        # Add current user input with context
+        messages.append({"role": "user", "content": self._add_context_to_input(user_input, analysis)})
+        return messages
+
+    def _record_turn(self, user_input: str, ai_response: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """Update conversation state and history with a finished turn"""
+        # Update conversation state
+        self._update_conversation_state(user_input, ai_response, analysis)
+        
+        # Update conversation history
+        self.conversation_history.append({"role": "user", "content": user_input})
+        self.conversation_history.append({"role": "assistant", "content": ai_response})
+        
+        # Keep conversation history manageable
+        if len(self.conversation_history) > 8:
+            self.conversation_history = self.conversation_history[-8:]
+        
+        # Determine if we should ask follow-up or move to next topic
+        next_action = self._determine_next_action(analysis)
+        
+        return {
+            "text": ai_response,
+            "should_ask_followup": next_action["ask_followup"],
+            "next_topic": next_action["next_topic"],
+            "emotional_tone": analysis.get("emotional_tone", "neutral"),
+            "conversation_flow": next_action["flow_direction"]
+        }
+
     async def analyze_user_input(self, user_input: str, audio_duration: float = 0) -> Dict[str, Any]:
         """Analyze user input for content, emotion, and intent"""
+        if self.input_analyzer == "llm":
+            return await self._analyze_with_llm(user_input, audio_duration)
+
+        analysis = self.local_analyzer.analyze(user_input, audio_duration)
+        if self.calibration_rate > 0 and random.random() < self.calibration_rate:
+            task = asyncio.create_task(self._calibrate(user_input, audio_duration, analysis))
+            self._calibrations.add(task)
+            task.add_done_callback(self._calibrations.discard)
+        logger.info(f"[AI] Input analysis: {analysis}")
+        return analysis
+
+    async def _calibrate(self, user_input: str, audio_duration: float, local: Dict[str, Any]):
+        """Compare a local analysis with the LLM's for the same answer"""
+        llm = await self._analyze_with_llm(user_input, audio_duration)
+        if llm.get("source") != "llm":
+            return
+        differing = self.local_analyzer.calibrate(local, llm)
+        if differing:
+            logger.info(f"[AI] Calibration: local analyzer differs from LLM on {differing}")
+
+    async def _analyze_with_llm(self, user_input: str, audio_duration: float = 0) -> Dict[str, Any]:
+        """One gpt-3.5-turbo call; "source" is "fallback" when it fails or returns no JSON"""
         try:
             analysis_prompt = f"""
             Analyze this user input from a technical interview context:
@@ -150,6 +354,7 @@ class AIService:
             # Parse JSON from response
             try:
                 analysis = json.loads(analysis_text)
+                analysis["source"] = "llm"
             except:
                 # Fallback analysis
                 analysis = {
@@ -158,17 +363,13 @@ class AIService:
                     "clarity": "clear",
                     "intent": "answer",
                     "needs_followup": len(user_input.split()) > 5,
-                    "suggested_response_style": "neutral"
+                    "suggested_response_style": "neutral",
+                    "source": "fallback"
                 }
             
             # Add audio-based analysis
             if audio_duration > 0:
-                if audio_duration < 2:
-                    analysis["speaking_pace"] = "brief"
-                elif audio_duration > 10:
-                    analysis["speaking_pace"] = "detailed"
-                else:
-                    analysis["speaking_pace"] = "normal"
+                analysis["speaking_pace"] = speaking_pace(audio_duration)
             
             logger.info(f"[AI] Input analysis: {analysis}")
             return analysis
@@ -181,7 +382,8 @@ class AIService:
                 "clarity": "clear",
                 "intent": "answer",
                 "needs_followup": True,
-                "suggested_response_style": "neutral"
+                "suggested_response_style": "neutral",
+                "source": "fallback"
             }
 
     def _build_dynamic_system_prompt(self, analysis: Dict[str, Any]) -> str:
@@ -227,9 +429,15 @@ class AIService:
     def _add_context_to_input(self, user_input: str, analysis: Dict[str, Any]) -> str:
         """Add contextual information to user input"""
         contextual_input = f"Candidate: {user_input}\n\n"
+        if not analysis:
+            return contextual_input
         
-        # Add analysis context
-        contextual_input += f"Analysis: The candidate seems {analysis.get('emotional_tone', 'neutral')}, "
+        # Add analysis context (from their previous answer when it was analyzed concurrently)
+        if analysis.get("carried_over"):
+            contextual_input += "Analysis of their previous answer: "
+        else:
+            contextual_input += "Analysis: "
+        contextual_input += f"The candidate seems {analysis.get('emotional_tone', 'neutral')}, "
         contextual_input += f"their response shows {analysis.get('technical_depth', 'basic')} understanding, "
         contextual_input += f"and their intent appears to be {analysis.get('intent', 'answer')}."
         
@@ -238,7 +446,17 @@ class AIService:
     def _update_conversation_state(self, user_input: str, ai_response: str, analysis: Dict[str, Any]):
         """Update the conversation state based on interaction"""
         self.interview_context["questions_asked"] += 1
+        self._update_candidate_level(analysis)
         
+        # Move to next technical area if enough questions asked
+        if self.interview_context["questions_asked"] % 3 == 0:
+            self.interview_context["current_area_index"] = (
+                self.interview_context["current_area_index"] + 1
+            ) % len(self.interview_context["technical_areas"])
+            logger.info(f"[AI] Moving to next topic area: {self.interview_context['technical_areas'][self.interview_context['current_area_index']]}")
+
+    def _update_candidate_level(self, analysis: Dict[str, Any]):
+        """Raise the estimated candidate level from an analysis"""
         # Update candidate level estimation
         tech_depth = analysis.get("technical_depth", "basic")
         if tech_depth == "advanced" and self.interview_context["candidate_level"] != "advanced":
@@ -247,13 +465,6 @@ class AIService:
         elif tech_depth == "intermediate" and self.interview_context["candidate_level"] == "unknown":
             self.interview_context["candidate_level"] = "intermediate"
             logger.info(f"[AI] Updated candidate level to: intermediate")
-        
-        # Move to next technical area if enough questions asked
-        if self.interview_context["questions_asked"] % 3 == 0:
-            self.interview_context["current_area_index"] = (
-                self.interview_context["current_area_index"] + 1
-            ) % len(self.interview_context["technical_areas"])
-            logger.info(f"[AI] Moving to next topic area: {self.interview_context['technical_areas'][self.interview_context['current_area_index']]}")
 
     def _determine_next_action(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
         """Determine what to do next in the conversation"""
@@ -315,15 +526,19 @@ class AIService:
                 "conversation_flow": "start"
             }
 
-    async def text_to_speech(self, text: str) -> Optional[bytes]:
-        """Convert text to speech with natural pacing"""
+    async def text_to_speech(self, text: str, partial: bool = False) -> Optional[bytes]:
+        """
+        Convert text to speech with natural pacing. `partial` marks a piece
+        of a longer sentence (streamed segment cut at a comma): its ending is
+        left as is instead of being turned into a statement or question.
+        """
         try:
             if not text or not text.strip():
                 logger.warning("[TTS] Empty text provided")
                 return None
             
             # Clean text for TTS - preserve natural speech patterns
-            clean_text = self._clean_text_for_natural_speech(text)
+            clean_text = self._clean_text_for_natural_speech(text, partial)
             
             if len(clean_text) > 400:
                 clean_text = clean_text[:400] + "..."
@@ -354,7 +569,7 @@ class AIService:
             logger.error(f"[TTS] Error generating natural speech: {e}")
             return None
 
-    def _clean_text_for_natural_speech(self, text: str) -> str:
+    def _clean_text_for_natural_speech(self, text: str, partial: bool = False) -> str:
         """Clean text while preserving natural speech patterns"""
         try:
             # Remove markdown but keep natural punctuation
@@ -369,6 +584,10 @@ class AIService:
             # Preserve natural pauses and conversational markers
             clean_text = re.sub(r'\s+', ' ', clean_text)
             
+            if partial:
+                # Mid-sentence: a dangling comma or dash would be read with a rising tone
+                return clean_text.strip().rstrip(',;:—–').rstrip()
+
             # Ensure natural ending
             if not clean_text.endswith(('.', '!', '?')):
                 if any(word in clean_text.lower() for word in ['okay', 'great', 'interesting']):
@@ -382,8 +601,12 @@ class AIService:
             logger.error(f"[TTS] Error cleaning text for natural speech: {e}")
             return text
 
-    async def transcribe_audio(self, audio_bytes: bytes) -> str:
-        """Transcribe audio to text using OpenAI Whisper"""
+    async def transcribe_audio(self, audio_bytes: bytes, report: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Transcribe audio to text using OpenAI Whisper. WAV input is trimmed,
+        downmixed and resampled first (see audio_preprocess); pass a dict as
+        `report` to get the upload sizes back.
+        """
         try:
             if not audio_bytes or len(audio_bytes) == 0:
                 logger.warning("[Whisper] Empty audio provided")
@@ -391,27 +614,23 @@ class AIService:
             
             logger.info(f"[Whisper] Transcribing audio: {len(audio_bytes)} bytes")
             
-            # Check if it's a WAV file (starts with RIFF header)
-            is_wav = audio_bytes[:4] == b'RIFF'
-            logger.info(f"[Whisper] Audio format: {'WAV' if is_wav else 'Unknown'}")
-            
-            # For WAV files, try direct transcription
-            if is_wav:
-                # Extract audio data length from WAV header to validate
-                if len(audio_bytes) >= 44:
-                    import struct
-                    # Read data size from WAV header (at offset 40, 4 bytes, little-endian)
-                    data_size = struct.unpack('<I', audio_bytes[40:44])[0]
-                    total_expected = 44 + data_size
-                    if abs(len(audio_bytes) - total_expected) <= 4:  # Allow small variance
-                        logger.info(f"[Whisper] WAV file validated: {len(audio_bytes)} bytes total, {data_size} bytes audio data")
+            upload_name = "audio.wav" if audio_bytes[:4] == b'RIFF' else "audio.mp3"
+            if self.preprocess_audio:
+                prepared = await prepare_for_whisper(audio_bytes)
+                self._record_upload(prepared)
+                if report is not None:
+                    report.update({key: value for key, value in prepared.items() if key != "data"})
+                if not prepared["speech"]:
+                    logger.info("[Whisper] No speech in audio, skipping upload")
+                    return ""
+                audio_bytes, upload_name = prepared["data"], prepared["filename"]
+                logger.info(f"[Whisper] Upload {prepared['original_bytes']} -> {prepared['bytes']} bytes "
+                            f"({prepared['codec']}, {prepared['trimmed_seconds']}s silence trimmed, "
+                            f"{prepared['ms']}ms)")
             
             # Create file-like object for audio
             audio_file = io.BytesIO(audio_bytes)
-            if is_wav:
-                audio_file.name = "audio.wav"
-            else:
-                audio_file.name = "audio.mp3"
+            audio_file.name = upload_name
             
             # Call Whisper API with explicit parameters
             try:
@@ -425,7 +644,7 @@ class AIService:
                 text = transcript.text.strip()
                 
                 if not text:
-                    logger.warning(f"[Whisper] Empty transcription returned for {len(audio_bytes)} byte WAV file")
+                    logger.warning(f"[Whisper] Empty transcription returned for {len(audio_bytes)} byte {upload_name}")
                     # Return empty string (handled by caller)
                     return ""
                 
@@ -4,10 +4,15 @@ Uses OpenAI to analyze job descriptions and extract must-have skills
 """
 
 import os
+import asyncio
+import json
 import logging
-from typing import List, Dict
-from openai import OpenAI
+import time
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
+from skill_cache import SkillCache, description_key
+from skill_taxonomy import LocalSkillExtractor
 
 # Load environment variables
 load_dotenv()
@@ -16,27 +21,36 @@ logger = logging.getLogger(__name__)
 
 # Get API key
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not set in .env")
 
-# Initialize OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY)
+EXTRACT_SKILLS_MODEL = os.getenv("EXTRACT_SKILLS_MODEL", "gpt-4o-mini")
+# Seconds one extraction may take before it is abandoned
+EXTRACT_SKILLS_TIMEOUT = float(os.getenv("EXTRACT_SKILLS_TIMEOUT", "20"))
+# Extractions in flight per worker, so bulk job creation cannot hog the shared OpenAI pool
+EXTRACT_SKILLS_CONCURRENCY = int(os.getenv("EXTRACT_SKILLS_CONCURRENCY", "4"))
+# How long a request may wait for a free slot before it is turned away
+EXTRACT_SKILLS_QUEUE_TIMEOUT = float(os.getenv("EXTRACT_SKILLS_QUEUE_TIMEOUT", "10"))
+# Slots one batch may hold at once; keep below EXTRACT_SKILLS_CONCURRENCY so
+# single extractions still get through during a bulk import
+EXTRACT_SKILLS_BATCH_CONCURRENCY = int(os.getenv("EXTRACT_SKILLS_BATCH_CONCURRENCY", "2"))
+EXTRACT_SKILLS_BATCH_MAX = int(os.getenv("EXTRACT_SKILLS_BATCH_MAX", "500"))
+# Completion budget for one /api/extract-skills call (three short skills and a summary)
+EXTRACT_SKILLS_MAX_TOKENS = int(os.getenv("EXTRACT_SKILLS_MAX_TOKENS", "500"))
 
+# Bump when the prompt changes so cached extractions from the old prompt are not reused
+EXTRACTION_PROMPT_VERSION = "2"
+CACHE_NAMESPACE = f"{EXTRACT_SKILLS_MODEL}:{EXTRACTION_PROMPT_VERSION}"
 
-def extract_skills_from_description(job_description: str) -> Dict[str, any]:
-    """
-    Extract top 3 must-have skills from a job description using AI
-    
-    Args:
-        job_description: The job description text
-        
-    Returns:
-        Dictionary with extracted skills and enhancements
-    """
-    try:
-        logger.info("🔄 Extracting skills from job description...")
-        
-        prompt = f"""Analyze the following job description and extract the top 3 MUST-HAVE skills.
+# Initialize OpenAI client (sync helpers below; the API uses SkillExtractor)
+client = None
+if OPENAI_API_KEY:
+    client = OpenAI(api_key=OPENAI_API_KEY)
+else:
+    logger.warning("⚠️ OPENAI_API_KEY not set - skill extraction unavailable")
+
+
+def build_extraction_messages(job_description: str) -> List[Dict[str, str]]:
+    """Chat messages asking for the top 3 must-have skills as JSON"""
+    prompt = f"""Analyze the following job description and extract the top 3 MUST-HAVE skills.
 
 Job Description:
 {job_description}
@@ -65,41 +79,110 @@ Please respond in JSON format with this exact structure:
 
 Make sure the response is valid JSON only, no additional text."""
 
+    return [
+        {
+            "role": "system",
+            "content": "You are an expert HR recruiter and skills analyst. Extract the most critical skills from job descriptions."
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+
+def build_api_extraction_messages(job_description: str) -> List[Dict[str, str]]:
+    """The /api/extract-skills prompt: same JSON shape, terser reasons and summary"""
+    prompt = f"""Analyze this job description and extract the top 3 MUST-HAVE skills.
+
+Job Description:
+{job_description}
+
+Respond in JSON format ONLY (no other text):
+{{
+  "skills": [
+    {{"name": "Skill Name", "importance": "critical/high/medium", "reason": "Why it matters"}},
+    {{"name": "Skill Name", "importance": "critical/high/medium", "reason": "Why it matters"}},
+    {{"name": "Skill Name", "importance": "critical/high/medium", "reason": "Why it matters"}}
+  ],
+  "summary": "Brief summary of key requirements"
+}}"""
+
+    return [
+        {
+            "role": "system",
+            "content": "You are an expert HR recruiter. Extract critical skills from job descriptions. Respond only with valid JSON."
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+
+def parse_skills_response(response_text: str) -> Dict[str, Any]:
+    """Parse the model's JSON reply into the API result shape"""
+    response_text = response_text.strip()
+
+    # Try to extract JSON if response contains additional text
+    if "```json" in response_text:
+        response_text = response_text.split("```json")[1].split("```")[0]
+    elif "```" in response_text:
+        response_text = response_text.split("```")[1].split("```")[0]
+
+    skills_data = json.loads(response_text)
+    return {
+        "success": True,
+        "skills": skills_data.get("skills", []),
+        "summary": skills_data.get("summary", "")
+    }
+
+
+# In-memory cache for the sync helper (the API's SkillExtractor also uses the database)
+_cache = SkillCache(namespace=CACHE_NAMESPACE)
+_local = LocalSkillExtractor()
+
+
+def extract_skills_from_description(job_description: str, cache: Optional[SkillCache] = _cache,
+                                    local: Optional[LocalSkillExtractor] = _local) -> Dict[str, any]:
+    """
+    Extract top 3 must-have skills from a job description using AI
+    
+    Args:
+        job_description: The job description text
+        cache: Cache consulted first and filled on success (None to skip)
+        local: Taxonomy matcher tried before the LLM (None to skip)
+        
+    Returns:
+        Dictionary with extracted skills and enhancements
+    """
+    try:
+        if local is not None:
+            result = local.extract(job_description)
+            if result is not None:
+                logger.info("⚡ Skills extracted locally")
+                return result
+
+        if cache is not None:
+            cached = cache.get(job_description)
+            if cached is not None:
+                logger.info("⚡ Skills served from cache")
+                return cached
+
+        logger.info("🔄 Extracting skills from job description...")
+
         response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert HR recruiter and skills analyst. Extract the most critical skills from job descriptions."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
+            model=EXTRACT_SKILLS_MODEL,
+            messages=build_extraction_messages(job_description),
             temperature=0.7,
             max_tokens=1000
         )
         
-        # Parse response
-        import json
-        response_text = response.choices[0].message.content.strip()
-        
-        # Try to extract JSON if response contains additional text
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0]
-        elif "```" in response_text:
-            response_text = response_text.split("```")[1].split("```")[0]
-        
-        skills_data = json.loads(response_text)
-        
-        logger.info(f"✅ Successfully extracted {len(skills_data['skills'])} skills")
-        
-        return {
-            "success": True,
-            "skills": skills_data.get("skills", []),
-            "summary": skills_data.get("summary", "")
-        }
+        result = parse_skills_response(response.choices[0].message.content)
+        logger.info(f"✅ Successfully extracted {len(result['skills'])} skills")
+        if cache is not None:
+            cache.put(job_description, result)
+        return result
         
     except Exception as e:
         logger.error(f"❌ Error extracting skills: {e}")
@@ -110,6 +193,159 @@ Make sure the response is valid JSON only, no additional text."""
         }
 
 
+class ExtractionBusy(Exception):
+    """No extraction slot freed up within the queue timeout"""
+
+
+class SkillExtractor:
+    """
+    Async skill extraction for the API. Runs on the app's shared httpx pool
+    (start() is called from the FastAPI lifespan), limits how many
+    extractions are in flight and abandons ones that run past the timeout.
+    Descriptions the local taxonomy tier is sure about, and cached ones,
+    skip the limiter entirely. Cancelling extract() cancels the OpenAI request.
+    """
+
+    def __init__(self, api_key: Optional[str] = OPENAI_API_KEY, cache: Optional[SkillCache] = None,
+                 local: Optional[LocalSkillExtractor] = None,
+                 concurrency: int = EXTRACT_SKILLS_CONCURRENCY,
+                 timeout: float = EXTRACT_SKILLS_TIMEOUT,
+                 queue_timeout: float = EXTRACT_SKILLS_QUEUE_TIMEOUT,
+                 max_tokens: int = EXTRACT_SKILLS_MAX_TOKENS):
+        self.api_key = api_key
+        self.cache = cache
+        self.local = local
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.max_tokens = max_tokens
+        self.client: Optional[AsyncOpenAI] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(concurrency)
+        self._stats = {"requests": 0, "local": 0, "cached": 0, "completed": 0, "failed": 0, "timed_out": 0,
+                       "cancelled": 0, "rejected_busy": 0, "latency_total": 0.0,
+                       "batch_items": 0, "batch_duplicates": 0}
+
+    @property
+    def ready(self) -> bool:
+        return self.client is not None
+
+    def start(self, http_client, base_url: str):
+        """Bind to the shared httpx.AsyncClient (no-op without an API key)"""
+        if self.api_key:
+            self.client = AsyncOpenAI(api_key=self.api_key, base_url=f"{base_url.rstrip('/')}/v1",
+                                      http_client=http_client, max_retries=1)
+
+    async def extract(self, job_description: str, wait_for_slot: bool = False) -> Dict[str, Any]:
+        """
+        Extract skills; raises ExtractionBusy when no slot frees up in time
+        (unless wait_for_slot) and asyncio.TimeoutError when OpenAI takes
+        longer than the timeout
+        """
+        if not self.client:
+            raise RuntimeError("Skill extractor is not started")
+        self._stats["requests"] += 1
+        if self.local is not None:
+            result = self.local.extract(job_description)
+            if result is not None:
+                self._stats["local"] += 1
+                return result
+        if self.cache is not None:
+            cached = await self.cache.aget(job_description)
+            if cached is not None:
+                self._stats["cached"] += 1
+                return cached
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=None if wait_for_slot else self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._stats["rejected_busy"] += 1
+            raise ExtractionBusy(f"{self.concurrency} extractions already running")
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        started = time.monotonic()
+        try:
+            response = await asyncio.wait_for(
+                self.client.chat.completions.create(
+                    model=EXTRACT_SKILLS_MODEL,
+                    messages=build_api_extraction_messages(job_description),
+                    temperature=0.7,
+                    max_tokens=self.max_tokens,
+                ),
+                timeout=self.timeout,
+            )
+            result = parse_skills_response(response.choices[0].message.content)
+        except asyncio.TimeoutError:
+            self._stats["timed_out"] += 1
+            raise
+        except asyncio.CancelledError:
+            self._stats["cancelled"] += 1
+            raise
+        except Exception:
+            self._stats["failed"] += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+        self._stats["completed"] += 1
+        self._stats["latency_total"] += time.monotonic() - started
+        if self.cache is not None:
+            await self.cache.aput(job_description, result)
+        return result
+
+    async def extract_many(self, descriptions: List[str],
+                           concurrency: int = EXTRACT_SKILLS_BATCH_CONCURRENCY
+                           ) -> AsyncIterator[Tuple[List[int], Any]]:
+        """
+        Extract a batch, yielding (input indexes, result or exception) as
+        each distinct description finishes. Descriptions that normalize to
+        the same text are extracted once and reported for every index.
+        Closing the iterator cancels the outstanding work.
+        """
+        groups: Dict[str, List[int]] = {}
+        for index, description in enumerate(descriptions):
+            groups.setdefault(description_key(description, CACHE_NAMESPACE), []).append(index)
+        self._stats["batch_items"] += len(descriptions)
+        self._stats["batch_duplicates"] += len(descriptions) - len(groups)
+
+        pending: asyncio.Queue = asyncio.Queue()
+        for indexes in groups.values():
+            pending.put_nowait(indexes)
+        done: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            while not pending.empty():
+                indexes = pending.get_nowait()
+                try:
+                    result = await self.extract(descriptions[indexes[0]], wait_for_slot=True)
+                except Exception as e:
+                    result = e
+                done.put_nowait((indexes, result))
+
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(groups))))]
+        try:
+            for _ in range(len(groups)):
+                yield await done.get()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        completed = self._stats["completed"]
+        return {
+            **{k: v for k, v in self._stats.items() if k != "latency_total"},
+            "latency_avg": round(self._stats["latency_total"] / completed, 3) if completed else 0.0,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "concurrency": self.concurrency,
+        }
+
+
 def enhance_skill_description(skill_name: str, context: str) -> str:
     """
     Enhance a skill description with AI-generated insights
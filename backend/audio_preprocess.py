@@ -0,0 +1,218 @@
+"""
+Audio preprocessing before Whisper upload
+Parses the WAV container (any chunk layout, 8/16/24/32-bit PCM or float),
+downmixes to mono, resamples to 16 kHz with a windowed-sinc low-pass and
+vectorized interpolation, trims leading/trailing silence with the same
+energy/zero-crossing features as the server VAD and optionally re-encodes
+with ffmpeg (FLAC, Opus or MP3). Whisper works at 16 kHz mono internally,
+so nothing it uses is thrown away.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import struct
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from voice_activity import LOUD_DB, VAD_MARGIN_DB, VAD_MIN_DBFS, VAD_ZCR_MAX, frame_features, pcm_to_wav
+
+logger = logging.getLogger(__name__)
+
+WHISPER_PREPROCESS = os.getenv("WHISPER_PREPROCESS", "true").lower() == "true"
+WHISPER_SAMPLE_RATE = int(os.getenv("WHISPER_SAMPLE_RATE", "16000"))
+# Audio kept around the speech when trimming
+WHISPER_TRIM_PAD_MS = int(os.getenv("WHISPER_TRIM_PAD_MS", "200"))
+# "wav" (16-bit PCM), or "flac", "opus", "mp3" via ffmpeg (falls back to wav if ffmpeg is missing)
+WHISPER_UPLOAD_CODEC = os.getenv("WHISPER_UPLOAD_CODEC", "wav").lower()
+FFMPEG_TIMEOUT = float(os.getenv("FFMPEG_TIMEOUT", "10"))
+
+TRIM_FRAME_MS = 30
+# The trim threshold never exceeds this far below the loudest frame (continuous speech)
+PEAK_HEADROOM_DB = 25.0
+RESAMPLE_TAPS = 101
+
+# codec -> (ffmpeg arguments, upload file name)
+CODECS = {
+    "flac": (["-c:a", "flac"], "audio.flac"),
+    "opus": (["-c:a", "libopus", "-b:a", "24k", "-f", "ogg"], "audio.ogg"),
+    "mp3": (["-c:a", "libmp3lame", "-b:a", "48k", "-f", "mp3"], "audio.mp3"),
+}
+
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_FLOAT = 3
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def parse_wav(data: bytes) -> Optional[Tuple[np.ndarray, int]]:
+    """(float32 samples shaped [frames, channels] in -1..1, sample rate), or None if not a usable WAV"""
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id, size = struct.unpack("<4sI", data[offset:offset + 8])
+        body = offset + 8
+        if chunk_id == b"fmt " and size >= 16:
+            fmt = struct.unpack("<HHIIHH", data[body:body + 16])
+            if fmt[0] == _WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                # The real format code is the first two bytes of the SubFormat GUID
+                fmt = (struct.unpack("<H", data[body + 24:body + 26])[0],) + fmt[1:]
+        elif chunk_id == b"data" and fmt is not None:
+            # Browsers streaming WAV often write 0 or 0xFFFFFFFF here: take what is there
+            payload = data[body:body + size] if 0 < size <= len(data) - body else data[body:]
+            return _decode(payload, fmt)
+        offset = body + size + (size & 1)
+    return None
+
+
+def _decode(payload: bytes, fmt: tuple) -> Optional[Tuple[np.ndarray, int]]:
+    format_code, channels, sample_rate, _, _, bits = fmt
+    width = bits // 8
+    if channels < 1 or width < 1 or sample_rate < 1:
+        return None
+    usable = len(payload) // (width * channels) * width * channels
+    payload = payload[:usable]
+    if format_code == _WAVE_FORMAT_FLOAT and bits == 32:
+        samples = np.frombuffer(payload, dtype="<f4").astype(np.float32)
+    elif format_code != _WAVE_FORMAT_PCM:
+        return None
+    elif bits == 8:
+        samples = (np.frombuffer(payload, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif bits == 16:
+        samples = np.frombuffer(payload, dtype="<i2").astype(np.float32) / 32768
+    elif bits == 24:
+        raw = np.frombuffer(payload, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        samples = (np.where(values >= 1 << 23, values - (1 << 24), values)).astype(np.float32) / (1 << 23)
+    elif bits == 32:
+        samples = np.frombuffer(payload, dtype="<i4").astype(np.float32) / (1 << 31)
+    else:
+        return None
+    return samples.reshape(-1, channels), sample_rate
+
+
+def resample(samples: np.ndarray, rate: int, target: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """Mono float32 to `target` Hz; only downsamples (Whisper upsamples anything lower itself)"""
+    if rate <= target or not len(samples):
+        return samples
+    # Windowed-sinc low-pass just under the new Nyquist frequency, then interpolate
+    cutoff = 0.5 * target / rate * 0.95
+    n = np.arange(RESAMPLE_TAPS) - (RESAMPLE_TAPS - 1) / 2
+    taps = 2 * cutoff * np.sinc(2 * cutoff * n) * np.blackman(RESAMPLE_TAPS)
+    filtered = np.convolve(samples, (taps / taps.sum()).astype(np.float32), mode="same")
+    positions = np.arange(int(len(samples) * target / rate)) * (rate / target)
+    return np.interp(positions, np.arange(len(samples)), filtered).astype(np.float32)
+
+
+def trim_silence(pcm: np.ndarray, rate: int, pad_ms: int = WHISPER_TRIM_PAD_MS) -> Optional[np.ndarray]:
+    """Cut leading/trailing silence from int16 mono; None if there is no speech at all"""
+    frame = rate * TRIM_FRAME_MS // 1000
+    energy_db, zcr = frame_features(pcm, frame)
+    if not len(energy_db):
+        return pcm
+    peak = float(energy_db.max())
+    if peak < VAD_MIN_DBFS:
+        return None
+    floor = float(np.percentile(energy_db, 10))
+    threshold = min(max(VAD_MIN_DBFS, floor + VAD_MARGIN_DB), peak - PEAK_HEADROOM_DB)
+    speech = np.flatnonzero((energy_db > threshold) & ((zcr < VAD_ZCR_MAX) | (energy_db > threshold + LOUD_DB)))
+    if not len(speech):
+        return None
+    pad = pad_ms * rate // 1000
+    start = max(0, speech[0] * frame - pad)
+    end = min(len(pcm), (speech[-1] + 1) * frame + pad)
+    return pcm[start:end]
+
+
+def _prepare_pcm(audio_bytes: bytes, target_rate: int, pad_ms: int) -> Optional[Dict[str, Any]]:
+    """CPU part of prepare_for_whisper (runs in a thread)"""
+    parsed = parse_wav(audio_bytes)
+    if parsed is None:
+        return None
+    samples, rate = parsed
+    channels = samples.shape[1]
+    mono = samples.mean(axis=1) if channels > 1 else samples[:, 0]
+    original_seconds = len(mono) / rate
+    mono = resample(mono, rate, target_rate)
+    rate = min(rate, target_rate)
+    pcm = (np.clip(mono, -1.0, 1.0) * 32767).astype("<i2")
+    trimmed = trim_silence(pcm, rate, pad_ms)
+    return {
+        "pcm": trimmed,
+        "sample_rate": rate,
+        "channels": channels,
+        "original_seconds": original_seconds,
+        "seconds": len(trimmed) / rate if trimmed is not None else 0.0,
+    }
+
+
+async def encode(wav: bytes, codec: str) -> Optional[bytes]:
+    """Re-encode WAV with ffmpeg; None if ffmpeg is missing or fails"""
+    args, _ = CODECS[codec]
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return None
+    try:
+        process = await asyncio.create_subprocess_exec(
+            ffmpeg, "-hide_banner", "-loglevel", "error", "-f", "wav", "-i", "pipe:0", *args, "pipe:1",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    except OSError as e:
+        logger.warning(f"[Whisper] ffmpeg {codec} encode failed: {e}")
+        return None
+    try:
+        out, err = await asyncio.wait_for(process.communicate(wav), FFMPEG_TIMEOUT)
+    except BaseException as e:
+        # Timed out, pipe error or cancelled: never leave the child running or unreaped
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        if isinstance(e, (OSError, asyncio.TimeoutError)):
+            logger.warning(f"[Whisper] ffmpeg {codec} encode failed: {e!r}")
+            return None
+        raise
+    if process.returncode != 0 or not out:
+        logger.warning(f"[Whisper] ffmpeg {codec} encode failed: {err.decode(errors='replace')[:200]}")
+        return None
+    return out
+
+
+async def prepare_for_whisper(audio_bytes: bytes, codec: str = WHISPER_UPLOAD_CODEC,
+                              target_rate: int = WHISPER_SAMPLE_RATE,
+                              pad_ms: int = WHISPER_TRIM_PAD_MS) -> Dict[str, Any]:
+    """
+    Returns {"data", "filename", "speech", "original_bytes", "bytes",
+    "saved_bytes", "trimmed_seconds", "codec", "ms"}. Input that is not WAV
+    passes through unchanged; "speech" is False for pure silence (no upload needed).
+    """
+    started = time.perf_counter()
+    report = {"data": audio_bytes, "filename": "audio.wav" if audio_bytes[:4] == b"RIFF" else "audio.mp3",
+              "speech": True, "original_bytes": len(audio_bytes), "codec": "original", "trimmed_seconds": 0.0}
+    try:
+        prepared = await asyncio.to_thread(_prepare_pcm, audio_bytes, target_rate, pad_ms)
+    except Exception as e:
+        logger.warning(f"[Whisper] Preprocessing failed, uploading as is: {e}")
+        prepared = None
+
+    if prepared is not None:
+        report["trimmed_seconds"] = round(prepared["original_seconds"] - prepared["seconds"], 2)
+        if prepared["pcm"] is None:
+            report.update(data=b"", speech=False, codec="none")
+        else:
+            wav = pcm_to_wav(prepared["pcm"].tobytes(), prepared["sample_rate"])
+            report.update(data=wav, filename="audio.wav", codec="wav")
+            if codec in CODECS:
+                encoded = await encode(wav, codec)
+                if encoded is not None and len(encoded) < len(wav):
+                    report.update(data=encoded, filename=CODECS[codec][1], codec=codec)
+            if len(report["data"]) >= len(audio_bytes):
+                # Nothing gained (already compact): keep the original bytes
+                report.update(data=audio_bytes, filename="audio.wav", codec="original")
+
+    report["bytes"] = len(report["data"])
+    report["saved_bytes"] = report["original_bytes"] - report["bytes"]
+    report["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return report
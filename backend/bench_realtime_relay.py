@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the /ws/realtime relay frame classification
+Compares the old json.loads-per-frame path with the peek fast path
+on a realistic mix of audio and control frames (single core).
+"""
+
+import base64
+import json
+import os
+import time
+
+from realtime_relay import (
+    classify_frame,
+    peek_event_type,
+    CLIENT_INSPECTED_EVENTS,
+    SERVER_INSPECTED_EVENTS,
+)
+
+FRAMES = int(os.getenv("BENCH_FRAMES", "20000"))
+
+
+def build_frames():
+    """Build a frame mix resembling one interview: mostly audio, few control events"""
+    # 20ms of 24kHz PCM16 mono = 960 bytes per chunk
+    audio = base64.b64encode(os.urandom(960)).decode("ascii")
+    client_frames = [
+        json.dumps({"type": "input_audio_buffer.append", "audio": audio}),
+    ] * 48 + [
+        json.dumps({"type": "session.update", "session": {"instructions": "x" * 4000}}),
+        json.dumps({"type": "response.create"}),
+    ]
+    server_frames = [
+        json.dumps({"event_id": "event_123", "type": "response.audio.delta",
+                    "response_id": "resp_1", "item_id": "item_1",
+                    "output_index": 0, "content_index": 0, "delta": audio}),
+    ] * 40 + [
+        json.dumps({"event_id": "event_124", "type": "response.audio_transcript.delta",
+                    "delta": "Hello"}),
+    ] * 8 + [
+        json.dumps({"event_id": "event_125", "type": "response.done",
+                    "response": {"status": "completed"}}),
+        json.dumps({"event_id": "event_126", "type": "conversation.item.created",
+                    "item": {"type": "message", "role": "assistant"}}),
+    ]
+    return client_frames, server_frames
+
+
+def legacy_classify(frame):
+    """What the relay loops did before: decode every frame"""
+    msg = json.loads(frame)
+    return msg.get("type", "unknown"), msg
+
+
+def run(label, frames, classify):
+    """Classify FRAMES frames and return frames/sec"""
+    count = len(frames)
+    start = time.perf_counter()
+    for i in range(FRAMES):
+        classify(frames[i % count])
+    elapsed = time.perf_counter() - start
+    rate = FRAMES / elapsed
+    print(f"   {label:<28} {rate:>12,.0f} frames/sec")
+    return rate
+
+
+def main():
+    client_frames, server_frames = build_frames()
+
+    # Sanity check: the peek agrees with a full decode on every frame
+    for frame in client_frames + server_frames:
+        assert peek_event_type(frame) == json.loads(frame)["type"]
+
+    print("=" * 60)
+    print(f"[BENCH] REALTIME RELAY CLASSIFICATION ({FRAMES} frames)")
+    print("=" * 60)
+
+    print("\nClient -> OpenAI")
+    before = run("json.loads every frame", client_frames, legacy_classify)
+    after = run("peek fast path", client_frames,
+                lambda f: classify_frame(f, CLIENT_INSPECTED_EVENTS))
+    print(f"   speedup: {after / before:.1f}x")
+
+    print("\nOpenAI -> Client")
+    before = run("json.loads every frame", server_frames, legacy_classify)
+    after = run("peek fast path", server_frames,
+                lambda f: classify_frame(f, SERVER_INSPECTED_EVENTS))
+    print(f"   speedup: {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the local skill extraction tier
+Builds a corpus of job descriptions with known must-have skills (some
+clear-cut, some deliberately ambiguous), runs LocalSkillExtractor over it
+and reports throughput, how many descriptions it answers without the LLM
+and how often its answer matches the planted must-haves. Compares the
+Aho-Corasick index with a naive per-alias regex scan (single core).
+"""
+
+import os
+import random
+import re
+import time
+
+from skill_taxonomy import LocalSkillExtractor, SKILL_TAXONOMY, DEFAULT_INDEX
+
+DESCRIPTIONS = int(os.getenv("BENCH_DESCRIPTIONS", "2000"))
+# Average gpt-4o-mini extraction latency to compare against, in seconds
+LLM_LATENCY = float(os.getenv("BENCH_LLM_LATENCY", "2.5"))
+
+TITLES = ["Senior Software Engineer", "Backend Developer", "Data Scientist", "Platform Engineer",
+          "Full Stack Developer", "Machine Learning Engineer", "DevOps Engineer", "Data Analyst"]
+REQUIRED = ["Must have {years}+ years of experience with {skill}.", "Strong {skill} skills are required.",
+            "You are proficient in {skill} and {skill2}.", "Deep expertise in {skill} is essential."]
+OPTIONAL = ["Familiarity with {skill} is a plus.", "Nice to have: {skill}.", "Exposure to {skill} preferred."]
+FILLER = ["You will join a collaborative team shipping features every week.",
+          "We value ownership, curiosity and clear writing.",
+          "The role reports to the head of engineering.",
+          "We offer remote-friendly hours and a learning budget.",
+          "You will work closely with product and design partners."]
+
+
+def _alias(rng, skill):
+    return rng.choice([alias.lstrip("~") for alias in SKILL_TAXONOMY[skill] if not alias.startswith("~")]
+                      or [skill])
+
+
+def build_corpus(seed=7):
+    """(description, planted must-have skills, clear-cut?) triples"""
+    rng = random.Random(seed)
+    skills = list(SKILL_TAXONOMY)
+    corpus = []
+    for n in range(DESCRIPTIONS):
+        picked = rng.sample(skills, 7)
+        must, extra = picked[:3], picked[3:]
+        clear = n % 3 != 2
+        lines = [f"{rng.choice(TITLES)}. We are hiring to work on {_alias(rng, must[0])} services."]
+        for skill in must:
+            template = rng.choice(REQUIRED)
+            lines.append(template.format(years=rng.randint(2, 8), skill=_alias(rng, skill),
+                                         skill2=_alias(rng, skill)))
+        if clear:
+            lines += [rng.choice(OPTIONAL).format(skill=_alias(rng, skill)) for skill in extra[:2]]
+        else:
+            # Ambiguous: four more skills required just as firmly as the last must-haves
+            lines += [rng.choice(REQUIRED[:2]).format(years=3, skill=_alias(rng, skill)) for skill in extra]
+        lines += rng.sample(FILLER, 2)
+        body = lines[1:]
+        rng.shuffle(body)
+        corpus.append(("\n".join(lines[:1] + body), set(must), clear))
+    return corpus
+
+
+def naive_find(text):
+    """What a straightforward implementation does: one regex search per alias"""
+    found = []
+    for name, aliases in SKILL_TAXONOMY.items():
+        for alias in aliases:
+            for match in re.finditer(r"(?<![\w])" + re.escape(alias.lstrip("~")) + r"(?![\w])", text):
+                found.append((match.start(), match.end(), name))
+    return found
+
+
+def run(label, corpus, find):
+    """Scan the corpus and return descriptions/sec"""
+    start = time.perf_counter()
+    for text, _, _ in corpus:
+        list(find(text.lower()))
+    elapsed = time.perf_counter() - start
+    rate = len(corpus) / elapsed
+    print(f"   {label:<28} {rate:>12,.0f} descriptions/sec")
+    return rate
+
+
+def main():
+    corpus = build_corpus()
+    print("=" * 60)
+    print(f"[BENCH] LOCAL SKILL EXTRACTION ({len(corpus)} descriptions, {DEFAULT_INDEX.size} aliases)")
+    print("=" * 60)
+
+    print("\nMatching")
+    before = run("regex per alias", corpus, naive_find)
+    after = run("Aho-Corasick index", corpus, DEFAULT_INDEX.find)
+    print(f"   speedup: {after / before:.1f}x")
+
+    print("\nLocal tier")
+    extractor = LocalSkillExtractor(enabled=True)
+    answered = {True: 0, False: 0}
+    correct = 0
+    for text, must, clear in corpus:
+        result = extractor.extract(text)
+        if result:
+            answered[clear] += 1
+            correct += {skill["name"] for skill in result["skills"]} == must
+    stats = extractor.stats()
+    clear_total = sum(1 for _, _, clear in corpus if clear)
+    local = answered[True] + answered[False]
+    print(f"   avg latency                  {stats['avg_us']:>12,.1f} us")
+    print(f"   answered locally             {local:>12} ({stats['answered_ratio']:.0%})")
+    print(f"     clear-cut descriptions     {answered[True]:>12} / {clear_total}")
+    print(f"     ambiguous descriptions     {answered[False]:>12} / {len(corpus) - clear_total}")
+    print(f"   local answers matching plant {correct:>12} ({correct / local:.0%})" if local else "")
+    saved = local * LLM_LATENCY
+    print(f"   LLM time avoided             {saved:>12,.0f} s (at {LLM_LATENCY}s per call)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark for conversational turn latency in AIService
+Runs a scripted interview against a stubbed OpenAI client with fixed
+per-call latencies and compares ANALYSIS_MODE=inline (analysis, then reply)
+with concurrent (analysis alongside the reply) and with the local heuristic
+analyzer, for both the buffered and the streaming reply paths. No network.
+"""
+
+import asyncio
+import json
+import os
+import time
+from types import SimpleNamespace
+
+from ai_service import AIService
+
+TURNS = int(os.getenv("BENCH_TURNS", "8"))
+# Stub latencies in seconds: analysis call, reply time to first token, per streamed token
+ANALYSIS_LATENCY = float(os.getenv("BENCH_ANALYSIS_LATENCY", "0.6"))
+FIRST_TOKEN_LATENCY = float(os.getenv("BENCH_FIRST_TOKEN_LATENCY", "0.4"))
+TOKEN_LATENCY = float(os.getenv("BENCH_TOKEN_LATENCY", "0.01"))
+
+ANSWERS = ["I'd use a hash map keyed by user id.", "Honestly I'm not sure, maybe a queue?",
+           "We sharded Postgres by tenant and added read replicas.", "I think recursion works here."]
+REPLY = "That makes sense. How would that behave under heavy write load, and what would you monitor?"
+ANALYSIS = json.dumps({"emotional_tone": "confident", "technical_depth": "intermediate", "clarity": "clear",
+                       "intent": "answer", "needs_followup": True, "suggested_response_style": "challenging"})
+
+
+class _StubStream:
+    def __init__(self, words):
+        self.words = words
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        await asyncio.sleep(FIRST_TOKEN_LATENCY)
+        for word in self.words:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word))])
+            await asyncio.sleep(TOKEN_LATENCY)
+
+
+class _StubCompletions:
+    """gpt-3.5-turbo calls are the analysis; everything else is the reply"""
+
+    async def create(self, model, messages, stream=False, **kwargs):
+        if model == "gpt-3.5-turbo":
+            await asyncio.sleep(ANALYSIS_LATENCY)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=ANALYSIS))])
+        words = [word + " " for word in REPLY.split()]
+        if stream:
+            return _StubStream(words)
+        await asyncio.sleep(FIRST_TOKEN_LATENCY + TOKEN_LATENCY * len(words))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=REPLY))])
+
+
+def _service(mode, analyzer):
+    service = AIService("sk-bench", model="gpt-4-turbo", analysis_mode=mode, input_analyzer=analyzer)
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=_StubCompletions()))
+    return service
+
+
+async def run_buffered(mode, analyzer):
+    service = _service(mode, analyzer)
+    latencies = []
+    for turn in range(TURNS):
+        start = time.perf_counter()
+        await service.generate_conversational_response(ANSWERS[turn % len(ANSWERS)], audio_duration=4)
+        latencies.append(time.perf_counter() - start)
+    await asyncio.sleep(ANALYSIS_LATENCY)  # let the last background analysis land
+    return latencies, service.analysis_stats()
+
+
+async def run_streaming(mode, analyzer):
+    service = _service(mode, analyzer)
+    first_tokens = []
+    for turn in range(TURNS):
+        start = time.perf_counter()
+        first = None
+        async for _ in service.stream_conversational_response(ANSWERS[turn % len(ANSWERS)], audio_duration=4):
+            if first is None:
+                first = time.perf_counter() - start
+        first_tokens.append(first)
+    await asyncio.sleep(ANALYSIS_LATENCY)
+    return first_tokens, service.analysis_stats()
+
+
+def _avg_ms(values):
+    return sum(values) / len(values) * 1000
+
+
+def main():
+    print("=" * 60)
+    print(f"[BENCH] TURN LATENCY ({TURNS} turns, analysis {ANALYSIS_LATENCY}s, "
+          f"first token {FIRST_TOKEN_LATENCY}s)")
+    print("=" * 60)
+
+    results = {}
+    for label, mode, analyzer in (("inline LLM analysis", "inline", "llm"),
+                                  ("concurrent LLM analysis", "concurrent", "llm"),
+                                  ("local analyzer", "inline", "local")):
+        buffered, stats = asyncio.run(run_buffered(mode, analyzer))
+        streaming, _ = asyncio.run(run_streaming(mode, analyzer))
+        results[label] = (_avg_ms(buffered), _avg_ms(streaming))
+        print(f"\n{label}")
+        print(f"   buffered reply               {results[label][0]:>10,.0f} ms/turn")
+        print(f"   streamed first token         {results[label][1]:>10,.0f} ms/turn")
+        print(f"   prompts steered by own turn  {stats['fresh']:>10} / {stats['fresh'] + stats['carried_over']}")
+        print(f"   analysis                     {stats['analysis_avg_ms']:>10,.3f} ms avg")
+
+    baseline = results["inline LLM analysis"]
+    print()
+    for label in ("concurrent LLM analysis", "local analyzer"):
+        print(f"   {label}: {baseline[0] / results[label][0]:.2f}x buffered, "
+              f"{baseline[1] / results[label][1]:.2f}x first token")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ import logging
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 import os
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -62,6 +63,15 @@ class InterviewDatabase:
                 ON interviews(user_id)
             """)
 
+            # Cached skill extraction results keyed by normalized description hash
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS skill_extractions (
+                    key TEXT PRIMARY KEY,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+
             conn.commit()
             logger.info(f"✅ Database initialized at {self.db_path}")
         except Exception as e:
@@ -236,6 +246,38 @@ class InterviewDatabase:
                 "average_duration_seconds": 0,
             }
 
+    def get_skill_extraction(self, key: str, max_age: float) -> Optional[Dict]:
+        """Cached skill extraction result, if stored within max_age seconds"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT result FROM skill_extractions WHERE key = ? AND created_at >= ?",
+                (key, time.time() - max_age),
+            )
+            row = cursor.fetchone()
+            conn.close()
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            logger.error(f"❌ Failed to get skill extraction: {e}")
+            return None
+
+    def save_skill_extraction(self, key: str, result: Dict) -> bool:
+        """Store a skill extraction result"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT OR REPLACE INTO skill_extractions (key, result, created_at)
+                VALUES (?, ?, ?)
+            """, (key, json.dumps(result), time.time()))
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            logger.error(f"❌ Failed to save skill extraction: {e}")
+            return False
+
 
 # Initialize database
 db = InterviewDatabase()
@@ -7,6 +7,7 @@ import logging
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 import os
+import time
 import json
 from supabase import create_client, Client
 import uuid
@@ -159,6 +160,31 @@ class InterviewDatabase:
             logger.error(f"❌ Failed to get user stats: {e}")
             return {'total_interviews': 0, 'total_duration': 0, 'avg_duration': 0}
 
+    def get_skill_extraction(self, key: str, max_age: float) -> Optional[Dict]:
+        """Cached skill extraction result, if stored within max_age seconds"""
+        try:
+            oldest = datetime.utcfromtimestamp(time.time() - max_age).isoformat()
+            response = self.client.table('skill_extractions').select('result').eq(
+                'key', key
+            ).gte('created_at', oldest).limit(1).execute()
+            return response.data[0]['result'] if response.data else None
+        except Exception as e:
+            logger.error(f"❌ Failed to get skill extraction: {e}")
+            return None
+
+    def save_skill_extraction(self, key: str, result: Dict) -> bool:
+        """Store a skill extraction result"""
+        try:
+            self.client.table('skill_extractions').upsert({
+                'key': key,
+                'result': result,
+                'created_at': datetime.utcnow().isoformat()
+            }).execute()
+            return True
+        except Exception as e:
+            logger.error(f"❌ Failed to save skill extraction: {e}")
+            return False
+
 
 # Initialize database instance
 db = InterviewDatabase()
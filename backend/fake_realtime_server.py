@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Minimal stand-in for the OpenAI Realtime WebSocket API
+Speaks just enough of the protocol to exercise the /ws/realtime proxy
+locally: run it, then start main.py with
+OPENAI_REALTIME_URL=ws://127.0.0.1:9100/v1/realtime
+"""
+
+import asyncio
+import base64
+import json
+import os
+import sys
+import uuid
+
+from websockets.asyncio.server import serve
+
+FAKE_REALTIME_HOST = os.getenv("FAKE_REALTIME_HOST", "127.0.0.1")
+FAKE_REALTIME_PORT = int(os.getenv("FAKE_REALTIME_PORT", "9100"))
+# Audio deltas sent per response.create
+FAKE_AUDIO_DELTAS = int(os.getenv("FAKE_AUDIO_DELTAS", "5"))
+
+
+def _event(event_type: str, **fields) -> str:
+    return json.dumps({"event_id": f"event_{uuid.uuid4().hex[:12]}", "type": event_type, **fields})
+
+
+async def handle_session(ws):
+    """One fake realtime session per connection"""
+    session = {"id": f"sess_{uuid.uuid4().hex[:12]}", "model": "gpt-4o-realtime-preview",
+               "instructions": "", "voice": "alloy"}
+    await ws.send(_event("session.created", session=session))
+
+    audio_bytes = 0
+    async for message in ws:
+        if isinstance(message, bytes):
+            await ws.send(_event("error", error={"message": "binary frames not supported"}))
+            continue
+        try:
+            msg = json.loads(message)
+        except ValueError:
+            await ws.send(_event("error", error={"message": "invalid JSON"}))
+            continue
+
+        msg_type = msg.get("type")
+        if msg_type == "session.update":
+            session.update(msg.get("session", {}))
+            await ws.send(_event("session.updated", session=session))
+        elif msg_type == "input_audio_buffer.append":
+            audio_bytes += len(base64.b64decode(msg.get("audio", "")))
+        elif msg_type == "input_audio_buffer.commit":
+            await ws.send(_event("input_audio_buffer.committed", audio_bytes=audio_bytes))
+            audio_bytes = 0
+        elif msg_type == "response.create":
+            response_id = f"resp_{uuid.uuid4().hex[:12]}"
+            await ws.send(_event("response.created", response={"id": response_id}))
+            chunk = base64.b64encode(b"\x00\x00" * 480).decode("ascii")
+            for _ in range(FAKE_AUDIO_DELTAS):
+                await ws.send(_event("response.audio.delta", response_id=response_id, delta=chunk))
+            await ws.send(_event("response.content_part.done", response_id=response_id,
+                                 content_part={"type": "text",
+                                               "text": "Could you describe a project you are proud of?"}))
+            await ws.send(_event("response.done", response={"id": response_id, "status": "completed"}))
+
+
+async def start_server(host: str = FAKE_REALTIME_HOST, port: int = FAKE_REALTIME_PORT):
+    """Start the fake server; returns the websockets Server (close() it when done)"""
+    return await serve(handle_session, host, port, subprotocols=["realtime"])
+
+
+async def main():
+    server = await start_server()
+    port = server.sockets[0].getsockname()[1]
+    print(f"[FAKE] Realtime server listening on ws://{FAKE_REALTIME_HOST}:{port}/v1/realtime")
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        sys.exit(0)
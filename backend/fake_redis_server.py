@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Minimal Redis-compatible server for exercising the shared session registry
+Speaks RESP2 and just the commands session_store.py uses, so several proxy
+workers can share a registry locally without installing Redis: run it, then
+start the proxy with SESSION_STORE=redis SESSION_STORE_URL=redis://127.0.0.1:6390/0
+"""
+
+import asyncio
+import fnmatch
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+FAKE_REDIS_HOST = os.getenv("FAKE_REDIS_HOST", "127.0.0.1")
+FAKE_REDIS_PORT = int(os.getenv("FAKE_REDIS_PORT", "6390"))
+
+
+class _Data:
+    """Keyspace shared by every connection, with lazy expiry"""
+
+    def __init__(self):
+        self.values: Dict[bytes, object] = {}
+        self.expires: Dict[bytes, float] = {}
+
+    def get(self, key: bytes):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+        return self.values.get(key)
+
+    def set(self, key: bytes, value, ttl: Optional[float] = None):
+        self.values[key] = value
+        if ttl is None:
+            self.expires.pop(key, None)
+        else:
+            self.expires[key] = time.monotonic() + ttl
+
+    def delete(self, key: bytes) -> int:
+        self.expires.pop(key, None)
+        return 1 if self.values.pop(key, None) is not None else 0
+
+
+def _encode(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool):
+        return b":%d\r\n" % value
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, (list, set)):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(item) for item in value)
+    if isinstance(value, Exception):
+        return b"-ERR %s\r\n" % str(value).encode()
+    return b"+%s\r\n" % str(value).encode()
+
+
+def _run(data: _Data, args: List[bytes]):
+    command = args[0].upper()
+    if command == b"PING":
+        return "PONG"
+    if command in (b"SELECT", b"CLIENT"):
+        return "OK"
+    if command == b"GET":
+        value = data.get(args[1])
+        return value if value is None or isinstance(value, bytes) else Exception("WRONGTYPE")
+    if command == b"MGET":
+        return [value if isinstance(value, bytes) else None for value in map(data.get, args[1:])]
+    if command == b"SET":
+        key, value, ttl, options = args[1], args[2], None, [a.upper() for a in args[3:]]
+        if b"NX" in options and data.get(key) is not None:
+            return None
+        if b"XX" in options and data.get(key) is None:
+            return None
+        for unit, scale in ((b"EX", 1.0), (b"PX", 0.001)):
+            if unit in options:
+                ttl = float(options[options.index(unit) + 1]) * scale
+        data.set(key, value, ttl)
+        return "OK"
+    if command == b"DEL":
+        return sum(data.delete(key) for key in args[1:])
+    if command == b"EXISTS":
+        return sum(data.get(key) is not None for key in args[1:])
+    if command == b"EXPIRE":
+        value = data.get(args[1])
+        if value is None:
+            return 0
+        data.set(args[1], value, float(args[2]))
+        return 1
+    if command == b"KEYS":
+        pattern = args[1].decode()
+        return [key for key in list(data.values)
+                if data.get(key) is not None and fnmatch.fnmatchcase(key.decode(), pattern)]
+    if command in (b"SADD", b"SREM", b"SMEMBERS", b"SCARD"):
+        members = data.get(args[1])
+        if members is None:
+            members = set()
+        elif not isinstance(members, set):
+            return Exception("WRONGTYPE")
+        if command == b"SADD":
+            before = len(members)
+            members.update(args[2:])
+            data.values[args[1]] = members
+            return len(members) - before
+        if command == b"SREM":
+            before = len(members)
+            members.difference_update(args[2:])
+            if not members:
+                data.delete(args[1])
+            return before - len(members)
+        return members if command == b"SMEMBERS" else len(members)
+    if command == b"FLUSHALL":
+        data.values.clear()
+        data.expires.clear()
+        return "OK"
+    return Exception(f"unknown command '{args[0].decode()}'")
+
+
+async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.split()  # inline command (e.g. redis-cli over telnet)
+    args = []
+    for _ in range(int(line[1:])):
+        size = int((await reader.readline())[1:])
+        args.append((await reader.readexactly(size + 2))[:-2])
+    return args
+
+
+def _handler(data: _Data):
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                args = await _read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                try:
+                    reply = _run(data, args)
+                except (IndexError, ValueError):
+                    reply = Exception("syntax error")
+                writer.write(_encode(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    return handle
+
+
+async def start_server(host: str = FAKE_REDIS_HOST, port: int = FAKE_REDIS_PORT):
+    """Start the fake server; returns the asyncio Server (close() it when done)"""
+    return await asyncio.start_server(_handler(_Data()), host, port)
+
+
+async def main():
+    server = await start_server()
+    port = server.sockets[0].getsockname()[1]
+    print(f"[FAKE] Redis-compatible server listening on redis://{FAKE_REDIS_HOST}:{port}/0")
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,126 @@
+"""
+Asynchronous guardrail validation side-channel for the realtime proxy
+Runs validate_ai_response off the event loop so relaying never waits on regexes
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from guardrails import validate_ai_response
+
+logger = logging.getLogger(__name__)
+
+GUARDRAIL_WORKERS = int(os.getenv("GUARDRAIL_WORKERS", "2"))
+# Texts waiting beyond this are dropped (and counted) rather than queued
+GUARDRAIL_MAX_PENDING = int(os.getenv("GUARDRAIL_MAX_PENDING", "1000"))
+# "thread" keeps things simple; "process" sidesteps the GIL on busy nodes
+GUARDRAIL_EXECUTOR = os.getenv("GUARDRAIL_EXECUTOR", "thread").lower()
+# Most recent results kept on each session record
+GUARDRAIL_RESULTS_PER_SESSION = 50
+
+
+class GuardrailWorker:
+    """
+    Bounded queue of AI texts plus a few workers validating them in an
+    executor. submit() never blocks; results land on the session record
+    (session.guardrails) along with how long they waited.
+    """
+
+    def __init__(self, workers: int = GUARDRAIL_WORKERS, max_pending: int = GUARDRAIL_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[Executor] = None
+        self._tasks = []
+        self._stats = {"checked": 0, "violations": 0, "dropped": 0, "errors": 0,
+                       "lag_max": 0.0, "lag_total": 0.0}
+
+    async def start(self):
+        """Start the executor and worker tasks"""
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        if GUARDRAIL_EXECUTOR == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="guardrails")
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        logger.info(f"✅ Guardrail worker started ({self.workers} {GUARDRAIL_EXECUTOR} workers)")
+
+    async def stop(self):
+        """Cancel workers and shut the executor down"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, session, text: str) -> bool:
+        """Queue a text for validation; returns False if it had to be dropped"""
+        if self._queue is None:
+            return False
+        try:
+            self._queue.put_nowait((session, text, time.monotonic()))
+            return True
+        except asyncio.QueueFull:
+            self._stats["dropped"] += 1
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus average/max validation lag in seconds"""
+        checked = self._stats["checked"]
+        return {
+            "checked": checked,
+            "violations": self._stats["violations"],
+            "dropped": self._stats["dropped"],
+            "errors": self._stats["errors"],
+            "pending": self._queue.qsize() if self._queue else 0,
+            "lag_avg": round(self._stats["lag_total"] / checked, 4) if checked else 0.0,
+            "lag_max": round(self._stats["lag_max"], 4),
+        }
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            session, text, queued_at = await self._queue.get()
+            try:
+                validation = await loop.run_in_executor(self._executor, validate_ai_response, text)
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.error(f"❌ Guardrail validation failed: {e}")
+                continue
+
+            lag = time.monotonic() - queued_at
+            self._stats["checked"] += 1
+            self._stats["lag_total"] += lag
+            self._stats["lag_max"] = max(self._stats["lag_max"], lag)
+
+            result = {
+                "at": time.time(),
+                "is_valid": validation.is_valid,
+                "severity": validation.severity,
+                "violations": validation.violations,
+                "lag": round(lag, 4),
+            }
+            # Only the latest results are kept; the count covers every check
+            session.guardrails.append(result)
+            del session.guardrails[:-GUARDRAIL_RESULTS_PER_SESSION]
+            session.guardrail_checks += 1
+
+            label = getattr(session, "session_id", "?")
+            if validation.is_valid:
+                logger.info(f"   ✅ Guardrails validated [{label}] (lag {lag * 1000:.1f}ms)")
+            else:
+                self._stats["violations"] += 1
+                session.guardrail_violations += 1
+                logger.warning(f"   ⚠️ Guardrail violations [{label}] ({validation.severity}):")
+                for violation in validation.violations:
+                    logger.warning(f"      - {violation}")
@@ -0,0 +1,245 @@
+"""
+Local heuristic analysis of candidate answers
+Produces the same dict as the LLM analyzer in AIService.analyze_user_input
+(emotional_tone, technical_depth, clarity, intent, needs_followup,
+suggested_response_style, speaking_pace) from lexical features: hedging and
+filler counts, technical-term density against a vocabulary index (the skill
+taxonomy plus interview concepts, matched in one Aho-Corasick pass) and
+speaking pace from the audio duration.
+"""
+
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from skill_taxonomy import MultiPatternIndex, SKILL_TAXONOMY
+
+logger = logging.getLogger(__name__)
+
+# "local" (heuristics, no API call) or "llm" (gpt-3.5-turbo per answer)
+INPUT_ANALYZER = os.getenv("INPUT_ANALYZER", "local").lower()
+# Fraction of answers also sent to the LLM analyzer to measure agreement (local mode)
+INPUT_ANALYZER_CALIBRATION_RATE = float(os.getenv("INPUT_ANALYZER_CALIBRATION_RATE", "0"))
+
+# Interview vocabulary on top of the skill taxonomy; advanced terms signal depth
+BASIC_TERMS = (
+    "algorithm", "array", "list", "loop", "variable", "function", "method", "class", "object", "string",
+    "integer", "database", "table", "query", "api", "endpoint", "server", "client", "frontend", "backend",
+    "framework", "library", "bug", "debug", "test", "unit test", "deploy", "git", "branch", "code review",
+)
+INTERMEDIATE_TERMS = (
+    "hash map", "hashmap", "hash table", "dictionary", "linked list", "binary search", "binary tree", "tree",
+    "graph", "stack", "queue", "heap", "recursion", "recursive", "sorting", "big o", "time complexity",
+    "space complexity", "index", "indexes", "join", "foreign key", "normalization", "cache", "caching",
+    "thread", "threads", "async", "asynchronous", "callback", "promise", "rest api", "microservice",
+    "microservices", "load balancer", "latency", "throughput", "pagination", "transaction", "schema",
+    "inheritance", "polymorphism", "interface", "dependency injection", "design pattern", "ci/cd",
+    "container", "containers", "integration test", "mock", "refactor", "o(n)", "o(1)", "o(log n)",
+)
+ADVANCED_TERMS = (
+    "amortized", "dynamic programming", "memoization", "trie", "b-tree", "bloom filter", "consistent hashing",
+    "sharding", "sharded", "partitioning", "replication", "replica", "replicas", "eventual consistency",
+    "strong consistency", "cap theorem", "consensus", "raft", "paxos", "idempotent", "idempotency",
+    "race condition", "deadlock", "mutex", "semaphore", "lock-free", "backpressure", "event loop",
+    "garbage collection", "memory leak", "isolation level", "write-ahead log", "two-phase commit",
+    "circuit breaker", "rate limiting", "horizontal scaling", "vertical scaling", "p99", "tail latency",
+    "o(n log n)", "event sourcing", "cqrs", "message broker", "dead letter queue", "zero downtime",
+)
+HEDGES = (
+    "i think", "maybe", "probably", "perhaps", "i guess", "kind of", "sort of", "i'm not sure", "not sure",
+    "i don't know", "i dont know", "not really sure", "might", "possibly", "i believe", "i suppose",
+    "if i remember", "i'm not certain", "no idea", "i forgot", "hopefully",
+)
+STRONG_HEDGES = ("i'm not sure", "not sure", "i don't know", "i dont know", "no idea", "not really sure",
+                 "i'm not certain", "i forgot")
+CONFIDENT = (
+    "definitely", "certainly", "clearly", "i would", "i'd", "i built", "i implemented", "i designed",
+    "i led", "we built", "we used", "i used", "the key is", "the trick is", "the main reason",
+    "because", "for example", "in production", "i've done", "i have done",
+)
+FILLERS = ("um", "uh", "erm", "hmm", "uhm", "you know", "like i said")
+CLARIFY = (
+    "what do you mean", "could you repeat", "can you repeat", "say that again", "can you clarify",
+    "could you clarify", "rephrase", "didn't catch", "didn't understand", "not sure what you mean",
+    "do you mean", "sorry, what",
+)
+SMALL_TALK = (
+    "hello", "hi", "hey", "good morning", "good afternoon", "good evening", "how are you", "nice to meet you",
+    "thank you", "thanks", "i'm good", "i'm fine", "doing well", "bye", "goodbye",
+)
+QUESTION_STARTS = ("what", "why", "how", "when", "where", "which", "who", "can you", "could you",
+                   "should i", "do you", "is it", "are you", "would you")
+
+# Tech weights per vocabulary tier (taxonomy skills count as intermediate)
+TERM_WEIGHTS = {"basic": 0.5, "intermediate": 1.0, "advanced": 2.0}
+# Words per second above which an answer sounds rushed
+RUSHED_WPS = float(os.getenv("INPUT_ANALYZER_RUSHED_WPS", "3.6"))
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9'+#./-]*")
+_SENTENCE = re.compile(r"[.!?]+(?:\s|$)")
+_QUESTION_START = re.compile(r"^(?:%s)\b" % "|".join(re.escape(start) for start in QUESTION_STARTS))
+
+ANALYSIS_FIELDS = ("emotional_tone", "technical_depth", "clarity", "intent", "needs_followup",
+                   "suggested_response_style")
+
+
+def compile_vocabulary() -> MultiPatternIndex:
+    """One index over every cue phrase and technical term: (phrase, (category, weight))"""
+    patterns: List[Tuple[str, Tuple[str, float]]] = []
+    for aliases in SKILL_TAXONOMY.values():
+        patterns += [(alias, ("tech", TERM_WEIGHTS["intermediate"])) for alias in aliases if not alias.startswith("~")]
+    for tier, terms in (("basic", BASIC_TERMS), ("intermediate", INTERMEDIATE_TERMS), ("advanced", ADVANCED_TERMS)):
+        patterns += [(term, ("tech", TERM_WEIGHTS[tier])) for term in terms]
+    patterns += [(phrase, ("hedge", 1.0)) for phrase in HEDGES if phrase not in STRONG_HEDGES]
+    patterns += [(phrase, ("strong_hedge", 1.0)) for phrase in STRONG_HEDGES]
+    for category, phrases in (("confident", CONFIDENT), ("filler", FILLERS),
+                              ("clarify", CLARIFY), ("small_talk", SMALL_TALK)):
+        patterns += [(phrase, (category, 1.0)) for phrase in phrases]
+    return MultiPatternIndex(patterns)
+
+
+class LocalInputAnalyzer:
+    """
+    analyze() returns the analysis dict with "source": "local". Pass LLM
+    results for the same answers to calibrate() to track agreement per field.
+    """
+
+    def __init__(self, index: Optional[MultiPatternIndex] = None, rushed_wps: float = RUSHED_WPS):
+        self.index = index or DEFAULT_VOCABULARY
+        self.rushed_wps = rushed_wps
+        self._stats = {"analyses": 0, "seconds": 0.0, "calibrated": 0}
+        self._agreement = {field: 0 for field in ANALYSIS_FIELDS}
+
+    def features(self, user_input: str, audio_duration: float = 0) -> Dict[str, Any]:
+        """Counts the heuristics are built on"""
+        text = (user_input or "").lower().replace("’", "'")
+        counts = {"tech": 0.0, "hedge": 0, "strong_hedge": 0, "confident": 0, "filler": 0, "clarify": 0,
+                  "small_talk": 0}
+        terms, advanced = set(), 0
+        for start, end, (category, weight) in self.index.find_longest(text):
+            if category == "tech":
+                counts["tech"] += weight
+                # Basic vocabulary adds to density but not to the distinct-term count
+                if weight >= TERM_WEIGHTS["intermediate"]:
+                    terms.add(text[start:end])
+                advanced += weight >= TERM_WEIGHTS["advanced"]
+            else:
+                counts[category] += 1
+        # Strong hedges ("not sure") are hedges too
+        counts["hedge"] += counts["strong_hedge"]
+        words = len(_WORD.findall(text))
+        stripped = text.strip()
+        return {
+            **counts,
+            "words": words,
+            "sentences": max(1, len(_SENTENCE.findall(stripped + " "))),
+            "terms": len(terms),
+            "advanced_terms": advanced,
+            "tech_density": counts["tech"] / words if words else 0.0,
+            "question": stripped.endswith("?") or bool(_QUESTION_START.match(stripped)),
+            "words_per_second": words / audio_duration if audio_duration > 0 else 0.0,
+        }
+
+    def analyze(self, user_input: str, audio_duration: float = 0) -> Dict[str, Any]:
+        started = time.perf_counter()
+        f = self.features(user_input, audio_duration)
+        words = f["words"]
+
+        if f["clarify"]:
+            intent = "clarification"
+        elif f["small_talk"] and not f["terms"] and words <= 12:
+            intent = "small_talk"
+        elif f["question"] and words <= 30 and f["terms"] <= 2:
+            intent = "question"
+        else:
+            intent = "answer"
+
+        if not f["terms"]:
+            depth = "basic" if intent == "answer" and (words >= 12 or f["tech"]) else "none"
+        elif f["advanced_terms"] >= 2 or (f["advanced_terms"] and f["terms"] >= 4):
+            depth = "advanced"
+        elif f["terms"] >= 3 or (f["terms"] >= 2 and f["tech_density"] >= 0.08):
+            depth = "intermediate"
+        else:
+            depth = "basic"
+
+        filler_ratio = f["filler"] / words if words else 0.0
+        if (words < 3 and intent == "answer") or filler_ratio > 0.15:
+            clarity = "unclear"
+        elif filler_ratio > 0.06 or f["hedge"] >= 3 or words / f["sentences"] > 45:
+            clarity = "somewhat_clear"
+        else:
+            clarity = "clear"
+
+        if f["strong_hedge"] or f["hedge"] >= 2 or (f["hedge"] and words < 15):
+            tone = "unsure"
+        elif words >= 8 and f["words_per_second"] > self.rushed_wps:
+            tone = "rushed"
+        elif f["confident"] and not f["hedge"] and depth in ("intermediate", "advanced"):
+            tone = "confident"
+        elif words >= 40 and f["hedge"] <= 1:
+            tone = "thoughtful"
+        else:
+            tone = "neutral"
+
+        if intent == "clarification" or clarity == "unclear":
+            style = "clarifying"
+        elif tone == "unsure":
+            style = "encouraging"
+        elif tone == "confident" or depth == "advanced":
+            style = "challenging"
+        else:
+            style = "neutral"
+
+        analysis = {
+            "emotional_tone": tone,
+            "technical_depth": depth,
+            "clarity": clarity,
+            "intent": intent,
+            "needs_followup": intent == "answer" and (depth in ("none", "basic") or clarity != "clear"
+                                                      or tone == "unsure" or words < 25),
+            "suggested_response_style": style,
+            "source": "local",
+        }
+        if audio_duration > 0:
+            analysis["speaking_pace"] = speaking_pace(audio_duration)
+        self._stats["analyses"] += 1
+        self._stats["seconds"] += time.perf_counter() - started
+        return analysis
+
+    def calibrate(self, local: Dict[str, Any], llm: Dict[str, Any]) -> List[str]:
+        """Record agreement with an LLM analysis of the same answer; returns the fields that differ"""
+        self._stats["calibrated"] += 1
+        differing = []
+        for field in ANALYSIS_FIELDS:
+            if local.get(field) == llm.get(field):
+                self._agreement[field] += 1
+            else:
+                differing.append(field)
+        return differing
+
+    def stats(self) -> Dict[str, Any]:
+        analyses = self._stats["analyses"]
+        calibrated = self._stats["calibrated"]
+        return {
+            "analyses": analyses,
+            "avg_us": round(self._stats["seconds"] / analyses * 1e6, 1) if analyses else 0.0,
+            "calibrated": calibrated,
+            "agreement": {field: round(agreed / calibrated, 3) for field, agreed in self._agreement.items()}
+            if calibrated else {},
+            "patterns": self.index.size,
+        }
+
+
+def speaking_pace(audio_duration: float) -> str:
+    """Pace label from answer length in seconds (shared with the LLM analyzer)"""
+    if audio_duration < 2:
+        return "brief"
+    if audio_duration > 10:
+        return "detailed"
+    return "normal"
+
+
+DEFAULT_VOCABULARY = compile_vocabulary()
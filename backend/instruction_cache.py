@@ -0,0 +1,102 @@
+"""
+Server-side interview instructions for the realtime proxy
+Browsers send a session.update naming only the skills to assess; the proxy
+builds the instructions with generate_interview_instructions(skills) and
+caches the JSON-encoded blob per skill-set hash, so identical multi-kilobyte
+instructions are generated, validated and serialized once.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from guardrails import generate_interview_instructions, validate_instructions_format
+
+logger = logging.getLogger(__name__)
+
+# Distinct skill sets kept encoded (least recently used are evicted)
+INSTRUCTION_CACHE_SIZE = int(os.getenv("INSTRUCTION_CACHE_SIZE", "512"))
+
+
+def normalize_skills(skills: List[Any]) -> List[Dict[str, str]]:
+    """Keep only the fields the instructions use, in order; anything but a list gives []"""
+    if not isinstance(skills, (list, tuple)):
+        return []
+    normalized = []
+    for skill in skills:
+        if isinstance(skill, str):
+            skill = {"name": skill}
+        if not isinstance(skill, dict):
+            continue
+        name = str(skill.get("name", "")).strip()
+        if name:
+            normalized.append({"name": name, "reason": str(skill.get("reason") or "Required").strip()})
+    return normalized
+
+
+def skills_key(skills: List[Dict[str, str]]) -> str:
+    """Stable hash of a normalized skill set"""
+    canonical = json.dumps(skills, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+class InstructionCache:
+    """LRU of JSON-encoded instruction strings keyed by skill-set hash"""
+
+    def __init__(self, max_size: int = INSTRUCTION_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes_reused": 0}
+
+    def encoded_instructions(self, skills: List[Any]) -> Tuple[str, str]:
+        """(skill-set hash, instructions as a JSON string literal)"""
+        normalized = normalize_skills(skills)
+        key = skills_key(normalized)
+        encoded = self._entries.get(key)
+        if encoded is not None:
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            self._stats["bytes_reused"] += len(encoded)
+            return key, encoded
+
+        self._stats["misses"] += 1
+        instructions = generate_interview_instructions(normalized)
+        is_valid, issues = validate_instructions_format(instructions)
+        if not is_valid:
+            logger.warning(f"⚠️ Generated instructions for {key} failed validation: {issues}")
+        encoded = json.dumps(instructions)
+        self._entries[key] = encoded
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+        return key, encoded
+
+    def session_update(self, event: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """
+        Expand a browser session.update carrying "skills" instead of
+        "instructions" into the frame sent upstream; returns (key, frame) or
+        None if the event should be relayed as is. The cached blob is spliced
+        in as text, so only the browser's small fields are serialized.
+        """
+        session = event.get("session")
+        if not isinstance(session, dict) or "skills" not in session or "instructions" in session:
+            return None
+        key, encoded = self.encoded_instructions(session["skills"])
+
+        fields = {k: v for k, v in session.items() if k != "skills"}
+        session_prefix = json.dumps(fields)[1:-1]
+        if session_prefix:
+            session_prefix += ", "
+        top = {k: v for k, v in event.items() if k not in ("type", "session")}
+        top_prefix = json.dumps(top)[1:-1]
+        if top_prefix:
+            top_prefix += ", "
+        frame = (f'{{{top_prefix}"type": "session.update", '
+                 f'"session": {{{session_prefix}"instructions": {encoded}}}}}')
+        return key, frame
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "entries": len(self._entries), "max_size": self.max_size}
@@ -0,0 +1,213 @@
+"""
+Event-loop lag monitor and slow-callback profiler
+A task sleeps for a fixed interval and measures how late it wakes up; the
+overshoot is how long ready callbacks waited for the loop. A watchdog thread
+notices when that task has not run for longer than the threshold and grabs
+the loop thread's current stack, i.e. the callback that is blocking it.
+Both can be switched on and off at runtime (POST /admin/loop-monitor).
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+# Weight of the newest sample in the smoothed lag
+LOOP_LAG_SMOOTHING = float(os.getenv("LOOP_LAG_SMOOTHING", "0.2"))
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+# Capture the loop thread's stack when it is blocked longer than this
+LOOP_MONITOR_STACKS = os.getenv("LOOP_MONITOR_STACKS", "true").lower() == "true"
+LOOP_MONITOR_THRESHOLD_MS = float(os.getenv("LOOP_MONITOR_THRESHOLD_MS", "100"))
+# Distinct blocking stacks kept (least recently seen are evicted)
+LOOP_MONITOR_MAX_TRACES = int(os.getenv("LOOP_MONITOR_MAX_TRACES", "50"))
+LOOP_MONITOR_STACK_DEPTH = 12
+
+# Lag histogram bucket upper bounds, in seconds
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class LagHistogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    def __init__(self, buckets=LAG_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[tuple]:
+        """[(upper bound, observations <= bound)], ending with +Inf"""
+        total, result = 0, []
+        for bound, count in zip(list(self.buckets) + [float("inf")], self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class LoopLagMonitor:
+    """Samples scheduling delay of the running loop and profiles long stalls"""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, smoothing: float = LOOP_LAG_SMOOTHING,
+                 enabled: bool = LOOP_MONITOR_ENABLED, stack_traces: bool = LOOP_MONITOR_STACKS,
+                 threshold_ms: float = LOOP_MONITOR_THRESHOLD_MS):
+        self.interval = interval
+        self.smoothing = smoothing
+        self.enabled = enabled
+        self.stack_traces = stack_traces
+        self.threshold = threshold_ms / 1000
+        self.lag = 0.0
+        self.lag_smoothed = 0.0
+        self.lag_max = 0.0
+        self.samples = 0
+        self.histogram = LagHistogram()
+        self.stalls = 0
+        self.stall_seconds = 0.0
+        self._traces: Dict[tuple, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._beat = time.monotonic()
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_watchdog = threading.Event()
+
+    async def start(self):
+        self._loop_thread = threading.get_ident()
+        if self.enabled and self._task is None:
+            self._beat = time.monotonic()
+            self._task = asyncio.create_task(self._sample_loop())
+        if self.enabled and self.stack_traces and self._watchdog is None:
+            self._stop_watchdog.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog:
+            self._stop_watchdog.set()
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def configure(self, enabled: Optional[bool] = None, stack_traces: Optional[bool] = None,
+                        threshold_ms: Optional[float] = None) -> Dict[str, Any]:
+        """Change settings at runtime; turning the monitor off also zeroes the lag readings"""
+        await self.stop()
+        if enabled is not None:
+            self.enabled = enabled
+        if stack_traces is not None:
+            self.stack_traces = stack_traces
+        if threshold_ms is not None:
+            self.threshold = max(1.0, threshold_ms) / 1000
+        if not self.enabled:
+            self.lag = self.lag_smoothed = 0.0
+        await self.start()
+        logger.info(f"🩺 Loop monitor {'on' if self.enabled else 'off'} "
+                    f"(stack traces {'on' if self.stack_traces else 'off'}, threshold {self.threshold * 1000:.0f}ms)")
+        return self.stats()
+
+    def record(self, lag: float):
+        self.samples += 1
+        self.lag = lag
+        self.lag_smoothed += self.smoothing * (lag - self.lag_smoothed)
+        self.lag_max = max(self.lag_max, lag)
+        self.histogram.observe(lag)
+        if lag >= self.threshold:
+            self.stalls += 1
+            self.stall_seconds += lag
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "stack_traces": self.stack_traces,
+            "threshold_ms": round(self.threshold * 1000, 1),
+            "lag": round(self.lag, 4),
+            "lag_smoothed": round(self.lag_smoothed, 4),
+            "lag_max": round(self.lag_max, 4),
+            "samples": self.samples,
+            "stalls": self.stalls,
+            "stall_seconds": round(self.stall_seconds, 3),
+            "traces": len(self._traces),
+        }
+
+    def traces(self) -> List[Dict[str, Any]]:
+        """Blocking stacks seen so far, worst (by total blocked time) first"""
+        with self._lock:
+            traces = [dict(trace) for trace in self._traces.values()]
+        traces.sort(key=lambda trace: trace["total_ms"], reverse=True)
+        return traces
+
+    async def _sample_loop(self):
+        while True:
+            started = time.monotonic()
+            self._beat = started
+            await asyncio.sleep(self.interval)
+            self._beat = time.monotonic()
+            self.record(max(0.0, self._beat - started - self.interval))
+
+    def _watch(self):
+        """Watchdog thread: snapshot the loop thread's stack while it is stuck"""
+        poll = max(0.005, self.threshold / 4)
+        stall_key = None
+        stall_beat = None
+        stall_ms = 0.0
+        while not self._stop_watchdog.wait(poll):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.threshold:
+                stall_key = None
+                continue
+            if beat == stall_beat and stall_key is not None:
+                # Same stall still going: extend its duration
+                blocked_ms = round(blocked * 1000, 1)
+                with self._lock:
+                    trace = self._traces.get(stall_key)
+                    if trace:
+                        trace["total_ms"] = round(trace["total_ms"] + blocked_ms - stall_ms, 1)
+                        trace["max_ms"] = max(trace["max_ms"], blocked_ms)
+                stall_ms = blocked_ms
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)[-LOOP_MONITOR_STACK_DEPTH:]
+            stall_key = tuple((f.filename, f.lineno, f.name) for f in stack)
+            stall_beat = beat
+            stall_ms = round(blocked * 1000, 1)
+            self._record_trace(stall_key, stack, blocked)
+
+    def _record_trace(self, key: tuple, stack, blocked: float):
+        blocked_ms = round(blocked * 1000, 1)
+        with self._lock:
+            trace = self._traces.pop(key, None)
+            if trace is None:
+                trace = {"count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                         "stack": traceback.format_list(stack)}
+            trace["count"] += 1
+            trace["total_ms"] = round(trace["total_ms"] + blocked_ms, 1)
+            trace["max_ms"] = max(trace["max_ms"], blocked_ms)
+            trace["last_seen"] = time.time()
+            # Re-inserting keeps the dict ordered by recency for eviction
+            self._traces[key] = trace
+            while len(self._traces) > LOOP_MONITOR_MAX_TRACES:
+                self._traces.pop(next(iter(self._traces)))
+        innermost = stack[-1]
+        logger.warning(f"🐢 Event loop blocked >{blocked_ms:.0f}ms in {innermost.name} "
+                       f"({os.path.basename(innermost.filename)}:{innermost.lineno})")
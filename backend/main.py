@@ -5,16 +5,41 @@ Interview AI Backend - Valitron-style WebSocket approach
 import os
 import logging
 from datetime import datetime
-from fastapi import FastAPI, HTTPException, WebSocket
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
-import httpx
 import asyncio
+import time
 import websockets
 import json
-from openai import OpenAI
-from guardrails import generate_interview_instructions, validate_ai_response, validate_instructions_format
+import secrets
+import functools
+from typing import List, Optional
+from guardrails import generate_interview_instructions, validate_instructions_format
+from realtime_relay import (
+    classify_frame, pump, pump_coalesced, RelaySession, active_sessions, parked_sessions,
+    negotiate_binary_audio, wrap_audio_append, extract_audio_delta,
+    CLIENT_INSPECTED_EVENTS, SERVER_INSPECTED_EVENTS, RESUME_GRACE_SECONDS,
+)
+from utils.logger import start_queue_logging, parse_sample_rates, EventLogSampler
+from openai_http import OpenAIHttpPool, OPENAI_API_BASE
+from token_pool import EphemeralTokenPool, token_expiry
+from upstream_pool import UpstreamPool
+from upstream_gate import UpstreamGate, UpstreamUnavailable
+from guardrail_worker import GuardrailWorker
+from instruction_cache import InstructionCache
+from ai_skill_extractor import SkillExtractor, ExtractionBusy, CACHE_NAMESPACE, EXTRACT_SKILLS_BATCH_MAX
+from skill_cache import SkillCache
+from skill_taxonomy import LocalSkillExtractor
+from loop_lag import LoopLagMonitor
+from admission import AdmissionController, AdmissionRejected
+from proxy_metrics import MetricsWriter, add_session_metrics, add_component_metrics, PROMETHEUS_CONTENT_TYPE
+from session_store import (
+    create_session_store, NodeRegistry, NODE_ID, AFFINITY_COOKIE, SESSION_STORE,
+    CLOSE_TRY_AGAIN_LATER, CLOSE_WRONG_NODE, CLOSE_WRONG_WORKER, CLOSE_SUPERSEDED,
+)
 
 # Setup logging first
 logging.basicConfig(level=logging.INFO)
@@ -27,6 +52,20 @@ if not OPENAI_API_KEY:
     logger.warning("⚠️ OPENAI_API_KEY not set in environment - WebSocket will fail")
     # Don't crash, let it fail gracefully with clear error
 
+# Per-event-type log sampling for the realtime proxy: log 1 in N frames of each type
+REALTIME_LOG_SAMPLE = parse_sample_rates(os.getenv(
+    "REALTIME_LOG_SAMPLE",
+    "input_audio_buffer.append=500,response.audio.delta=500,"
+    "response.audio_transcript.delta=100,response.text.delta=50",
+))
+REALTIME_LOG_MAX_LINES_PER_SEC = float(os.getenv("REALTIME_LOG_MAX_LINES_PER_SEC", "20"))
+
+# Upstream realtime endpoint (point at fake_realtime_server.py for local testing)
+OPENAI_REALTIME_URL = os.getenv("OPENAI_REALTIME_URL", "wss://api.openai.com/v1/realtime")
+
+# Bearer token required by the /admin endpoints (unset disables them)
+PROXY_ADMIN_TOKEN = os.getenv("PROXY_ADMIN_TOKEN")
+
 # Use Supabase by default
 try:
     from database_supabase import db
@@ -37,10 +76,38 @@ except Exception as e:
 
 from contextlib import asynccontextmanager
 
+# Shared connection pool for outbound OpenAI REST calls
+openai_http = OpenAIHttpPool(OPENAI_API_KEY)
+
+# /api/extract-skills on the shared pool, with a concurrency cap so bulk
+# job creation cannot starve the realtime relay. Clear-cut descriptions are
+# answered by the local taxonomy matcher and repeated ones from the cache
+# (in memory, then the skill_extractions table)
+skill_extractor = SkillExtractor(OPENAI_API_KEY, cache=SkillCache(db, namespace=CACHE_NAMESPACE),
+                                 local=LocalSkillExtractor())
+
+# How often a waiting HTTP request checks whether its client went away
+DISCONNECT_POLL_INTERVAL = 0.25
+
+# Validates AI responses against guardrails without blocking the relay loops
+guardrail_worker = GuardrailWorker()
+
+# Guardrail instructions built once per skill set for session.update injection
+instruction_cache = InstructionCache()
+
+# Per-worker/per-tenant session caps with a waiting room; sheds load on loop lag
+loop_lag = LoopLagMonitor()
+admission = AdmissionController(loop_lag)
+
+# Shared registry of relay sessions across workers/nodes (SESSION_STORE=memory|redis)
+node_registry = NodeRegistry(create_session_store(), active_sessions)
+
 # Startup/Shutdown events using lifespan
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    # Log records are handed to a background thread so the event loop never blocks on I/O
+    log_listener = start_queue_logging()
     logger.info("=" * 60)
     logger.info("🚀 INTERVIEW AI BACKEND (Valitron Style)")
     logger.info("=" * 60)
@@ -48,9 +115,25 @@ async def lifespan(app: FastAPI):
     logger.info("✅ Model: gpt-4o-realtime-preview")
     logger.info("✅ Database: SQLite")
     logger.info("=" * 60)
+    await openai_http.start()
+    skill_extractor.start(openai_http.client, OPENAI_API_BASE)
+    await guardrail_worker.start()
+    await node_registry.start()
+    await loop_lag.start()
+    if OPENAI_API_KEY:
+        await token_pool.start()
+        await upstream_pool.start()
     yield
     # Shutdown
     logger.info("🛑 Backend shutting down...")
+    await upstream_pool.stop()
+    await upstream_gate.stop()
+    await token_pool.stop()
+    await node_registry.stop()
+    await loop_lag.stop()
+    await guardrail_worker.stop()
+    await openai_http.close()
+    log_listener.stop()
 
 # Create FastAPI app with lifespan
 app = FastAPI(
@@ -64,6 +147,14 @@ app = FastAPI(
 class ExtractSkillsRequest(BaseModel):
     description: str
 
+class BatchExtractItem(BaseModel):
+    id: Optional[str] = None
+    description: str
+
+class BatchExtractSkillsRequest(BaseModel):
+    descriptions: List[str] = []
+    items: List[BatchExtractItem] = []
+
 class InterviewResult(BaseModel):
     id: str
     user_id: str
@@ -78,13 +169,6 @@ class UserData(BaseModel):
     email: str
     name: str
 
-# Initialize OpenAI client only if API key is set
-client = None
-if OPENAI_API_KEY:
-    client = OpenAI(api_key=OPENAI_API_KEY)
-else:
-    logger.warning("⚠️ OpenAI client not initialized - OPENAI_API_KEY not set")
-
 # Add CORS
 app.add_middleware(
     CORSMiddleware,
@@ -100,9 +184,146 @@ async def health():
         "status": "ok",
         "time": datetime.now().isoformat(),
         "openai_api_key_set": bool(OPENAI_API_KEY),
-        "openai_api_key_length": len(OPENAI_API_KEY) if OPENAI_API_KEY else 0
+        "openai_api_key_length": len(OPENAI_API_KEY) if OPENAI_API_KEY else 0,
+        "openai_http": openai_http.stats(),
+        "ephemeral_token_pool": token_pool.stats(),
+        "upstream_pool": upstream_pool.stats(),
+        "upstream_gate": upstream_gate.stats(),
+        "realtime_sessions": len(active_sessions),
+        "guardrails": guardrail_worker.stats(),
+        "skill_extractor": skill_extractor.stats(),
+        "skill_cache": skill_extractor.cache.stats(),
+        "skill_local_tier": skill_extractor.local.stats(),
+        "instruction_cache": instruction_cache.stats(),
+        "admission": admission.stats(),
+        "loop_lag": loop_lag.stats(),
+        "node": node_registry.stats(),
     }
 
+@app.get("/health/ready")
+async def ready():
+    """Readiness for load balancers: 503 while this node drains"""
+    if node_registry.draining:
+        return JSONResponse({"status": "draining", "node": NODE_ID}, status_code=503)
+    return {"status": "ready", "node": NODE_ID}
+
+def check_admin(request: Request):
+    # Fail closed: without a configured token nobody may drain or reconfigure the node
+    if not PROXY_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (PROXY_ADMIN_TOKEN not set)")
+    if not secrets.compare_digest(request.headers.get("authorization", ""), f"Bearer {PROXY_ADMIN_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Admin token required")
+
+@app.post("/admin/drain")
+async def drain_node(request: Request, draining: bool = True):
+    """
+    Stop taking new realtime sessions on this node (all workers) ahead of a
+    restart; live interviews continue until they end or DRAIN_TIMEOUT passes.
+    POST /admin/drain?draining=false cancels.
+    """
+    check_admin(request)
+    return await node_registry.drain(draining)
+
+@app.get("/admin/drain")
+async def drain_status(request: Request):
+    """Drain progress: poll until node_sessions reaches 0, then restart"""
+    check_admin(request)
+    return await node_registry.drain_status()
+
+@app.get("/admin/loop-monitor")
+async def loop_monitor_status(request: Request):
+    """Loop lag stats and the stacks that blocked the event loop, worst first"""
+    check_admin(request)
+    return {**loop_lag.stats(), "slow_callbacks": loop_lag.traces()}
+
+@app.post("/admin/loop-monitor")
+async def loop_monitor_configure(request: Request, enabled: Optional[bool] = None,
+                                 stack_traces: Optional[bool] = None, threshold_ms: Optional[float] = None):
+    """
+    Toggle the loop monitor at runtime, e.g.
+    POST /admin/loop-monitor?stack_traces=true&threshold_ms=50
+    """
+    check_admin(request)
+    return await loop_lag.configure(enabled, stack_traces, threshold_ms)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics for the realtime proxy and its pools"""
+    writer = MetricsWriter()
+    add_session_metrics(writer, active_sessions.values())
+    add_component_metrics(writer, "openai_http", openai_http.stats())
+    add_component_metrics(writer, "ephemeral_token_pool", token_pool.stats())
+    add_component_metrics(writer, "upstream_pool", upstream_pool.stats())
+    add_component_metrics(writer, "upstream_gate", upstream_gate.stats())
+    add_component_metrics(writer, "guardrail_worker", guardrail_worker.stats())
+    add_component_metrics(writer, "skill_extractor", skill_extractor.stats())
+    add_component_metrics(writer, "skill_cache", skill_extractor.cache.stats())
+    add_component_metrics(writer, "skill_local_tier", skill_extractor.local.stats())
+    add_component_metrics(writer, "node_registry", node_registry.stats())
+    add_component_metrics(writer, "instruction_cache", instruction_cache.stats())
+    add_component_metrics(writer, "admission", admission.stats())
+    add_component_metrics(writer, "loop_lag", {**loop_lag.stats(), "enabled": int(loop_lag.enabled)})
+    writer.add_histogram("loop_lag_seconds", "Event loop scheduling delay per sample",
+                         loop_lag.histogram.cumulative(), loop_lag.histogram.sum, loop_lag.histogram.count)
+    for tenant, count in admission.tenants.items():
+        writer.add("admission_tenant_sessions", "gauge", "Admitted realtime sessions per tenant",
+                   count, {"tenant": tenant})
+    return PlainTextResponse(writer.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/api/realtime/sessions")
+async def realtime_sessions():
+    """Live relay sessions on this process with per-direction queue depths"""
+    return {"sessions": [session.stats() for session in active_sessions.values()]}
+
+async def mint_ephemeral_session() -> dict:
+    """
+    Create an OpenAI Realtime session and extract its ephemeral token
+    Returns session_token (client_secret.value), session_id and expires_at
+    """
+    logger.info("🔄 Creating OpenAI Realtime session...")
+    
+    response = await openai_http.post(
+        '/v1/realtime/sessions',
+        json={
+            'model': 'gpt-4o-realtime-preview',
+        },
+    )
+    
+    if response.status_code != 200:
+        logger.error(f"❌ OpenAI API error: {response.status_code}")
+        logger.error(f"Response: {response.text}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"OpenAI API error: {response.status_code}"
+        )
+    
+    data = response.json()
+    
+    session_id = data.get('id')
+    logger.info(f"✅ Session created: {session_id}")
+    
+    # Extract session token from client_secret
+    client_secret = data.get('client_secret', {})
+    if isinstance(client_secret, dict):
+        token_value = client_secret.get('value')
+    else:
+        token_value = str(client_secret)
+        
+    if not token_value:
+        logger.error(f"❌ No client_secret.value in OpenAI response. Response: {data}")
+        raise HTTPException(status_code=500, detail="No client_secret.value")
+    
+    logger.info(f"✅ Session token extracted: {token_value[:20]}...")
+    
+    return {
+        "session_token": token_value,
+        "session_id": session_id,
+        "expires_at": token_expiry(data),
+    }
+
+# Background pool of pre-minted sessions; falls back to minting inline when empty
+token_pool = EphemeralTokenPool(mint_ephemeral_session)
+
 @app.get("/api/openai-realtime/ephemeral-token")
 async def get_ephemeral_token():
     """
@@ -110,56 +331,31 @@ async def get_ephemeral_token():
     Returns the client_secret.value which is the session token
     """
     try:
-        logger.info("🔄 Creating OpenAI Realtime session...")
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                'https://api.openai.com/v1/realtime/sessions',
-                headers={
-                    'Authorization': f'Bearer {OPENAI_API_KEY}',
-                    'Content-Type': 'application/json',
-                },
-                json={
-                    'model': 'gpt-4o-realtime-preview',
-                },
-                timeout=30.0,
-            )
-        
-        if response.status_code != 200:
-            logger.error(f"❌ OpenAI API error: {response.status_code}")
-            logger.error(f"Response: {response.text}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"OpenAI API error: {response.status_code}"
-            )
-        
-        data = response.json()
-        
-        session_id = data.get('id')
-        logger.info(f"✅ Session created: {session_id}")
-        
-        # Extract session token from client_secret
-        client_secret = data.get('client_secret', {})
-        if isinstance(client_secret, dict):
-            token_value = client_secret.get('value')
-        else:
-            token_value = str(client_secret)
-            
-        if not token_value:
-            logger.error(f"❌ No client_secret.value in OpenAI response. Response: {data}")
-            raise HTTPException(status_code=500, detail="No client_secret.value")
-        
-        logger.info(f"✅ Session token extracted: {token_value[:20]}...")
-        
-        return {
-            "session_token": token_value,
-            "session_id": session_id
-        }
-        
+        return await token_pool.acquire()
     except Exception as e:
         logger.error(f"❌ Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def connect_openai_realtime():
+    """Open an upstream OpenAI Realtime WebSocket using the API key"""
+    model = "gpt-4o-realtime-preview"
+    uri = f"{OPENAI_REALTIME_URL}?model={model}"
+    
+    logger.info(f"🔌 Connecting to OpenAI Realtime WebSocket (model={model}, Bearer token auth)")
+    return await websockets.connect(
+        uri,
+        subprotocols=['realtime'],
+        additional_headers={'Authorization': f'Bearer {OPENAI_API_KEY}'},
+        close_timeout=10,
+    )
+
+# Jittered retries and a circuit breaker in front of every upstream connect
+upstream_gate = UpstreamGate(connect_openai_realtime)
+
+# Optional pool of pre-connected upstream sockets (UPSTREAM_POOL_SIZE=0 disables)
+upstream_pool = UpstreamPool(upstream_gate.connect, can_fill=upstream_gate.available,
+                             fill_connect=functools.partial(upstream_gate.connect, wait=False))
+
 @app.websocket("/ws/realtime")
 async def websocket_realtime(websocket: WebSocket):
     """
@@ -173,31 +369,107 @@ async def websocket_realtime(websocket: WebSocket):
     logger.info(f"   OPENAI_API_KEY length: {len(OPENAI_API_KEY) if OPENAI_API_KEY else 'NOT SET'}")
     logger.info("=" * 80)
     
-    await websocket.accept()
-    logger.info("🔄 Client connected to WebSocket proxy")
+    # Binary PCM16 audio is opt-in (?binary_audio=in|both or the binary-audio subprotocol)
+    binary_in, binary_out, subprotocol = negotiate_binary_audio(
+        websocket.query_params.get("binary_audio"),
+        websocket.scope.get("subprotocols", []),
+    )
+    # Pin this browser to the node for cookie-based load balancer affinity
+    await websocket.accept(
+        subprotocol=subprotocol,
+        headers=[(b"set-cookie", f"{AFFINITY_COOKIE}={NODE_ID}; Path=/; HttpOnly; SameSite=Lax".encode())],
+    )
+    logger.info(f"🔄 Client connected to WebSocket proxy (binary audio in={binary_in}, out={binary_out})")
     
-    openai_ws = None
-    try:
-        # Connect to OpenAI Realtime API with API key directly
-        model = "gpt-4o-realtime-preview"
-        uri = f"wss://api.openai.com/v1/realtime?model={model}"
-        
-        logger.info(f"🔗 Connecting to OpenAI Realtime WebSocket")
-        logger.info(f"   Model: {model}")
-        logger.info(f"   Auth: API key Bearer token")
+    # Reconnects name their previous session: resume it here if its upstream
+    # is still alive on this worker, otherwise steer them back to its node
+    previous_id = websocket.query_params.get("session_id")
+    if previous_id:
+        session = await claim_session(previous_id, websocket.query_params.get("resume_token"))
+        if session and (session.binary_in, session.binary_out) == (binary_in, binary_out):
+            await resume_session(websocket, session)
+            return
+        if session:
+            # Binary negotiation changed; queued frames no longer fit this socket
+            parked_sessions.pop(session.session_id, None)
+            await end_session(session)
         
+        owner = await node_registry.owner(previous_id)
+        if owner and owner["node"] == NODE_ID:
+            # Parked on a sibling worker: sockets cannot be handed between
+            # processes, so refuse instead of silently starting fresh.
+            # Reconnecting lands on a random worker and may reach the owner.
+            node_registry.count("wrong_worker")
+            logger.info(f"↪️ Session {previous_id} lives on worker {owner.get('worker')} of this node, refusing")
+            await websocket.send_text(json.dumps({
+                "type": "proxy.redirect",
+                "session_id": previous_id,
+                "node": NODE_ID,
+                "worker": owner.get("worker"),
+                "address": owner.get("address") or None,
+            }))
+            await websocket.close(code=CLOSE_WRONG_WORKER, reason=f"session on worker {owner.get('worker')}")
+            return
+        if owner:
+            node_registry.count("redirected")
+            logger.info(f"↪️ Session {previous_id} lives on node {owner['node']}, redirecting")
+            await websocket.send_text(json.dumps({
+                "type": "proxy.redirect",
+                "session_id": previous_id,
+                "node": owner["node"],
+                "address": owner.get("address") or None,
+            }))
+            await websocket.close(code=CLOSE_WRONG_NODE, reason=f"session on node {owner['node']}")
+            return
+    
+    if node_registry.draining:
+        node_registry.count("refused")
+        logger.info(f"🚰 Node {NODE_ID} is draining, refusing new session")
+        await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason="node draining")
+        return
+    
+    # Wait for a session slot, telling the browser its place in line
+    # The realtime socket is not authenticated, so a client-supplied tenant is
+    # only honoured if it is configured (REALTIME_TENANTS / REALTIME_TENANT_LIMITS)
+    tenant = admission.resolve_tenant(websocket.query_params.get("tenant") or websocket.headers.get("x-tenant-id"))
+    
+    async def send_position(position: int, waiting: int):
+        await websocket.send_text(json.dumps({"type": "proxy.waiting", "position": position, "waiting": waiting}))
+    
+    try:
+        await admission.admit(tenant, send_position)
+    except AdmissionRejected as e:
+        logger.info(f"🚦 Session for tenant {tenant} not admitted: {e}")
+        await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason=str(e))
+        return
+    except Exception as e:
+        logger.info(f"ℹ️ Client left the waiting room: {e}")
+        return
+    
+    session = RelaySession(str(websocket.client), binary_in=binary_in, binary_out=binary_out)
+    # Slot is held until end_session, including while parked for a resume
+    session.tenant = tenant
+    active_sessions[session.session_id] = session
+    session.log_sampler = EventLogSampler(
+        f"🔁 Realtime session {websocket.client}",
+        sample_rates=REALTIME_LOG_SAMPLE,
+        max_lines_per_sec=REALTIME_LOG_MAX_LINES_PER_SEC,
+    )
+    parked = False
+    try:
         try:
-            # Connect with Authorization header
-            logger.info(f"🔌 Connecting to OpenAI with Bearer token auth")
-            
-            openai_ws = await websockets.connect(
-                uri,
-                subprotocols=['realtime'],
-                additional_headers={'Authorization': f'Bearer {OPENAI_API_KEY}'},
-                close_timeout=10,
-            )
+            # Take a pre-connected upstream socket if one is warm, else connect now
+            # (retrying, or waiting in line while the upstream circuit is open)
+            if not upstream_gate.available():
+                logger.info(f"⏳ Upstream circuit {upstream_gate.state}, {upstream_gate.waiting()} candidates waiting")
+            openai_ws, greeting = await upstream_pool.lease()
+            session.upstream_ws = openai_ws
             logger.info(f"✅ WebSocket connected to OpenAI Realtime API")
             logger.info(f"   Subprotocol negotiated: {openai_ws.subprotocol or 'None'}")
+        except UpstreamUnavailable as conn_err:
+            logger.error(f"❌ Upstream unavailable: {conn_err}")
+            await websocket.close(code=CLOSE_TRY_AGAIN_LATER, reason=str(conn_err)[:120])
+            return
         except Exception as conn_err:
             logger.error(f"❌ WebSocket connection failed: {conn_err}")
             logger.error(f"   Error type: {type(conn_err).__name__}")
@@ -205,23 +477,29 @@ async def websocket_realtime(websocket: WebSocket):
             await websocket.close(code=1000, reason=f"Connection failed: {str(conn_err)}")
             return
         
-        # Start bidirectional message forwarding
-        client_task = asyncio.create_task(client_to_openai(websocket, openai_ws))
-        server_task = asyncio.create_task(openai_to_client(websocket, openai_ws))
+        # Replay the session.created the upstream greeted us with
+        if greeting is not None:
+            session.log_sampler.record('openai->client', 'session.created', len(greeting))
+            session.record_frame('openai->client', 'session.created', len(greeting))
+            await session.downstream.put(greeting, 'session.created')
         
-        # Wait for either task to complete (which means connection closed)
-        done, pending = await asyncio.wait(
-            [client_task, server_task],
-            return_when=asyncio.FIRST_COMPLETED
-        )
+        # Tell the browser which session/node it is on so a reconnect can find
+        # it; the resume token lets it pick the upstream session back up
+        await node_registry.register(session)
+        await session.downstream.put(json.dumps({
+            "type": "proxy.session",
+            "session_id": session.session_id,
+            "node": NODE_ID,
+            "resume_token": session.resume_token if RESUME_GRACE_SECONDS > 0 else None,
+        }), 'proxy.session')
         
-        # Cancel remaining task
-        for task in pending:
-            task.cancel()
-            try:
-                await task
-            except asyncio.CancelledError:
-                pass
+        # The OpenAI side of the relay lives as long as the session; the
+        # browser side (relay_browser) is restarted on every resume
+        session.upstream_tasks = [
+            asyncio.create_task(pump_coalesced(session.upstream, openai_ws.send, session.coalesce)),
+            asyncio.create_task(openai_to_client(openai_ws, session, session.log_sampler)),
+        ]
+        parked = await relay_browser(websocket, session)
             
     except Exception as e:
         logger.error(f"❌ WebSocket proxy error: {e}")
@@ -240,169 +518,311 @@ async def websocket_realtime(websocket: WebSocket):
         except:
             pass
     finally:
-        if openai_ws:
-            try:
-                await openai_ws.close()
-            except:
-                pass
+        if not parked:
+            await end_session(session)
+
+async def relay_browser(websocket: WebSocket, session: RelaySession) -> bool:
+    """
+    Relay one browser connection of a session. Returns True if the browser
+    dropped while the upstream was still alive and the session was parked
+    for a later resume; False once the session is over.
+    """
+    session.client_ws = websocket
+    
+    async def send_to_browser(frame):
+        if isinstance(frame, bytes):
+            await websocket.send_bytes(frame)
+        else:
+            await websocket.send_text(frame)
+    
+    # A reader and a writer per direction, decoupled by bounded queues so a
+    # slow side only backpressures its own direction
+    browser_tasks = [
+        asyncio.create_task(client_to_openai(websocket, session, session.log_sampler)),
+        asyncio.create_task(pump(session.downstream, send_to_browser)),
+    ]
+    
+    # Wait for any task to complete (which means a connection closed)
+    done, _ = await asyncio.wait(
+        browser_tasks + session.upstream_tasks,
+        return_when=asyncio.FIRST_COMPLETED
+    )
+    closed_by_client = False
+    for task in done:
+        if not task.cancelled() and task.exception():
+            error = task.exception()
+            logger.info(f"ℹ️ Relay {session.session_id} ended: {error!r}")
+            closed_by_client = closed_by_client or (isinstance(error, WebSocketDisconnect) and error.code == 1000)
+    
+    # Cancel the browser side; the upstream side is left to the caller
+    for task in browser_tasks:
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+    session.client_ws = None
+    
+    # A normal close means the interview ended; anything else may come back
+    if (RESUME_GRACE_SECONDS > 0 and not closed_by_client and session.upstream_alive()
+            and not node_registry.drain_expired()):
+        park_session(session)
+        return True
+    return False
+
+async def claim_session(session_id: str, resume_token: str):
+    """
+    Find a session on this worker that a reconnecting browser may resume.
+    A session whose old socket has not noticed the drop yet is taken over.
+    """
+    session = active_sessions.get(session_id)
+    if session is None or not session.check_resume_token(resume_token):
+        return None
+    if session.session_id not in parked_sessions and session.client_ws is not None:
+        logger.info(f"🔀 Session {session_id} reconnected before its old socket closed, taking over")
+        try:
+            await session.client_ws.close(code=CLOSE_SUPERSEDED, reason="resumed elsewhere")
+        except Exception:
+            pass
+        for _ in range(50):
+            if session.session_id in parked_sessions or session.ended:
+                break
+            await asyncio.sleep(0.05)
+    return parked_sessions.pop(session_id, None)
+
+async def resume_session(websocket: WebSocket, session: RelaySession):
+    """Attach a reconnected browser to a parked session and replay what it missed"""
+    if session.grace_task:
+        session.grace_task.cancel()
+        session.grace_task = None
+    gap = time.monotonic() - session.parked_at
+    session.parked_at = None
+    session.resumes += 1
+    buffered = len(session.downstream)
+    logger.info(f"♻️ Session {session.session_id} resumed after {gap:.1f}s, replaying {buffered} buffered frames")
+    
+    parked = False
+    try:
+        await websocket.send_text(json.dumps({
+            "type": "proxy.session",
+            "session_id": session.session_id,
+            "node": NODE_ID,
+            "resume_token": session.resume_token,
+            "resumed": True,
+            "replayed": buffered,
+        }))
+        parked = await relay_browser(websocket, session)
+    except Exception as e:
+        logger.error(f"❌ WebSocket proxy error after resume: {type(e).__name__}: {e}")
+    finally:
+        if not parked:
+            await end_session(session)
+
+def park_session(session: RelaySession):
+    """Keep the upstream session alive for RESUME_GRACE_SECONDS after the browser drops"""
+    session.parked_at = time.monotonic()
+    parked_sessions[session.session_id] = session
+    session.grace_task = asyncio.create_task(expire_parked_session(session))
+    logger.info(f"⏸️ Session {session.session_id} parked for {RESUME_GRACE_SECONDS:.0f}s awaiting reconnect")
+
+async def expire_parked_session(session: RelaySession):
+    # Ends early if OpenAI closes the upstream while nobody is attached
+    await asyncio.wait(session.upstream_tasks, timeout=RESUME_GRACE_SECONDS)
+    if parked_sessions.pop(session.session_id, None) is not None:
+        session.grace_task = None
+        logger.info(f"⌛ Session {session.session_id} was not resumed, closing upstream")
+        await end_session(session)
+
+async def end_session(session: RelaySession):
+    """Tear down a relay session for good: upstream tasks, socket and registry entry"""
+    if session.ended:
+        return
+    session.ended = True
+    if session.tenant is not None:
+        admission.release(session.tenant)
+    if session.grace_task:
+        session.grace_task.cancel()
+        session.grace_task = None
+    for task in session.upstream_tasks:
+        task.cancel()
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+    active_sessions.pop(session.session_id, None)
+    await node_registry.unregister(session.session_id)
+    logger.info(f"📊 Relay {session.session_id} queues: {session.stats()['queues']}, coalesce: {session.coalesce}")
+    if session.log_sampler:
+        session.log_sampler.flush(logger)
+    if session.upstream_ws:
+        try:
+            await session.upstream_ws.close()
+        except:
+            pass
 
-async def client_to_openai(websocket: WebSocket, openai_ws):
-    """Forward messages from browser client to OpenAI"""
+async def client_to_openai(websocket: WebSocket, session: RelaySession, log_sampler: EventLogSampler):
+    """Read messages from the browser client and queue them for OpenAI"""
     try:
         message_count = 0
         while True:
-            data = await websocket.receive_text()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
             message_count += 1
             
-            # Parse and log message type
-            try:
-                msg = json.loads(data)
-                msg_type = msg.get('type', 'unknown')
-                
-                # Log session.update with instructions
-                if msg_type == 'session.update':
-                    logger.info(f"📤 [{message_count}] Client -> OpenAI: type={msg_type}")
-                    session_config = msg.get('session', {})
-                    instructions = session_config.get('instructions', '')
-                    if instructions:
-                        logger.info(f"   🔧 Instructions (first 200 chars): {instructions[:200]}...")
-                        logger.info(f"   🎯 Full instructions length: {len(instructions)} chars")
-                    logger.info(f"   📝 Session config keys: {list(session_config.keys())}")
-                
-                # Only log important messages to reduce noise
-                elif msg_type in ['response.create', 'conversation.item.create', 'input_audio_buffer.append']:
-                    logger.info(f"📤 [{message_count}] Client -> OpenAI: type={msg_type}")
-                    
-                    if msg_type == 'input_audio_buffer.append':
-                        audio_data = msg.get('audio', '')
-                        logger.info(f"   📊 Audio chunk size: {len(audio_data)} bytes")
-            except:
+            data = message.get("text")
+            if data is None:
+                # Raw PCM16 binary frame: wrap it as an append event ourselves
+                pcm = message.get("bytes") or b""
+                if not session.binary_in:
+                    if log_sampler.record('client->openai', 'binary', len(pcm)):
+                        logger.warning(f"⚠️ [{message_count}] Binary frame without binary_audio negotiated, dropped")
+                    continue
+                data = wrap_audio_append(pcm)
+                msg_type, msg = 'input_audio_buffer.append', None
+            else:
+                # Classify by peeking at the event type; only session.update is decoded
+                msg_type, msg = classify_frame(data, CLIENT_INSPECTED_EVENTS)
+            
+            # Every frame is counted, only a sample gets its own line
+            session.record_frame('client->openai', msg_type, len(data))
+            if log_sampler.record('client->openai', msg_type, len(data)):
+                logger.info(f"📤 [{message_count}] Client -> OpenAI: type={msg_type} ({len(data)} bytes)")
+            
+            # Log session.update with instructions
+            if msg_type == 'session.update':
+                # Browsers may name only the skills; the proxy supplies the instructions
+                expanded = instruction_cache.session_update(msg)
+                if expanded:
+                    skills_key, data = expanded
+                    logger.info(f"   🧩 Injected server instructions for skill set {skills_key} ({len(data)} bytes)")
+                session_config = msg.get('session', {})
+                instructions = session_config.get('instructions', '')
+                if instructions:
+                    logger.info(f"   🔧 Instructions (first 200 chars): {instructions[:200]}...")
+                    logger.info(f"   🎯 Full instructions length: {len(instructions)} chars")
+                logger.info(f"   📝 Session config keys: {list(session_config.keys())}")
+            elif msg_type == 'invalid':
                 logger.info(f"📤 [{message_count}] Client -> OpenAI: {data[:50]}...")
             
-            await openai_ws.send(data)
+            await session.upstream.put(data, msg_type)
     except Exception as e:
         logger.info(f"ℹ️ Client->OpenAI connection closed: {e}")
         # Re-raise to signal connection closed
         raise
 
-async def openai_to_client(websocket: WebSocket, openai_ws):
-    """Forward messages from OpenAI to browser client"""
+async def openai_to_client(openai_ws, session: RelaySession, log_sampler: EventLogSampler):
+    """Read messages from OpenAI and queue them for the browser client"""
     try:
         message_count = 0
         while True:
             message = await openai_ws.recv()
             message_count += 1
             
-            # Parse and log message type
-            try:
-                msg = json.loads(message)
-                msg_type = msg.get('type', 'unknown')
-                
-                # Log important messages only
-                if msg_type in ['session.created', 'session.updated', 'response.created', 
-                              'response.done', 'response.text.delta', 'conversation.item.created',
-                              'error', 'response.content_part.done']:
-                    logger.info(f"📥 [{message_count}] OpenAI -> Client: type={msg_type}")
-                    
-                    # Special logging for important messages
-                    if msg_type == 'session.created':
-                        logger.info(f"   ✅ Session created successfully")
-                        session_data = msg.get('session', {})
-                        logger.info(f"   📝 Session keys: {list(session_data.keys())}")
-                    elif msg_type == 'session.updated':
-                        logger.info(f"   ✅ Session updated successfully")
-                        session_data = msg.get('session', {})
-                        logger.info(f"   📝 Session keys: {list(session_data.keys())}")
-                    elif msg_type == 'response.done':
-                        status = msg.get('response', {}).get('status', 'unknown')
-                        logger.info(f"   ✅ Response completed with status: {status}")
-                    elif msg_type == 'response.text.delta':
-                        text = msg.get('delta', '')[:50]
-                        if text:
-                            logger.info(f"   💬 Text delta: {text}...")
-                    elif msg_type == 'error':
-                        error_msg = msg.get('error', {}).get('message', 'Unknown error')
-                        logger.error(f"   ❌ Error: {error_msg}")
-                    elif msg_type == 'response.content_part.done':
-                        # Validate AI response against guardrails
-                        content = msg.get('content_part', {})
-                        if content.get('type') == 'text':
-                            text_content = content.get('text', '')
-                            if text_content:
-                                validation = validate_ai_response(text_content)
-                                if validation.is_valid:
-                                    logger.info(f"   ✅ Guardrails validated")
-                                else:
-                                    logger.warning(f"   ⚠️ Guardrail violations ({validation.severity}):")
-                                    for violation in validation.violations:
-                                        logger.warning(f"      - {violation}")
-                        
-            except Exception as parse_err:
-                logger.info(f"📥 [{message_count}] OpenAI -> Client: (binary or parse error)")
+            # Classify by peeking at the event type; audio deltas are never decoded
+            msg_type, msg = classify_frame(message, SERVER_INSPECTED_EVENTS)
+            
+            # Every frame is counted, only a sample gets its own line
+            session.record_frame('openai->client', msg_type, len(message))
+            sampled = log_sampler.record('openai->client', msg_type, len(message))
+            if sampled:
+                logger.info(f"📥 [{message_count}] OpenAI -> Client: type={msg_type}")
             
-            await websocket.send_text(message)
+            # Details for the events we inspect
+            if msg_type in SERVER_INSPECTED_EVENTS:
+                if msg_type == 'session.created':
+                    logger.info(f"   ✅ Session created successfully")
+                    session_data = msg.get('session', {})
+                    logger.info(f"   📝 Session keys: {list(session_data.keys())}")
+                elif msg_type == 'session.updated':
+                    logger.info(f"   ✅ Session updated successfully")
+                    session_data = msg.get('session', {})
+                    logger.info(f"   📝 Session keys: {list(session_data.keys())}")
+                elif msg_type == 'response.done':
+                    status = msg.get('response', {}).get('status', 'unknown')
+                    logger.info(f"   ✅ Response completed with status: {status}")
+                elif msg_type == 'response.text.delta':
+                    text = msg.get('delta', '')[:50]
+                    if text and sampled:
+                        logger.info(f"   💬 Text delta: {text}...")
+                elif msg_type == 'error':
+                    error_msg = msg.get('error', {}).get('message', 'Unknown error')
+                    logger.error(f"   ❌ Error: {error_msg}")
+                elif msg_type == 'response.content_part.done':
+                    # Validate AI response against guardrails off the relay path
+                    content = msg.get('content_part', {})
+                    if content.get('type') == 'text':
+                        text_content = content.get('text', '')
+                        if text_content and not guardrail_worker.submit(session, text_content):
+                            logger.warning(f"   ⚠️ Guardrail queue full, response not validated")
+            elif msg_type == 'invalid':
+                logger.info(f"📥 [{message_count}] OpenAI -> Client: (parse error)")
+            
+            # Binary-out clients get audio deltas as raw PCM16 frames
+            if session.binary_out and msg_type == 'response.audio.delta':
+                pcm = extract_audio_delta(message)
+                if pcm is not None:
+                    message = pcm
+            
+            await session.downstream.put(message, msg_type)
     except Exception as e:
         logger.info(f"ℹ️ OpenAI->Client connection closed: {e}")
 
+class ClientDisconnected(Exception):
+    """The HTTP client went away before the response was ready"""
+
+async def cancel_on_disconnect(request: Request, coro):
+    """Await coro, cancelling it if the HTTP client disconnects first"""
+    task = asyncio.create_task(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
 @app.post("/api/extract-skills")
-async def extract_skills(request: ExtractSkillsRequest):
+async def extract_skills(body: ExtractSkillsRequest, request: Request):
     """
     Extract top 3 must-have skills from job description using OpenAI
     Sends description directly to OpenAI like Valitron does
     """
     try:
-        if not client:
+        if not skill_extractor.ready:
             raise HTTPException(status_code=503, detail="OpenAI API key is not configured. Please set OPENAI_API_KEY environment variable.")
         
-        job_description = request.description
+        job_description = body.description
         if not job_description:
             raise HTTPException(status_code=400, detail="Job description is required")
         
         logger.info("🤖 Sending description to OpenAI for skill extraction...")
-        
-        prompt = f"""Analyze this job description and extract the top 3 MUST-HAVE skills.
-
-Job Description:
-{job_description}
-
-Respond in JSON format ONLY (no other text):
-{{
-  "skills": [
-    {{"name": "Skill Name", "importance": "critical/high/medium", "reason": "Why it matters"}},
-    {{"name": "Skill Name", "importance": "critical/high/medium", "reason": "Why it matters"}},
-    {{"name": "Skill Name", "importance": "critical/high/medium", "reason": "Why it matters"}}
-  ],
-  "summary": "Brief summary of key requirements"
-}}"""
-
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert HR recruiter. Extract critical skills from job descriptions. Respond only with valid JSON."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.7,
-            max_tokens=500
-        )
-        
-        response_text = response.choices[0].message.content.strip()
+        result = await cancel_on_disconnect(request, skill_extractor.extract(job_description))
         logger.info(f"✅ OpenAI response received")
-        
-        # Parse JSON from response
-        import json
-        skills_data = json.loads(response_text)
-        
-        return {
-            "success": True,
-            "skills": skills_data.get("skills", []),
-            "summary": skills_data.get("summary", "")
-        }
+        return result
+
+    except ClientDisconnected:
+        # Nobody is waiting for the answer; the OpenAI request was cancelled
+        logger.info("ℹ️ Client disconnected, skill extraction cancelled")
+        return Response(status_code=499)
+
+    except ExtractionBusy as e:
+        logger.warning(f"⚠️ Skill extraction busy: {e}")
+        raise HTTPException(status_code=503, detail="Skill extraction is busy, please retry shortly",
+                            headers={"Retry-After": "5"})
+            
+    except asyncio.TimeoutError:
+        # Not an API failure worth masking with sample data: tell the client to retry
+        logger.error(f"❌ Skill extraction timed out after {skill_extractor.timeout:.0f}s")
+        raise HTTPException(status_code=504, detail="Skill extraction timed out, please retry",
+                            headers={"Retry-After": "5"})
             
     except Exception as e:
         logger.error(f"❌ Error extracting skills: {e}")
@@ -438,6 +858,45 @@ Respond in JSON format ONLY (no other text):
             "summary": "This role requires strong technical fundamentals with expertise in backend development and system architecture."
         }
 
+@app.post("/api/extract-skills/batch")
+async def extract_skills_batch(body: BatchExtractSkillsRequest):
+    """
+    Extract skills for many job descriptions (e.g. a scraped_jobs import).
+    Identical descriptions are extracted once. Results stream back as NDJSON
+    in completion order, one line per input: {"index", "id", "success",
+    "skills", "summary"} or {"index", "id", "success": false, "error"},
+    then {"done": true, ...}. Disconnecting cancels the remaining work.
+    """
+    if not skill_extractor.ready:
+        raise HTTPException(status_code=503, detail="OpenAI API key is not configured. Please set OPENAI_API_KEY environment variable.")
+    items = [BatchExtractItem(description=d) for d in body.descriptions] + body.items
+    if not items:
+        raise HTTPException(status_code=400, detail="At least one job description is required")
+    if len(items) > EXTRACT_SKILLS_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {EXTRACT_SKILLS_BATCH_MAX} descriptions per batch")
+    blank = [index for index, item in enumerate(items) if not item.description.strip()]
+    if blank:
+        raise HTTPException(status_code=400, detail=f"Job description is required (items {blank[:10]})")
+
+    async def results():
+        started = time.monotonic()
+        counts = {"succeeded": 0, "failed": 0, "unique": 0}
+        logger.info(f"🤖 Batch skill extraction: {len(items)} descriptions")
+        async for indexes, result in skill_extractor.extract_many([item.description for item in items]):
+            counts["unique"] += 1
+            if isinstance(result, Exception):
+                outcome = {"success": False, "error": f"{type(result).__name__}: {result}"}
+            else:
+                outcome = result
+            for index in indexes:
+                counts["succeeded" if outcome.get("success") else "failed"] += 1
+                yield json.dumps({"index": index, "id": items[index].id, **outcome}) + "\n"
+        elapsed = time.monotonic() - started
+        logger.info(f"✅ Batch skill extraction done: {counts} in {elapsed:.1f}s")
+        yield json.dumps({"done": True, "total": len(items), **counts, "seconds": round(elapsed, 3)}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
 # ==================== INTERVIEW DATA API ====================
 
 @app.post("/api/users")
@@ -539,4 +998,11 @@ async def get_user_stats(user_id: str):
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8001))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    # Same variable the uvicorn CLI reads; several workers need SESSION_STORE=redis
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    if workers > 1:
+        if SESSION_STORE == "memory":
+            logger.warning("⚠️ WEB_CONCURRENCY > 1 with SESSION_STORE=memory: workers cannot see each other's sessions")
+        uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
@@ -9,6 +9,7 @@ import asyncio
 import logging
 import base64
 import json
+import time
 from datetime import datetime
 from typing import Optional, Dict, Any
 
@@ -20,6 +21,9 @@ from dotenv import load_dotenv
 # Import custom modules
 from ws_manager import WebSocketManager
 from ai_service import AIService
+from openai_http import OpenAIHttpPool
+from speech_pipeline import LatencyStats, stream_spoken_response
+from voice_activity import SERVER_VAD, VadStats, VoiceActivityDetector, pcm_to_wav
 from utils.logger import setup_logger
 
 # Load environment
@@ -29,6 +33,9 @@ REALTIME_MODEL = os.getenv("REALTIME_MODEL", "gpt-4-turbo")
 REALTIME_VOICE = os.getenv("REALTIME_VOICE", "alloy")
 SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
 SERVER_PORT = int(os.getenv("SERVER_PORT", 8001))
+# Default for clients that do not pass ?stream_audio=: stream the reply sentence by sentence
+# (ai_audio_chunk) instead of one ai_response carrying all the audio. Off keeps the original protocol.
+STREAMING_PIPELINE = os.getenv("STREAMING_PIPELINE", "false").lower() == "true"
 
 # Setup logging
 logger = setup_logger(__name__)
@@ -36,6 +43,9 @@ logger = setup_logger(__name__)
 # Global instances
 ws_manager = WebSocketManager()
 ai_service: Optional[AIService] = None
+openai_http = OpenAIHttpPool(OPENAI_API_KEY)
+turn_latency = LatencyStats()
+vad_stats = VadStats()
 
 # ============================================================================
 # LIFESPAN MANAGEMENT
@@ -53,7 +63,8 @@ async def lifespan(app: FastAPI):
     logger.info(f"Voice: {REALTIME_VOICE}")
     
     global ai_service
-    ai_service = AIService(OPENAI_API_KEY, REALTIME_MODEL, REALTIME_VOICE)
+    await openai_http.start()
+    ai_service = AIService(OPENAI_API_KEY, REALTIME_MODEL, REALTIME_VOICE, http_client=openai_http.client)
     
     # Test TTS on startup
     try:
@@ -72,6 +83,7 @@ async def lifespan(app: FastAPI):
     logger.info("[STOP] BACKEND SHUTTING DOWN")
     logger.info("=" * 60)
     logger.info(f"Active connections: {len(ws_manager.active_connections)}")
+    await openai_http.close()
 
 
 # Create FastAPI app with lifespan
@@ -102,7 +114,13 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "active_connections": len(ws_manager.active_connections)
+        "active_connections": len(ws_manager.active_connections),
+        "openai_http": openai_http.stats(),
+        "streaming_pipeline_default": STREAMING_PIPELINE,
+        "turn_latency": turn_latency.stats(),
+        "server_vad": vad_stats.stats() if SERVER_VAD else None,
+        "input_analysis": ai_service.analysis_stats() if ai_service else None,
+        "whisper_upload": ai_service.upload_stats() if ai_service else None,
     }
 
 
@@ -205,6 +223,110 @@ async def process_audio(client_id: str, audio_bytes: bytes) -> Dict[str, Any]:
         }
 
 
+async def process_audio_streaming(client_id: str, audio_bytes: bytes, audio_duration: float = 0):
+    """
+    Streaming pipeline: send user_transcript as soon as Whisper returns, then
+    ai_audio_chunk per sentence while the reply is still being generated,
+    then ai_response with the full text and the turn's timings.
+    """
+    started = time.monotonic()
+    if not audio_bytes or len(audio_bytes) < 100:
+        logger.warning(f"[WS-{client_id}] Audio too short: {len(audio_bytes)} bytes")
+        await ws_manager.send_json(client_id, {"type": "error", "error": "Audio too short"})
+        return
+
+    logger.info(f"[WS-{client_id}] [PROCESS] START (streaming): {len(audio_bytes)} bytes")
+    upload: Dict[str, Any] = {}
+    transcript = await ai_service.transcribe_audio(audio_bytes, report=upload)
+    transcribe_ms = round((time.monotonic() - started) * 1000, 1)
+    logger.info(f"[WS-{client_id}] [TRANSCRIBE] Result: '{transcript}' ({transcribe_ms:.0f}ms)")
+    if upload:
+        logger.info(f"[WS-{client_id}] [UPLOAD] {upload['original_bytes']} -> {upload['bytes']} bytes "
+                    f"(saved {upload['saved_bytes']})")
+
+    if not transcript or transcript.strip() == "":
+        logger.warning(f"[WS-{client_id}] Transcription failed or empty")
+        await ws_manager.send_json(client_id, {"type": "error", "error": "Failed to transcribe audio"})
+        return
+
+    await ws_manager.send_json(client_id, {"type": "user_transcript", "text": transcript})
+    logger.info(f"[WS-{client_id}] [SEND] user_transcript")
+
+    async def send_chunk(chunk: Dict[str, Any]):
+        if not ws_manager.get_connection(client_id):
+            raise ConnectionError("client disconnected")
+        await ws_manager.send_json(client_id, chunk)
+
+    try:
+        result = await stream_spoken_response(ai_service, transcript, send_chunk,
+                                              audio_duration=audio_duration, started=started)
+    except ConnectionError:
+        logger.info(f"[WS-{client_id}] [CANCEL] Client left mid-turn, stopped generating")
+        return
+
+    timings = {"transcribe_ms": transcribe_ms, **result["timings"]}
+    turn_latency.record(timings)
+    await ws_manager.send_json(client_id, {
+        "type": "ai_response",
+        "text": result["text"],
+        "streamed": True,
+        "segments": result["segments"],
+        "timings": timings,
+        "upload_bytes_saved": upload.get("saved_bytes", 0),
+    })
+    logger.info(f"[WS-{client_id}] [LATENCY] first audio {timings.get('first_audio_ms', 0):.0f}ms, "
+                f"total {timings['total_ms']:.0f}ms, {result['segments']} segments")
+
+
+def negotiate_streaming(query_flag: Optional[str]) -> bool:
+    """Per-connection opt-in (?stream_audio=1) or opt-out (?stream_audio=0); otherwise STREAMING_PIPELINE"""
+    flag = (query_flag or "").lower()
+    if flag in ("1", "true", "yes"):
+        return True
+    if flag in ("0", "false", "no"):
+        return False
+    return STREAMING_PIPELINE
+
+
+async def handle_turn(client_id: str, audio_bytes: bytes, audio_duration: float = 0, streaming: bool = False):
+    """Run one candidate turn and send the results to the client"""
+    if streaming:
+        await process_audio_streaming(client_id, audio_bytes, audio_duration)
+        return
+
+    result = await process_audio(client_id, audio_bytes)
+    logger.info(f"[WS-{client_id}] [RESULT] success={result['success']}")
+
+    # SEND TRANSCRIPT
+    if result["transcript"]:
+        await ws_manager.send_json(client_id, {
+            "type": "user_transcript",
+            "text": result["transcript"]
+        })
+        logger.info(f"[WS-{client_id}] [SEND] user_transcript")
+
+    # SEND AI RESPONSE
+    if result["success"]:
+        response = {
+            "type": "ai_response",
+            "text": result["response_text"]
+        }
+
+        # Include TTS audio if available
+        if result["response_audio"]:
+            response["audio"] = base64.b64encode(result["response_audio"]).decode('utf-8')
+            logger.info(f"[WS-{client_id}] [AUDIO] TTS {len(response['audio'])} chars")
+
+        await ws_manager.send_json(client_id, response)
+        logger.info(f"[WS-{client_id}] [SEND] ai_response: {result['response_text'][:50]}")
+    else:
+        await ws_manager.send_json(client_id, {
+            "type": "error",
+            "error": result["error"]
+        })
+        logger.error(f"[WS-{client_id}] [ERROR] {result['error']}")
+
+
 # ============================================================================
 # WEBSOCKET ENDPOINT - THE CORE MESSAGE HANDLER
 # ============================================================================
@@ -221,14 +343,19 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
        {"type": "send_for_AI_processing", "audio": "<base64>", "duration": 1.5}
     
     Flow:
-    - isSpeaking=true: append to buffer
-    - isSpeaking=false: process buffer (transcribe→generate→TTS)
-    - Send back: user_transcript, ai_response (with audio), or error
+    - SERVER_VAD=true: the server endpoints PCM16 chunks itself (hangover
+      VAD_HANGOVER_MS); isSpeaking true→false only ends an utterance early
+    - SERVER_VAD=false: isSpeaking=true appends to buffer,
+      isSpeaking=false processes the buffer (transcribe→generate→TTS)
+    - Send back: user_transcript, ai_response (with audio), or error;
+      clients connecting with ?stream_audio=1 get ai_audio_chunk per
+      sentence first and a final ai_response without audio
     """
     
     # Accept connection
+    streaming = negotiate_streaming(websocket.query_params.get("stream_audio"))
     await ws_manager.connect(websocket, client_id)
-    logger.info(f"[WS-{client_id}] [CONNECT] Client connected")
+    logger.info(f"[WS-{client_id}] [CONNECT] Client connected (stream_audio={streaming})")
     
     try:
         # Send greeting
@@ -236,12 +363,15 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
             "type": "greeting",
             "status": "ready",
             "message": "Connected to AI Interview Backend",
+            "stream_audio": streaming,
             "timestamp": datetime.now().isoformat()
         })
         logger.info(f"[WS-{client_id}] [GREETING] Sent")
         
         # Track previous isSpeaking state to detect silence
         prev_is_speaking = False
+        # Server-side endpointing of audio_chunk PCM (the isSpeaking flag becomes a hint)
+        vad = VoiceActivityDetector(stats=vad_stats) if SERVER_VAD else None
         
         # Main message loop
         while True:
@@ -272,6 +402,26 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
                             logger.error(f"[WS-{client_id}] [ERROR] Connection lost!")
                             break
                         
+                        # SERVER VAD: endpoint on the audio itself, trim silence, drop noise-only buffers
+                        if vad is not None:
+                            utterance = vad.feed(chunk_bytes)
+                            if utterance is None and prev_is_speaking and not is_speaking:
+                                # Client says speech ended before the server's hangover did
+                                utterance = vad.flush()
+                            prev_is_speaking = is_speaking
+                            if utterance is None:
+                                continue
+                            
+                            duration = vad.duration(utterance)
+                            logger.info(f"[WS-{client_id}] [VAD] Utterance: {duration:.2f}s of trimmed audio")
+                            connection["is_processing"] = True
+                            try:
+                                await handle_turn(client_id, pcm_to_wav(utterance, vad.sample_rate), duration, streaming)
+                            finally:
+                                connection["is_processing"] = False
+                            logger.info(f"[WS-{client_id}] [DONE] Cycle complete")
+                            continue
+                        
                         # APPEND TO BUFFER (even if empty, to detect state change)
                         if chunk_bytes:
                             connection["audio_buffer"].extend(chunk_bytes)
@@ -295,38 +445,10 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
                             logger.info(f"[WS-{client_id}] [PROCESS] Starting with {len(audio_to_process)} bytes...")
                             
                             # PROCESS AUDIO
-                            result = await process_audio(client_id, audio_to_process)
-                            
-                            # SEND TRANSCRIPT
-                            if result["transcript"]:
-                                await ws_manager.send_json(client_id, {
-                                    "type": "user_transcript",
-                                    "text": result["transcript"]
-                                })
-                                logger.info(f"[WS-{client_id}] [SEND] user_transcript")
-                            
-                            # SEND AI RESPONSE
-                            if result["success"]:
-                                response = {
-                                    "type": "ai_response",
-                                    "text": result["response_text"]
-                                }
-                                
-                                # Include TTS audio if available
-                                if result["response_audio"]:
-                                    response["audio"] = base64.b64encode(result["response_audio"]).decode('utf-8')
-                                    logger.info(f"[WS-{client_id}] [AUDIO] TTS {len(response['audio'])} chars")
-                                
-                                await ws_manager.send_json(client_id, response)
-                                logger.info(f"[WS-{client_id}] [SEND] ai_response")
-                            else:
-                                await ws_manager.send_json(client_id, {
-                                    "type": "error",
-                                    "error": result["error"]
-                                })
-                                logger.error(f"[WS-{client_id}] [ERROR] {result['error']}")
-                            
-                            connection["is_processing"] = False
+                            try:
+                                await handle_turn(client_id, audio_to_process, streaming=streaming)
+                            finally:
+                                connection["is_processing"] = False
                             logger.info(f"[WS-{client_id}] [DONE] Cycle complete")
                         
                         prev_is_speaking = is_speaking
@@ -366,38 +488,10 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
                         connection["is_processing"] = True
                         
                         # Process immediately
-                        result = await process_audio(client_id, audio_bytes)
-                        logger.info(f"[WS-{client_id}] [RESULT] success={result['success']}")
-                        
-                        # Send transcript
-                        if result["transcript"]:
-                            logger.info(f"[WS-{client_id}] [SEND] user_transcript")
-                            await ws_manager.send_json(client_id, {
-                                "type": "user_transcript",
-                                "text": result["transcript"]
-                            })
-                        
-                        # Send response
-                        if result["success"]:
-                            response = {
-                                "type": "ai_response",
-                                "text": result["response_text"]
-                            }
-                            
-                            if result["response_audio"]:
-                                response["audio"] = base64.b64encode(result["response_audio"]).decode('utf-8')
-                                logger.info(f"[WS-{client_id}] [AUDIO] TTS {len(response['audio'])} chars")
-                            
-                            logger.info(f"[WS-{client_id}] [SEND] ai_response: {result['response_text'][:50]}")
-                            await ws_manager.send_json(client_id, response)
-                        else:
-                            logger.error(f"[WS-{client_id}] [ERROR] {result['error']}")
-                            await ws_manager.send_json(client_id, {
-                                "type": "error",
-                                "error": result["error"]
-                            })
-                        
-                        connection["is_processing"] = False
+                        try:
+                            await handle_turn(client_id, audio_bytes, duration, streaming)
+                        finally:
+                            connection["is_processing"] = False
                         logger.info(f"[WS-{client_id}] [DONE] Cycle complete")
                     
                     except base64.binascii.Error as e:
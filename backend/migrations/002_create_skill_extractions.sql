@@ -0,0 +1,15 @@
+-- Create skill_extractions table
+-- Persistent tier of the skill extraction cache (/api/extract-skills).
+-- key is a hash of the model name and the normalized job description.
+
+CREATE TABLE IF NOT EXISTS skill_extractions (
+  key VARCHAR(64) PRIMARY KEY,
+  result JSONB NOT NULL,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Expired rows are ignored on read; this index keeps cleanup cheap
+CREATE INDEX IF NOT EXISTS idx_skill_extractions_created_at ON skill_extractions(created_at);
+
+-- Only the backend (service role) reads and writes the cache
+ALTER TABLE skill_extractions ENABLE ROW LEVEL SECURITY;
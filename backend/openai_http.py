@@ -0,0 +1,103 @@
+"""
+Shared HTTP connection pool for outbound OpenAI REST calls
+One httpx.AsyncClient for the app lifetime instead of one per request
+"""
+
+import logging
+import os
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "https://api.openai.com")
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "true").lower() == "true"
+OPENAI_HTTP_MAX_CONNECTIONS = int(os.getenv("OPENAI_HTTP_MAX_CONNECTIONS", "100"))
+OPENAI_HTTP_MAX_KEEPALIVE = int(os.getenv("OPENAI_HTTP_MAX_KEEPALIVE", "20"))
+OPENAI_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_HTTP_KEEPALIVE_EXPIRY", "60"))
+OPENAI_HTTP_TIMEOUT = float(os.getenv("OPENAI_HTTP_TIMEOUT", "30"))
+
+# HTTP/2 needs the optional h2 package (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class _CountingTransport(httpx.AsyncHTTPTransport):
+    """Transport that counts requests and newly opened connections"""
+
+    def __init__(self, stats: Dict[str, int], **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._stats["requests"] += 1
+        request.extensions.setdefault("trace", self._trace)
+        return await super().handle_async_request(request)
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]):
+        # Only fires when the pool has no idle connection to hand out
+        if event_name == "connection.connect_tcp.complete":
+            self._stats["connections_opened"] += 1
+
+
+class OpenAIHttpPool:
+    """
+    App-lifetime httpx.AsyncClient for api.openai.com.
+    Created in the FastAPI lifespan via start() and closed via close().
+    """
+
+    def __init__(self, api_key: Optional[str]):
+        self.api_key = api_key
+        self.client: Optional[httpx.AsyncClient] = None
+        self._stats = {"requests": 0, "connections_opened": 0}
+
+    async def start(self):
+        """Open the pool"""
+        http2 = OPENAI_HTTP2 and HTTP2_AVAILABLE
+        if OPENAI_HTTP2 and not HTTP2_AVAILABLE:
+            logger.warning("⚠️ h2 not installed, OpenAI HTTP pool falling back to HTTP/1.1")
+
+        limits = httpx.Limits(
+            max_connections=OPENAI_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=OPENAI_HTTP_KEEPALIVE_EXPIRY,
+        )
+        headers = {}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        self.client = httpx.AsyncClient(
+            base_url=OPENAI_API_BASE,
+            headers=headers,
+            timeout=OPENAI_HTTP_TIMEOUT,
+            transport=_CountingTransport(self._stats, http2=http2, limits=limits),
+        )
+        logger.info(f"✅ OpenAI HTTP pool ready (http2={http2}, max_connections={OPENAI_HTTP_MAX_CONNECTIONS})")
+
+    async def close(self):
+        """Close all pooled connections"""
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+            logger.info(f"🛑 OpenAI HTTP pool closed: {self.stats()}")
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        """POST to the OpenAI API over a pooled connection"""
+        if not self.client:
+            raise RuntimeError("OpenAI HTTP pool is not started")
+        return await self.client.post(path, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Request/connection counters and the connection reuse ratio"""
+        requests = self._stats["requests"]
+        opened = self._stats["connections_opened"]
+        reuse_ratio = (requests - opened) / requests if requests else 0.0
+        return {
+            "requests": requests,
+            "connections_opened": opened,
+            "reuse_ratio": round(max(reuse_ratio, 0.0), 3),
+        }
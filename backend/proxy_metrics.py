@@ -0,0 +1,140 @@
+"""
+Prometheus text exposition for the realtime proxy
+Renders per-session relay metrics plus process-wide pool counters
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Dict[str, str]
+
+# stats() keys that only ever increase, per component prefix; these are
+# exported as counters (prefix_key_total), everything else as gauges
+COMPONENT_COUNTERS: Dict[str, frozenset] = {
+    "openai_http": frozenset({"requests", "connections_opened"}),
+    "ephemeral_token_pool": frozenset({"hits", "misses", "minted", "expired", "mint_errors"}),
+    "upstream_pool": frozenset({"opened", "connect_errors", "expired", "leased_warm", "leased_cold",
+                                "unhealthy"}),
+    "upstream_gate": frozenset({"connects", "failures", "retries", "opened", "probes", "queued",
+                                "admitted", "rejected", "timed_out"}),
+    "guardrail_worker": frozenset({"checked", "violations", "dropped", "errors"}),
+    "skill_extractor": frozenset({"requests", "local", "cached", "completed", "failed", "timed_out",
+                                  "cancelled", "rejected_busy", "batch_items", "batch_duplicates"}),
+    "skill_cache": frozenset({"hits", "db_hits", "misses", "stores", "evictions", "expired"}),
+    "skill_local_tier": frozenset({"answered", "escalated"}),
+    "node_registry": frozenset({"registered", "redirected", "wrong_worker", "refused", "drain_closed",
+                                "store_errors"}),
+    "instruction_cache": frozenset({"hits", "misses", "evictions", "bytes_reused"}),
+    "admission": frozenset({"admitted", "queued", "queue_admitted", "abandoned", "timed_out",
+                            "rejected_full", "rejected_lag", "unknown_tenants"}),
+    "loop_lag": frozenset({"samples", "stalls", "stall_seconds"}),
+}
+
+
+class MetricsWriter:
+    """Collects samples grouped by metric name and renders the text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Tuple[str, str, List[Tuple[str, Labels, float]]]] = {}
+
+    def add(self, name: str, metric_type: str, help_text: str, value: Optional[float],
+            labels: Optional[Labels] = None, suffix: str = ""):
+        """Add one sample; None values are skipped"""
+        if value is None:
+            return
+        if name not in self._metrics:
+            self._metrics[name] = (metric_type, help_text, [])
+        self._metrics[name][2].append((suffix, labels or {}, float(value)))
+
+    def add_histogram(self, name: str, help_text: str, cumulative: Iterable[Tuple[float, int]],
+                      total: float, count: int, labels: Optional[Labels] = None):
+        """Add a histogram from [(upper bound, cumulative count)] ending with +Inf"""
+        labels = labels or {}
+        for bound, observed in cumulative:
+            le = "+Inf" if bound == float("inf") else _format_value(bound)
+            self.add(name, "histogram", help_text, observed, {**labels, "le": le}, suffix="_bucket")
+        self.add(name, "histogram", help_text, total, labels, suffix="_sum")
+        self.add(name, "histogram", help_text, count, labels, suffix="_count")
+
+    def render(self) -> str:
+        lines = []
+        for name, (metric_type, help_text, samples) in self._metrics.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def add_session_metrics(writer: MetricsWriter, sessions: Iterable[Any]):
+    """Per-session relay metrics from realtime_relay.RelaySession objects"""
+    sessions = list(sessions)
+    writer.add("realtime_sessions_active", "gauge", "Live /ws/realtime relay sessions", len(sessions))
+    writer.add("realtime_sessions_parked", "gauge", "Sessions waiting for their browser to reconnect",
+               sum(1 for session in sessions if session.parked_at is not None))
+
+    for session in sessions:
+        sid = {"session_id": session.session_id}
+        for direction, counters in session.counters.items():
+            labels = {**sid, "direction": direction}
+            writer.add("realtime_session_bytes_total", "counter",
+                       "Bytes relayed per session and direction", counters.bytes, labels)
+            writer.add("realtime_session_frames_total", "counter",
+                       "Frames relayed per session and direction", counters.frames, labels)
+            writer.add("realtime_session_frames_per_second", "gauge",
+                       "Frames/sec over the last second", counters.rate(), labels)
+
+        for direction, queue in (("client->openai", session.upstream), ("openai->client", session.downstream)):
+            labels = {**sid, "direction": direction}
+            writer.add("realtime_session_queue_depth", "gauge",
+                       "Frames waiting in the relay queue", len(queue), labels)
+            writer.add("realtime_session_queue_dropped_total", "counter",
+                       "Stale audio frames dropped under backpressure", queue.dropped, labels)
+
+        writer.add("realtime_session_upstream_rtt_seconds", "gauge",
+                   "Keepalive ping round trip to OpenAI", session.upstream_rtt(), sid)
+        writer.add("realtime_session_first_audio_seconds", "gauge",
+                   "Seconds from session start to the first audio delta", session.first_audio, sid)
+        writer.add("realtime_session_time_to_first_audio_seconds", "gauge",
+                   "Last turn end to first audio delta", session.ttfa_last, sid)
+        writer.add("realtime_session_resumes_total", "counter",
+                   "Browser reconnects that resumed this session", session.resumes, sid)
+        writer.add("realtime_session_guardrail_checks_total", "counter",
+                   "AI responses checked against the guardrails", session.guardrail_checks, sid)
+        writer.add("realtime_session_guardrail_violations_total", "counter",
+                   "Guardrail violations detected", session.guardrail_violations, sid)
+
+
+def add_component_metrics(writer: MetricsWriter, prefix: str, stats: Dict[str, Any],
+                          counters: Optional[Iterable[str]] = None):
+    """
+    Flatten a component's stats() dict: keys in `counters` (default
+    COMPONENT_COUNTERS[prefix]) become prefix_key_total counters, the rest
+    prefix_key gauges
+    """
+    counters = COMPONENT_COUNTERS.get(prefix, frozenset()) if counters is None else frozenset(counters)
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        help_text = f"{prefix.replace('_', ' ')} {key.replace('_', ' ')}"
+        if key in counters:
+            writer.add(f"{prefix}_{key}_total", "counter", help_text, value)
+        else:
+            writer.add(f"{prefix}_{key}", "gauge", help_text, value)
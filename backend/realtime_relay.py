@@ -0,0 +1,478 @@
+"""
+Realtime proxy relay helpers
+Classifies OpenAI Realtime frames without decoding the whole JSON payload
+"""
+
+import asyncio
+import base64
+import json
+import os
+import secrets
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# "fast" peeks at the event type and only decodes inspected events,
+# "full" decodes every frame (the original behaviour, handy for debugging)
+RELAY_MODE = os.getenv("REALTIME_RELAY_MODE", "fast").lower()
+
+# How far into a frame we look for the top-level "type" key. OpenAI puts
+# "type" (or "event_id" then "type") at the start of every event.
+PEEK_WINDOW = 256
+
+# Audio frames are forwarded untouched and never decoded
+AUDIO_EVENTS = frozenset({
+    "input_audio_buffer.append",
+    "response.audio.delta",
+})
+
+# Events whose payload the proxy actually reads
+CLIENT_INSPECTED_EVENTS = frozenset({
+    "session.update",
+})
+
+SERVER_INSPECTED_EVENTS = frozenset({
+    "session.created",
+    "session.updated",
+    "response.done",
+    "response.text.delta",
+    "response.content_part.done",
+    "error",
+})
+
+# Per-direction relay queue bounds. Above the high watermark the reader
+# pauses (or stale audio is dropped) until the writer drains to the low one.
+QUEUE_HIGH_WATERMARK = int(os.getenv("REALTIME_QUEUE_HIGH_WATERMARK", "256"))
+QUEUE_LOW_WATERMARK = int(os.getenv("REALTIME_QUEUE_LOW_WATERMARK", "64"))
+DROP_STALE_AUDIO = os.getenv("REALTIME_DROP_STALE_AUDIO", "true").lower() == "true"
+
+# Only output audio may be dropped under backpressure; candidate audio and
+# every control event are always delivered
+DROPPABLE_DOWNSTREAM_EVENTS = frozenset({"response.audio.delta"}) if DROP_STALE_AUDIO else frozenset()
+
+# Browsers may send raw PCM16 binary frames instead of base64 JSON appends,
+# and optionally receive response.audio.delta as binary frames. Negotiated
+# per connection with ?binary_audio=in|both or this subprotocol (= both).
+BINARY_AUDIO_SUBPROTOCOL = "binary-audio"
+
+# Consecutive input_audio_buffer.append frames arriving within this many
+# milliseconds are merged into one upstream frame (0 disables), up to
+# COALESCE_MAX_BYTES of base64 audio per merged frame
+COALESCE_WINDOW_MS = float(os.getenv("REALTIME_COALESCE_MS", "5"))
+COALESCE_MAX_BYTES = int(os.getenv("REALTIME_COALESCE_MAX_BYTES", "32768"))
+
+# Seconds a dropped browser has to reconnect and resume its upstream
+# session; meanwhile upstream events wait in the downstream queue (0 disables)
+RESUME_GRACE_SECONDS = float(os.getenv("REALTIME_RESUME_GRACE", "30"))
+
+_TYPE_KEY = '"type"'
+_DELTA_KEY = '"delta"'
+_AUDIO_KEY = '"audio"'
+_APPEND_EVENT = "input_audio_buffer.append"
+
+
+def _peek_string_field(frame: str, key: str, key_window: int,
+                       value_window: Optional[int] = None) -> Optional[str]:
+    """
+    Read a top-level string field of a JSON object without parsing it.
+    Returns None when the prefix is not simple enough to trust, in which
+    case the caller should fall back to json.loads.
+    """
+    if not frame or frame[0] != "{":
+        return None
+
+    key_at = frame.find(key, 1, key_window)
+    if key_at < 0:
+        return None
+
+    # The key must sit at depth 1 and outside any string, otherwise we may
+    # have matched a nested object's key or text inside a value. Rather
+    # than walking the prefix char by char, refuse anything but a flat one.
+    prefix = frame[1:key_at]
+    if "{" in prefix or "[" in prefix or "\\" in prefix or prefix.count('"') % 2:
+        return None
+
+    # Skip whitespace and the colon after the key
+    i = key_at + len(key)
+    length = len(frame)
+    while i < length and frame[i] in " \t\r\n":
+        i += 1
+    if i >= length or frame[i] != ":":
+        return None
+    i += 1
+    while i < length and frame[i] in " \t\r\n":
+        i += 1
+    if i >= length or frame[i] != '"':
+        return None
+
+    value_end = length if value_window is None else i + 1 + value_window
+    end = frame.find('"', i + 1, value_end)
+    if end < 0:
+        return None
+    value = frame[i + 1:end]
+    if "\\" in value:
+        return None
+    return value
+
+
+def peek_event_type(frame: str) -> Optional[str]:
+    """Read the top-level "type" of a JSON event without parsing it"""
+    return _peek_string_field(frame, _TYPE_KEY, PEEK_WINDOW, PEEK_WINDOW)
+
+
+def negotiate_binary_audio(query_flag: Optional[str], subprotocols: List[str]) -> Tuple[bool, bool, Optional[str]]:
+    """
+    Decide binary audio support for a browser connection.
+    Returns (binary_in, binary_out, subprotocol_to_accept).
+    """
+    if BINARY_AUDIO_SUBPROTOCOL in subprotocols:
+        return True, True, BINARY_AUDIO_SUBPROTOCOL
+    flag = (query_flag or "").lower()
+    if flag in ("both", "1", "true"):
+        return True, True, None
+    if flag == "in":
+        return True, False, None
+    return False, False, None
+
+
+def wrap_audio_append(pcm: bytes) -> str:
+    """Wrap a raw PCM16 frame as an input_audio_buffer.append event"""
+    return _append_frame(base64.b64encode(pcm).decode("ascii"))
+
+
+def _append_frame(audio_b64: str) -> str:
+    return '{"type":"input_audio_buffer.append","audio":"' + audio_b64 + '"}'
+
+
+def merge_audio_appends(parts: List[str]) -> str:
+    """
+    Build one append event from several base64 audio payloads. Unpadded
+    base64 strings concatenate into valid base64 as-is; only when a part
+    carries padding do we decode and re-encode.
+    """
+    if all(not part.endswith("=") for part in parts[:-1]):
+        return _append_frame("".join(parts))
+    pcm = b"".join(base64.b64decode(part) for part in parts)
+    return _append_frame(base64.b64encode(pcm).decode("ascii"))
+
+
+def extract_audio_delta(frame: str) -> Optional[bytes]:
+    """
+    Pull the PCM16 payload out of a response.audio.delta frame without a
+    full JSON decode. Returns None if the frame is not in the flat shape
+    OpenAI sends, in which case it should be relayed as text.
+    """
+    delta = _peek_string_field(frame, _DELTA_KEY, len(frame))
+    if delta is None:
+        return None
+    try:
+        return base64.b64decode(delta, validate=True)
+    except ValueError:
+        return None
+
+
+def classify_frame(frame: Any, inspected: frozenset) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Classify a relay frame.
+
+    Returns (event_type, message). message is the decoded event only for
+    types in `inspected` (or for every frame in "full" mode); all other
+    frames are classified by peeking and left undecoded.
+    """
+    if not isinstance(frame, str):
+        return "binary", None
+
+    if RELAY_MODE != "full":
+        event_type = peek_event_type(frame)
+        if event_type is not None and event_type not in inspected:
+            return event_type, None
+
+    try:
+        msg = json.loads(frame)
+    except ValueError:
+        return "invalid", None
+    if not isinstance(msg, dict):
+        return "invalid", None
+    return msg.get("type", "unknown"), msg
+
+
+class RelayQueue:
+    """
+    Bounded queue between the reader and writer task of one relay direction.
+
+    When the queue reaches the high watermark a droppable frame (stale
+    output audio) evicts the oldest droppable frame already queued; any
+    other frame makes put() wait until the writer drains the queue down to
+    the low watermark, which stops the reader and lets TCP push back on
+    the sender instead of buffering without bound.
+    """
+
+    def __init__(self, high_watermark: int = QUEUE_HIGH_WATERMARK,
+                 low_watermark: int = QUEUE_LOW_WATERMARK,
+                 droppable: frozenset = frozenset()):
+        self.high_watermark = high_watermark
+        self.low_watermark = min(low_watermark, high_watermark)
+        self.droppable = droppable
+        self._frames: Deque[Tuple[str, Any]] = deque()
+        self._not_empty = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self.max_depth = 0
+        self.dropped = 0
+        self.pauses = 0
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    async def put(self, frame: Any, event_type: str):
+        """Queue a frame, applying the drop policy or waiting for the writer"""
+        while len(self._frames) >= self.high_watermark:
+            if event_type in self.droppable and self._drop_oldest_droppable():
+                break
+            self._drained.clear()
+            self.pauses += 1
+            await self._drained.wait()
+
+        self._frames.append((event_type, frame))
+        if len(self._frames) > self.max_depth:
+            self.max_depth = len(self._frames)
+        self._not_empty.set()
+
+    async def wait_for_frame(self):
+        """Wait until a frame is queued, without taking it"""
+        while not self._frames:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+
+    def requeue(self, frame: Any, event_type: str):
+        """Put a frame the writer failed to send back at the head of the queue"""
+        self._frames.appendleft((event_type, frame))
+        self._not_empty.set()
+
+    def get_nowait(self) -> Tuple[str, Any]:
+        """Take the next frame; the queue must not be empty"""
+        item = self._frames.popleft()
+        if len(self._frames) <= self.low_watermark:
+            self._drained.set()
+        return item
+
+    async def get(self) -> Tuple[str, Any]:
+        """Next (event_type, frame), waiting if the queue is empty"""
+        await self.wait_for_frame()
+        return self.get_nowait()
+
+    def _drop_oldest_droppable(self) -> bool:
+        for index, (event_type, _) in enumerate(self._frames):
+            if event_type in self.droppable:
+                del self._frames[index]
+                self.dropped += 1
+                return True
+        return False
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "depth": len(self._frames),
+            "max_depth": self.max_depth,
+            "dropped": self.dropped,
+            "pauses": self.pauses,
+        }
+
+
+class DirectionCounters:
+    """Frame/byte counters for one relay direction, with a per-second rate"""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+        self.fps = 0.0
+        self._window_start = time.monotonic()
+        self._window_frames = 0
+
+    def record(self, size: int):
+        self.frames += 1
+        self.bytes += size
+        self._window_frames += 1
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed >= 1.0:
+            self.fps = self._window_frames / elapsed
+            self._window_start = now
+            self._window_frames = 0
+
+    def rate(self) -> float:
+        """Frames/sec over the last complete window (0 once traffic stops)"""
+        if time.monotonic() - self._window_start >= 2.0:
+            return 0.0
+        return self.fps
+
+
+# A user turn ends with one of these; the next audio delta after it
+# measures time-to-first-audio
+TURN_END_EVENTS = frozenset({
+    "input_audio_buffer.commit",
+    "response.create",
+    "input_audio_buffer.speech_stopped",
+})
+
+
+class RelaySession:
+    """State for one browser <-> OpenAI relay, shared by its four tasks"""
+
+    def __init__(self, client: str, binary_in: bool = False, binary_out: bool = False):
+        self.session_id = uuid.uuid4().hex[:12]
+        self.client = client
+        self.binary_in = binary_in
+        self.binary_out = binary_out
+        self.started_at = time.time()
+        self.upstream = RelayQueue()
+        self.downstream = RelayQueue(droppable=DROPPABLE_DOWNSTREAM_EVENTS)
+        self.coalesce = {"appends_in": 0, "frames_out": 0}
+        # Filled asynchronously by guardrail_worker.GuardrailWorker
+        self.guardrails: List[Dict[str, Any]] = []
+        self.guardrail_checks = 0
+        self.guardrail_violations = 0
+        self.counters = {"client->openai": DirectionCounters(), "openai->client": DirectionCounters()}
+        self.upstream_ws = None
+        # Browser socket, so a draining node can close it with a restart code
+        self.client_ws = None
+        # Reader/writer tasks on the OpenAI side; they outlive a dropped browser
+        self.upstream_tasks: List[asyncio.Task] = []
+        self.log_sampler = None
+        # Proves a reconnecting browser owns this session
+        self.resume_token = secrets.token_urlsafe(24)
+        self.resumes = 0
+        self.parked_at: Optional[float] = None
+        self.grace_task: Optional[asyncio.Task] = None
+        self.ended = False
+        # Tenant whose admission slot this session holds (see admission.py)
+        self.tenant: Optional[str] = None
+        self.first_audio: Optional[float] = None
+        self.ttfa_last: Optional[float] = None
+        self.ttfa_total = 0.0
+        self.ttfa_count = 0
+        self._turn_ended_at: Optional[float] = None
+
+    def record_frame(self, direction: str, event_type: str, size: int):
+        """Count a relayed frame and track time-to-first-audio"""
+        self.counters[direction].record(size)
+        if event_type in TURN_END_EVENTS:
+            if self._turn_ended_at is None:
+                self._turn_ended_at = time.monotonic()
+        elif event_type == "response.audio.delta":
+            if self.first_audio is None:
+                self.first_audio = time.time() - self.started_at
+            if self._turn_ended_at is not None:
+                self.ttfa_last = time.monotonic() - self._turn_ended_at
+                self.ttfa_total += self.ttfa_last
+                self.ttfa_count += 1
+                self._turn_ended_at = None
+
+    def check_resume_token(self, token: Optional[str]) -> bool:
+        return bool(token) and secrets.compare_digest(token, self.resume_token)
+
+    def upstream_alive(self) -> bool:
+        return bool(self.upstream_tasks) and not any(task.done() for task in self.upstream_tasks)
+
+    def upstream_rtt(self) -> Optional[float]:
+        """Latest keepalive ping round trip to OpenAI, as measured by websockets"""
+        return getattr(self.upstream_ws, "latency", None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "client": self.client,
+            "duration": round(time.time() - self.started_at, 1),
+            "binary_audio": {"in": self.binary_in, "out": self.binary_out},
+            "parked": self.parked_at is not None,
+            "resumes": self.resumes,
+            "traffic": {
+                direction: {"frames": c.frames, "bytes": c.bytes, "fps": round(c.rate(), 1)}
+                for direction, c in self.counters.items()
+            },
+            "upstream_rtt": self.upstream_rtt(),
+            "first_audio": self.first_audio,
+            "ttfa_last": self.ttfa_last,
+            "ttfa_avg": self.ttfa_total / self.ttfa_count if self.ttfa_count else None,
+            "queues": {
+                "client->openai": self.upstream.stats(),
+                "openai->client": self.downstream.stats(),
+            },
+            "coalesce": dict(self.coalesce),
+            "guardrails": {
+                "checked": self.guardrail_checks,
+                "violations": self.guardrail_violations,
+                "last": self.guardrails[-1] if self.guardrails else None,
+            },
+        }
+
+
+# Live relays on this process, keyed by session_id
+active_sessions: Dict[str, RelaySession] = {}
+# Subset of active_sessions whose browser dropped and may still resume
+parked_sessions: Dict[str, RelaySession] = {}
+
+
+async def pump(queue: RelayQueue, send):
+    """Writer loop: drain a relay queue into a socket's send coroutine"""
+    while True:
+        event_type, frame = await queue.get()
+        try:
+            await send(frame)
+        except Exception:
+            # Keep the frame for a resumed connection to replay
+            queue.requeue(frame, event_type)
+            raise
+
+
+async def pump_coalesced(queue: RelayQueue, send, stats: Dict[str, int],
+                         window_ms: float = COALESCE_WINDOW_MS,
+                         max_bytes: int = COALESCE_MAX_BYTES):
+    """
+    Upstream writer loop that merges consecutive audio appends.
+
+    After an append is taken, further appends already queued are merged
+    immediately; if the queue runs dry we wait at most window_ms for the
+    next one. Any other event ends the batch and is sent right after it,
+    so event order is preserved.
+    """
+    if window_ms <= 0:
+        await pump(queue, send)
+        return
+
+    loop = asyncio.get_running_loop()
+    window = window_ms / 1000
+    while True:
+        event_type, frame = await queue.get()
+        audio = _peek_string_field(frame, _AUDIO_KEY, len(frame)) if event_type == _APPEND_EVENT else None
+        if audio is None:
+            await send(frame)
+            continue
+
+        parts = [audio]
+        size = len(audio)
+        deadline = loop.time() + window
+        carry = None
+        while size < max_bytes:
+            if not len(queue):
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(queue.wait_for_frame(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            next_type, next_frame = queue.get_nowait()
+            next_audio = (_peek_string_field(next_frame, _AUDIO_KEY, len(next_frame))
+                          if next_type == _APPEND_EVENT else None)
+            if next_audio is None:
+                carry = next_frame
+                break
+            parts.append(next_audio)
+            size += len(next_audio)
+
+        stats["appends_in"] += len(parts)
+        stats["frames_out"] += 1
+        await send(frame if len(parts) == 1 else merge_audio_appends(parts))
+        if carry is not None:
+            await send(carry)
@@ -0,0 +1,346 @@
+"""
+Shared session registry for running the realtime proxy on several workers/nodes
+Records which node owns each live relay so reconnects can be steered back
+to it, and carries each node's draining flag during rolling restarts.
+
+Backends:
+- memory: process-local, only correct for a single worker (the default)
+- redis:  any Redis-compatible server (Redis, Valkey, KeyDB, or
+          fake_redis_server.py for local testing); needs the redis package
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from typing import Any, Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# "memory" or "redis"
+SESSION_STORE = os.getenv("SESSION_STORE", "memory").lower()
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL", "redis://127.0.0.1:6379/0")
+SESSION_STORE_PREFIX = os.getenv("SESSION_STORE_PREFIX", "intenx")
+# Registry entries expire unless the owning worker keeps heartbeating them
+SESSION_STORE_TTL = int(os.getenv("SESSION_STORE_TTL", "30"))
+# Identity of this node; every worker process on a node shares it
+NODE_ID = os.getenv("NODE_ID") or socket.gethostname()
+# Where browsers can reach this node directly (sent in affinity redirects)
+NODE_ADDRESS = os.getenv("NODE_ADDRESS", "")
+# Live interviews get this long to finish after a drain before being closed
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "900"))
+# Cookie set on /ws/realtime so cookie-based load balancers pin reconnects
+AFFINITY_COOKIE = os.getenv("AFFINITY_COOKIE", "intenx_node")
+
+# Close codes sent to browsers (4000-4999 are application defined)
+CLOSE_SERVICE_RESTART = 1012   # drain timeout hit, reconnect to another node
+CLOSE_TRY_AGAIN_LATER = 1013   # node is draining, not taking new sessions
+CLOSE_WRONG_NODE = 4302        # session lives on another node, see proxy.redirect
+CLOSE_WRONG_WORKER = 4303      # session lives on another worker of this node, reconnect to retry
+CLOSE_SUPERSEDED = 4409        # the browser reconnected and resumed on a new socket
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    aioredis = None
+    REDIS_AVAILABLE = False
+
+
+class InMemorySessionStore:
+    """
+    Registry kept in this process. Entries carry the same TTL semantics as
+    the Redis backend so both behave alike; only one worker can see them.
+    """
+
+    backend = "memory"
+
+    def __init__(self, ttl: int = SESSION_STORE_TTL):
+        self.ttl = ttl
+        self._sessions: Dict[str, tuple] = {}
+        self._draining: Dict[str, tuple] = {}
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def register(self, session_id: str, record: Dict[str, Any]):
+        self._sessions[session_id] = (record, time.monotonic() + self.ttl)
+
+    async def unregister(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    async def lookup(self, session_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._sessions[session_id]
+            return None
+        return entry[0]
+
+    async def heartbeat(self, node_id: str, session_ids: Iterable[str]):
+        """Extend the TTL of this worker's live sessions"""
+        deadline = time.monotonic() + self.ttl
+        for session_id in session_ids:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                self._sessions[session_id] = (entry[0], deadline)
+
+    async def node_sessions(self, node_id: str) -> int:
+        """Live sessions owned by a node across all its workers"""
+        count = 0
+        for session_id, (record, _) in list(self._sessions.items()):
+            if record.get("node") == node_id and await self.lookup(session_id):
+                count += 1
+        return count
+
+    async def set_draining(self, node_id: str, draining: bool, ttl: int):
+        if draining:
+            # Like SET NX: repeated drain requests keep the original start time
+            if await self.draining_since(node_id) is None:
+                self._draining[node_id] = (time.time(), time.monotonic() + ttl)
+        else:
+            self._draining.pop(node_id, None)
+
+    async def draining_since(self, node_id: str) -> Optional[float]:
+        """Wall-clock time the node started draining, or None"""
+        entry = self._draining.get(node_id)
+        if entry is None or entry[1] <= time.monotonic():
+            self._draining.pop(node_id, None)
+            return None
+        return entry[0]
+
+
+class RedisSessionStore:
+    """
+    Registry in a Redis-compatible server, shared by every worker and node.
+
+    Keys (all under SESSION_STORE_PREFIX):
+    - session:<id>        JSON record, expires after ttl without a heartbeat
+    - node:<id>:sessions  set of session ids a node has registered
+    - drain:<id>          drain start time while the node is draining
+    """
+
+    backend = "redis"
+
+    def __init__(self, url: str = SESSION_STORE_URL, prefix: str = SESSION_STORE_PREFIX,
+                 ttl: int = SESSION_STORE_TTL):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("SESSION_STORE=redis requires the redis package (pip install redis)")
+        self.url = url
+        self.prefix = prefix
+        self.ttl = ttl
+        self._redis = None
+
+    def _key(self, *parts: str) -> str:
+        return ":".join((self.prefix, *parts))
+
+    async def start(self):
+        # RESP2 keeps older and stand-in Redis-compatible servers working
+        self._redis = aioredis.from_url(self.url, decode_responses=True, protocol=2)
+        await self._redis.ping()
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def register(self, session_id: str, record: Dict[str, Any]):
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.set(self._key("session", session_id), json.dumps(record), ex=self.ttl)
+        pipe.sadd(self._key("node", record["node"], "sessions"), session_id)
+        await pipe.execute()
+
+    async def unregister(self, session_id: str):
+        record = await self.lookup(session_id)
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.delete(self._key("session", session_id))
+        if record:
+            pipe.srem(self._key("node", record["node"], "sessions"), session_id)
+        await pipe.execute()
+
+    async def lookup(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self._redis.get(self._key("session", session_id))
+        return json.loads(raw) if raw else None
+
+    async def heartbeat(self, node_id: str, session_ids: Iterable[str]):
+        """Extend the TTL of this worker's live sessions"""
+        pipe = self._redis.pipeline(transaction=False)
+        for session_id in session_ids:
+            pipe.expire(self._key("session", session_id), self.ttl)
+        await pipe.execute()
+
+    async def node_sessions(self, node_id: str) -> int:
+        """Live sessions owned by a node across all its workers; prunes stale ids"""
+        members_key = self._key("node", node_id, "sessions")
+        session_ids = list(await self._redis.smembers(members_key))
+        if not session_ids:
+            return 0
+        records = await self._redis.mget([self._key("session", s) for s in session_ids])
+        stale = [s for s, raw in zip(session_ids, records) if raw is None]
+        if stale:
+            await self._redis.srem(members_key, *stale)
+        return len(session_ids) - len(stale)
+
+    async def set_draining(self, node_id: str, draining: bool, ttl: int):
+        if draining:
+            await self._redis.set(self._key("drain", node_id), str(time.time()), ex=ttl, nx=True)
+        else:
+            await self._redis.delete(self._key("drain", node_id))
+
+    async def draining_since(self, node_id: str) -> Optional[float]:
+        """Wall-clock time the node started draining, or None"""
+        raw = await self._redis.get(self._key("drain", node_id))
+        return float(raw) if raw else None
+
+
+def create_session_store(backend: str = SESSION_STORE):
+    """Build the configured registry backend"""
+    if backend == "redis":
+        return RedisSessionStore()
+    if backend != "memory":
+        logger.warning(f"⚠️ Unknown SESSION_STORE={backend!r}, using in-memory registry")
+    return InMemorySessionStore()
+
+
+class NodeRegistry:
+    """
+    This worker's view of the shared registry: registers its relay sessions,
+    heartbeats them, and follows the node's draining flag. Store outages are
+    logged and tolerated; relaying never depends on the registry.
+    """
+
+    def __init__(self, store, sessions: Dict[str, Any], node_id: str = NODE_ID,
+                 address: str = NODE_ADDRESS, drain_timeout: float = DRAIN_TIMEOUT,
+                 worker_id: Optional[int] = None):
+        self.store = store
+        self.sessions = sessions
+        self.node_id = node_id
+        self.worker_id = worker_id or os.getpid()
+        self.address = address
+        self.drain_timeout = drain_timeout
+        self.draining_since: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._drain_closed: Set[str] = set()
+        self._stats = {"registered": 0, "redirected": 0, "wrong_worker": 0, "refused": 0,
+                       "drain_closed": 0, "store_errors": 0}
+
+    @property
+    def draining(self) -> bool:
+        return self.draining_since is not None
+
+    def drain_expired(self) -> bool:
+        """True once a drain has run past its timeout"""
+        return self.draining and time.time() - self.draining_since >= self.drain_timeout
+
+    async def start(self):
+        """Connect the store and start heartbeating"""
+        try:
+            await self.store.start()
+        except Exception as e:
+            self._stats["store_errors"] += 1
+            logger.warning(f"⚠️ Session store unavailable ({self.store.backend}): {e}")
+        self._task = asyncio.create_task(self._heartbeat_loop())
+        logger.info(f"✅ Session registry started (node={self.node_id}, store={self.store.backend}, "
+                    f"worker={self.worker_id})")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.store.close()
+
+    async def register(self, session):
+        record = {"node": self.node_id, "address": self.address, "worker": self.worker_id,
+                  "client": session.client, "started_at": session.started_at}
+        if await self._call(self.store.register(session.session_id, record)) is not False:
+            self._stats["registered"] += 1
+
+    async def unregister(self, session_id: str):
+        await self._call(self.store.unregister(session_id))
+
+    async def owner(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Registry record for a session living on another node or on another
+        worker of this node, else None. Callers tell the two apart by "node".
+        """
+        record = await self._call(self.store.lookup(session_id))
+        if not record:
+            return None
+        if record.get("node") != self.node_id or record.get("worker") != self.worker_id:
+            return record
+        return None
+
+    async def drain(self, draining: bool = True) -> Dict[str, Any]:
+        """Start (or cancel) draining every worker on this node"""
+        ttl = int(self.drain_timeout) + self.store.ttl * 2
+        await self._call(self.store.set_draining(self.node_id, draining, ttl))
+        await self._refresh()
+        if not draining:
+            self.draining_since = None
+        logger.info(f"{'🚰 Draining' if draining else '▶️ Undrained'} node {self.node_id}")
+        return await self.drain_status()
+
+    async def drain_status(self) -> Dict[str, Any]:
+        node_sessions = await self._call(self.store.node_sessions(self.node_id))
+        return {
+            "node": self.node_id,
+            "draining": self.draining,
+            "draining_since": self.draining_since,
+            "drain_timeout": self.drain_timeout,
+            "node_sessions": node_sessions,
+            "worker_sessions": len(self.sessions),
+        }
+
+    def count(self, stat: str):
+        self._stats[stat] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "node": self.node_id, "store": self.store.backend,
+                "draining": self.draining, "sessions": len(self.sessions)}
+
+    async def _call(self, operation):
+        try:
+            return await operation
+        except Exception as e:
+            self._stats["store_errors"] += 1
+            logger.warning(f"⚠️ Session store error: {e}")
+            return False
+
+    async def _refresh(self):
+        since = await self._call(self.store.draining_since(self.node_id))
+        if since is not False:
+            self.draining_since = since
+
+    async def _heartbeat_loop(self):
+        interval = max(1.0, self.store.ttl / 3)
+        while True:
+            await self._call(self.store.heartbeat(self.node_id, list(self.sessions)))
+            await self._refresh()
+            if self.drain_expired():
+                await self._close_remaining()
+            await asyncio.sleep(interval)
+
+    async def _close_remaining(self):
+        # Sockets already closed stay in self.sessions until their relay
+        # notices; close (and count) each session only once
+        self._drain_closed &= set(self.sessions)
+        for session_id, session in list(self.sessions.items()):
+            ws = getattr(session, "client_ws", None)
+            if ws is None or session_id in self._drain_closed:
+                continue
+            self._drain_closed.add(session_id)
+            self._stats["drain_closed"] += 1
+            try:
+                await ws.close(code=CLOSE_SERVICE_RESTART, reason="node draining")
+            except Exception:
+                pass
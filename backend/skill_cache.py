@@ -0,0 +1,139 @@
+"""
+Content-addressed cache for job-description skill extraction
+Descriptions are keyed by a hash of their normalized text (case and
+whitespace folded), so re-submitted or trivially edited postings reuse an
+earlier extraction. An in-process LRU with TTL sits in front of a
+persistent tier in the database shared by all workers.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SKILL_CACHE_ENABLED = os.getenv("SKILL_CACHE_ENABLED", "true").lower() == "true"
+# Descriptions kept in memory per worker (least recently used are evicted)
+SKILL_CACHE_SIZE = int(os.getenv("SKILL_CACHE_SIZE", "2048"))
+SKILL_CACHE_TTL = float(os.getenv("SKILL_CACHE_TTL", "86400"))
+# Age after which database entries are ignored (0 disables the database tier)
+SKILL_CACHE_DB_TTL = float(os.getenv("SKILL_CACHE_DB_TTL", str(30 * 86400)))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_description(text: str) -> str:
+    """Fold case and collapse runs of whitespace"""
+    return _WHITESPACE.sub(" ", (text or "").casefold()).strip()
+
+
+def description_key(text: str, namespace: str = "") -> str:
+    """Hash of the normalized description; namespace separates models/prompts"""
+    normalized = normalize_description(text)
+    return hashlib.sha256(f"{namespace}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+class SkillCache:
+    """
+    get()/put() for synchronous callers, aget()/aput() for the event loop
+    (database calls run in a thread). `store` is the app database; anything
+    with get_skill_extraction/save_skill_extraction works.
+    """
+
+    def __init__(self, store=None, namespace: str = "", max_size: int = SKILL_CACHE_SIZE,
+                 ttl: float = SKILL_CACHE_TTL, db_ttl: float = SKILL_CACHE_DB_TTL,
+                 enabled: bool = SKILL_CACHE_ENABLED):
+        self.store = store if db_ttl > 0 and hasattr(store, "get_skill_extraction") else None
+        self.namespace = namespace
+        self.max_size = max_size
+        self.ttl = ttl
+        self.db_ttl = db_ttl
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._stats = {"hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    def key(self, description: str) -> str:
+        return description_key(description, self.namespace)
+
+    def get(self, description: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        key = self.key(description)
+        result = self._get_memory(key)
+        if result is None and self.store is not None:
+            result = self._from_store(key, self.store.get_skill_extraction(key, self.db_ttl))
+        if result is None:
+            self._stats["misses"] += 1
+        return result
+
+    def put(self, description: str, result: Dict[str, Any]):
+        if not self.enabled or not result.get("success"):
+            return
+        key = self.key(description)
+        self._put_memory(key, result)
+        if self.store is not None:
+            self.store.save_skill_extraction(key, result)
+
+    async def aget(self, description: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        key = self.key(description)
+        result = self._get_memory(key)
+        if result is None and self.store is not None:
+            stored = await asyncio.to_thread(self.store.get_skill_extraction, key, self.db_ttl)
+            result = self._from_store(key, stored)
+        if result is None:
+            self._stats["misses"] += 1
+        return result
+
+    async def aput(self, description: str, result: Dict[str, Any]):
+        if not self.enabled or not result.get("success"):
+            return
+        key = self.key(description)
+        self._put_memory(key, result)
+        if self.store is not None:
+            await asyncio.to_thread(self.store.save_skill_extraction, key, result)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["db_hits"] + self._stats["misses"]
+        hits = self._stats["hits"] + self._stats["db_hits"]
+        return {
+            **self._stats,
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self._entries),
+            "persistent": self.store is not None,
+        }
+
+    def _get_memory(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self._stats["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._stats["hits"] += 1
+        return result
+
+    def _from_store(self, key: str, result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if result is None:
+            return None
+        self._stats["db_hits"] += 1
+        self._put_memory(key, result, count=False)
+        return result
+
+    def _put_memory(self, key: str, result: Dict[str, Any], count: bool = True):
+        if count:
+            self._stats["stores"] += 1
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
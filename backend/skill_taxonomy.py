@@ -0,0 +1,302 @@
+"""
+Deterministic local skill extraction
+A compiled skill taxonomy is matched against job descriptions in one pass
+with an Aho-Corasick automaton. Mentions are scored by frequency, position
+and requirement cues in the same clause ("must", "required" vs "nice to
+have"). When the top three skills clearly stand out the result is returned
+without an LLM call; otherwise the description is escalated to OpenAI.
+"""
+
+import logging
+import os
+import re
+import time
+from bisect import bisect_right
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SKILL_LOCAL_TIER = os.getenv("SKILL_LOCAL_TIER", "true").lower() == "true"
+# Score each of the top three skills must reach to be answered locally
+# (one mention in a "required" clause scores 1.5)
+SKILL_LOCAL_MIN_SCORE = float(os.getenv("SKILL_LOCAL_MIN_SCORE", "1.5"))
+# How far the third skill must lead the fourth (ratio) to be answered locally
+SKILL_LOCAL_MARGIN = float(os.getenv("SKILL_LOCAL_MARGIN", "1.3"))
+
+# Canonical skill name -> aliases (matched case-insensitively on word boundaries).
+# Aliases prefixed with "~" are ambiguous in plain English and count half.
+SKILL_TAXONOMY: Dict[str, Tuple[str, ...]] = {
+    "Python": ("python", "python3", "cpython"),
+    "Java": ("java", "jvm", "java 8", "java 11", "java 17"),
+    "JavaScript": ("javascript", "ecmascript", "es6", "vanilla js"),
+    "TypeScript": ("typescript",),
+    "Go": ("golang", "go lang", "go language"),
+    "Rust": ("rust", "rustlang"),
+    "C++": ("c++", "cpp", "modern c++"),
+    "C#": ("c#", "csharp", "c sharp"),
+    ".NET": (".net", "dotnet", "asp.net", ".net core"),
+    "Ruby": ("ruby",),
+    "Ruby on Rails": ("ruby on rails", "~rails"),
+    "PHP": ("php", "laravel", "symfony"),
+    "Kotlin": ("kotlin",),
+    "Swift": ("~swift", "swiftui"),
+    "Scala": ("scala",),
+    "R": ("r programming", "r language", "rstudio", "tidyverse"),
+    "SQL": ("sql", "t-sql", "pl/sql", "sql queries"),
+    "PostgreSQL": ("postgresql", "postgres"),
+    "MySQL": ("mysql", "mariadb"),
+    "MongoDB": ("mongodb", "mongo"),
+    "Redis": ("redis",),
+    "Elasticsearch": ("elasticsearch", "opensearch", "elk"),
+    "React": ("~react", "react.js", "reactjs", "react native"),
+    "Angular": ("angular", "angularjs"),
+    "Vue.js": ("vue", "vue.js", "vuejs", "nuxt"),
+    "Next.js": ("next.js", "nextjs"),
+    "Node.js": ("node.js", "nodejs", "~node"),
+    "Django": ("django",),
+    "Flask": ("flask",),
+    "FastAPI": ("fastapi",),
+    "Spring Boot": ("spring boot", "spring framework", "spring mvc"),
+    "GraphQL": ("graphql",),
+    "REST APIs": ("rest api", "rest apis", "restful", "restful apis"),
+    "Microservices": ("microservices", "microservice architecture"),
+    "System Design": ("system design", "distributed systems", "scalable systems"),
+    "AWS": ("aws", "amazon web services", "ec2", "s3", "~lambda"),
+    "Azure": ("azure", "microsoft azure"),
+    "GCP": ("gcp", "google cloud", "google cloud platform", "bigquery"),
+    "Docker": ("docker", "~containers", "containerization"),
+    "Kubernetes": ("kubernetes", "k8s", "helm", "eks", "gke"),
+    "Terraform": ("terraform", "infrastructure as code"),
+    "CI/CD": ("ci/cd", "continuous integration", "continuous delivery", "github actions", "jenkins", "gitlab ci"),
+    "Linux": ("linux", "unix", "bash", "shell scripting"),
+    "Git": ("git", "github", "gitlab", "version control"),
+    "Kafka": ("kafka", "event streaming"),
+    "Spark": ("~spark", "pyspark", "apache spark"),
+    "Airflow": ("airflow",),
+    "Data Engineering": ("data engineering", "etl", "data pipelines", "data warehouse"),
+    "Machine Learning": ("machine learning", "ml models", "scikit-learn", "sklearn"),
+    "Deep Learning": ("deep learning", "neural networks", "pytorch", "tensorflow", "keras"),
+    "NLP": ("nlp", "natural language processing", "llm", "llms", "large language models"),
+    "Computer Vision": ("computer vision", "opencv", "image recognition"),
+    "Data Analysis": ("data analysis", "pandas", "numpy", "~analytics"),
+    "Statistics": ("statistics", "statistical analysis", "a/b testing", "hypothesis testing"),
+    "Tableau": ("tableau", "power bi", "looker"),
+    "Excel": ("~excel", "spreadsheets"),
+    "HTML/CSS": ("html", "css", "html5", "css3", "sass", "tailwind"),
+    "iOS": ("ios",),
+    "Android": ("android",),
+    "Testing": ("unit testing", "test automation", "pytest", "jest", "selenium", "tdd"),
+    "Security": ("~security", "owasp", "penetration testing", "cybersecurity"),
+    "Networking": ("networking", "tcp/ip", "dns"),
+    "Agile": ("~agile", "scrum", "kanban", "~sprints"),
+    "Project Management": ("project management", "pmp", "stakeholder management"),
+    "Product Management": ("product management", "product roadmap", "roadmapping"),
+    "UX Design": ("ux", "ui/ux", "user experience", "figma", "wireframes"),
+    "Communication": ("communication skills", "written communication", "verbal communication"),
+    "Leadership": ("leadership", "mentoring", "people management", "team lead"),
+    "Sales": ("~sales", "b2b sales", "lead generation", "crm", "salesforce"),
+    "Marketing": ("marketing", "seo", "sem", "content marketing", "digital marketing"),
+    "Customer Service": ("customer service", "customer support", "client relations"),
+    "Accounting": ("accounting", "bookkeeping", "gaap", "financial reporting"),
+}
+
+# Words that mark a clause as a hard requirement or as optional, matched as whole words
+REQUIRED_CUES = ("must", "required", "requirement", "requirements", "strong", "expert", "expertise",
+                 "proficient", "proficiency", "experience with", "experience in", "years",
+                 "deep knowledge", "deep understanding", "solid", "extensive", "essential")
+OPTIONAL_CUES = ("nice to have", "nice-to-have", "bonus", "a plus", "is a plus", "preferred",
+                 "familiarity", "exposure", "ideally", "optional")
+
+# Scoring weights
+REQUIRED_WEIGHT = 1.5
+OPTIONAL_WEIGHT = 0.4
+AMBIGUOUS_WEIGHT = 0.5
+# Bonus for being mentioned early (scaled by how early, 0..POSITION_WEIGHT)
+POSITION_WEIGHT = 0.25
+
+# Clause boundaries; ":" is not one, so "Nice to have: Docker" stays a single clause
+_CLAUSE_BREAK = re.compile(r"(?:[.;!?](?:\s|$))|[\n•]|(?:\s-\s)")
+
+
+class MultiPatternIndex:
+    """
+    Aho-Corasick automaton over lowercase patterns. find() reports every
+    pattern occurrence that starts and ends on a word boundary, in one
+    pass over the text regardless of how many patterns there are.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, Any]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]
+        self.size = 0
+        for pattern, payload in patterns:
+            self._add(pattern.lower(), payload)
+        self._build()
+
+    def _add(self, pattern: str, payload: Any):
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(pattern), payload))
+        self.size += 1
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """Yield (start, end, payload) for word-bounded matches in text (already lowercased)"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        length = len(text)
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not out[state]:
+                continue
+            end = i + 1
+            if end < length and (text[end].isalnum() or text[end] == "_"):
+                continue
+            for pattern_length, payload in out[state]:
+                start = end - pattern_length
+                if start > 0 and (text[start - 1].isalnum() or text[start - 1] == "_"):
+                    continue
+                yield start, end, payload
+
+    def find_longest(self, text: str) -> List[Tuple[int, int, Any]]:
+        """Like find(), but drops matches inside a longer one ("java" in "java 17")"""
+        matches = sorted(self.find(text), key=lambda match: (match[0], match[0] - match[1]))
+        kept, covered = [], -1
+        for start, end, payload in matches:
+            if end <= covered:
+                continue
+            kept.append((start, end, payload))
+            covered = max(covered, end)
+        return kept
+
+
+def compile_taxonomy(taxonomy: Dict[str, Tuple[str, ...]] = SKILL_TAXONOMY) -> MultiPatternIndex:
+    """Index every alias as (alias, (canonical name, weight))"""
+    patterns = []
+    for name, aliases in taxonomy.items():
+        for alias in aliases:
+            weight = AMBIGUOUS_WEIGHT if alias.startswith("~") else 1.0
+            patterns.append((alias.lstrip("~"), (name, weight)))
+    return MultiPatternIndex(patterns)
+
+
+_CUE_INDEX = MultiPatternIndex([(cue, REQUIRED_WEIGHT) for cue in REQUIRED_CUES]
+                               + [(cue, OPTIONAL_WEIGHT) for cue in OPTIONAL_CUES])
+
+
+def _clauses(text: str) -> Tuple[List[int], List[float]]:
+    """Clause start offsets and the requirement weight of each clause; optional cues win"""
+    starts = [0] + [match.end() for match in _CLAUSE_BREAK.finditer(text)]
+    weights = [1.0] * len(starts)
+    for start, _, weight in _CUE_INDEX.find(text):
+        clause = bisect_right(starts, start) - 1
+        if weights[clause] != OPTIONAL_WEIGHT:
+            weights[clause] = weight
+    return starts, weights
+
+
+class LocalSkillExtractor:
+    """
+    extract() returns the usual {"success", "skills", "summary"} result
+    (with "source": "local") when it is confident, otherwise None so the
+    caller escalates to the LLM.
+    """
+
+    def __init__(self, index: Optional[MultiPatternIndex] = None, min_score: float = SKILL_LOCAL_MIN_SCORE,
+                 margin: float = SKILL_LOCAL_MARGIN, enabled: bool = SKILL_LOCAL_TIER):
+        self.index = index or DEFAULT_INDEX
+        self.min_score = min_score
+        self.margin = margin
+        self.enabled = enabled
+        self._stats = {"answered": 0, "escalated": 0, "seconds": 0.0}
+
+    def score(self, job_description: str) -> List[Dict[str, Any]]:
+        """Candidate skills with scores, best first"""
+        text = (job_description or "").lower()
+        if not text:
+            return []
+        starts, weights = _clauses(text)
+        length = len(text)
+        found: Dict[str, Dict[str, Any]] = {}
+        for start, end, (name, weight) in self.index.find_longest(text):
+            clause_weight = weights[bisect_right(starts, start) - 1]
+            entry = found.get(name)
+            if entry is None:
+                entry = found[name] = {"name": name, "mentions": 0, "score": 0.0, "required": False,
+                                       "first": start / length}
+                entry["score"] += POSITION_WEIGHT * (1 - entry["first"])
+            entry["mentions"] += 1
+            entry["score"] += weight * clause_weight
+            entry["required"] = entry["required"] or clause_weight == REQUIRED_WEIGHT
+        return sorted(found.values(), key=lambda entry: entry["score"], reverse=True)
+
+    def extract(self, job_description: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        started = time.perf_counter()
+        candidates = self.score(job_description)
+        result = self._decide(candidates)
+        self._stats["seconds"] += time.perf_counter() - started
+        self._stats["answered" if result else "escalated"] += 1
+        return result
+
+    def _decide(self, candidates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if len(candidates) < 3:
+            return None
+        top = candidates[:3]
+        if top[2]["score"] < self.min_score:
+            return None
+        if len(candidates) > 3 and top[2]["score"] < candidates[3]["score"] * self.margin:
+            return None
+        skills = []
+        for rank, entry in enumerate(top):
+            importance = "critical" if entry["required"] and rank < 2 else "high" if entry["required"] else "medium"
+            mentions = entry["mentions"]
+            reason = f"Mentioned {mentions} time{'s' if mentions != 1 else ''}"
+            reason += ", listed as a requirement" if entry["required"] else " in the description"
+            skills.append({"name": entry["name"], "importance": importance, "reason": reason})
+        names = [skill["name"] for skill in skills]
+        return {
+            "success": True,
+            "skills": skills,
+            "summary": f"Key requirements: {names[0]}, {names[1]} and {names[2]}.",
+            "source": "local",
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        total = self._stats["answered"] + self._stats["escalated"]
+        return {
+            "answered": self._stats["answered"],
+            "escalated": self._stats["escalated"],
+            "answered_ratio": round(self._stats["answered"] / total, 3) if total else 0.0,
+            "avg_us": round(self._stats["seconds"] / total * 1e6, 1) if total else 0.0,
+            "patterns": self.index.size,
+        }
+
+
+DEFAULT_INDEX = compile_taxonomy()
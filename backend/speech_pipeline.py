@@ -0,0 +1,176 @@
+"""
+Streaming transcribe -> LLM -> TTS pipeline for the audio WebSocket
+LLM tokens are cut into sentence-sized segments as they arrive. Each
+segment goes to TTS immediately, and the audio is pushed to the browser in
+order as ai_audio_chunk messages. The candidate hears the first sentence
+while the rest of the reply is still being generated and synthesized.
+"""
+
+import asyncio
+import base64
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Segments shorter than this are merged with the next sentence ("Great." alone sounds choppy)
+TTS_SEGMENT_MIN_CHARS = int(os.getenv("TTS_SEGMENT_MIN_CHARS", "20"))
+# Long run-on sentences are cut at a comma (or space) past this length
+TTS_SEGMENT_MAX_CHARS = int(os.getenv("TTS_SEGMENT_MAX_CHARS", "220"))
+# TTS requests in flight per turn
+TTS_CONCURRENCY = int(os.getenv("TTS_CONCURRENCY", "3"))
+
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+")
+_SOFT_BREAK = re.compile(r"[,;:—–]\s+")
+_COMPLETE = re.compile(r"[.!?][\"')\]]*$")
+_ABBREVIATIONS = {"e.g.", "i.e.", "mr.", "mrs.", "ms.", "dr.", "vs.", "etc.", "approx."}
+
+
+class SentenceSegmenter:
+    """Accumulates streamed text and hands out complete, speakable segments"""
+
+    def __init__(self, min_chars: int = TTS_SEGMENT_MIN_CHARS, max_chars: int = TTS_SEGMENT_MAX_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add streamed text; returns the segments it completed"""
+        self._buffer += text
+        segments = []
+        while True:
+            cut = self._find_cut()
+            if cut is None:
+                return segments
+            segment, self._buffer = self._buffer[:cut].strip(), self._buffer[cut:]
+            if segment:
+                segments.append(segment)
+
+    def flush(self) -> Optional[str]:
+        """Whatever is left once the stream ends"""
+        segment, self._buffer = self._buffer.strip(), ""
+        return segment or None
+
+    def _find_cut(self) -> Optional[int]:
+        buffer = self._buffer
+        for match in _SENTENCE_END.finditer(buffer):
+            if len(buffer[:match.end()].strip()) < self.min_chars:
+                continue
+            words = buffer[:match.start() + 1].split()
+            if words and words[-1].lower() in _ABBREVIATIONS:
+                continue
+            return match.end()
+        if len(buffer) <= self.max_chars:
+            return None
+        breaks = [m.end() for m in _SOFT_BREAK.finditer(buffer, 0, self.max_chars)]
+        if breaks:
+            return breaks[-1]
+        space = buffer.rfind(" ", self.min_chars, self.max_chars)
+        return space + 1 if space > 0 else self.max_chars
+
+
+class LatencyStats:
+    """Per-turn pipeline timings (milliseconds) for /health"""
+
+    def __init__(self):
+        self.turns = 0
+        self.last: Dict[str, float] = {}
+        self._totals: Dict[str, float] = {}
+        self._counts: Dict[str, int] = {}
+
+    def record(self, timings: Dict[str, float]):
+        self.turns += 1
+        self.last = dict(timings)
+        for key, value in timings.items():
+            self._totals[key] = self._totals.get(key, 0.0) + value
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        averages = {f"avg_{key}": round(total / self._counts[key], 1) for key, total in self._totals.items()}
+        return {"turns": self.turns, **averages, "last": self.last}
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.monotonic() - started) * 1000, 1)
+
+
+async def stream_spoken_response(ai_service, transcript: str, send: Callable[[Dict[str, Any]], Awaitable[None]],
+                                 audio_duration: float = 0, started: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Generate the reply to `transcript` and send it as ai_audio_chunk
+    messages ({"seq", "text", "audio": base64 MP3}) in order. If send
+    raises (browser gone), generation stops and pending TTS is cancelled.
+    Returns {"text", "segments", "timings"}; timings are milliseconds since
+    `started` (defaults to now).
+    """
+    started = started or time.monotonic()
+    segmenter = SentenceSegmenter()
+    slots = asyncio.Semaphore(TTS_CONCURRENCY)
+    ready: asyncio.Queue = asyncio.Queue()
+    timings: Dict[str, float] = {}
+    parts: List[str] = []
+    segments: List[str] = []
+
+    async def synthesize(text: str, partial: bool) -> Optional[bytes]:
+        async with slots:
+            return await ai_service.text_to_speech(text, partial=partial)
+
+    def start_segment(text: str, last: bool = False):
+        segments.append(text)
+        if "first_segment_ms" not in timings:
+            timings["first_segment_ms"] = _elapsed_ms(started)
+        # Run-ons cut at a comma or space continue in the next segment
+        partial = not last and not _COMPLETE.search(text)
+        ready.put_nowait((len(segments) - 1, text, asyncio.create_task(synthesize(text, partial))))
+
+    async def sender():
+        while True:
+            item = await ready.get()
+            if item is None:
+                return
+            seq, text, task = item
+            audio = await task
+            chunk = {"type": "ai_audio_chunk", "seq": seq, "text": text, "audio": None,
+                     "timestamp": datetime.now().isoformat()}
+            if audio:
+                chunk["audio"] = base64.b64encode(audio).decode("utf-8")
+                if "first_audio_ms" not in timings:
+                    timings["first_audio_ms"] = _elapsed_ms(started)
+            else:
+                logger.warning(f"[PIPELINE] TTS failed for segment {seq}, sending text only")
+            await send(chunk)
+
+    sender_task = asyncio.create_task(sender())
+    stream = ai_service.stream_conversational_response(transcript, audio_duration)
+    try:
+        async for delta in stream:
+            if "first_token_ms" not in timings:
+                timings["first_token_ms"] = _elapsed_ms(started)
+            parts.append(delta)
+            for segment in segmenter.feed(delta):
+                start_segment(segment)
+            if sender_task.done():
+                # The browser went away: stop generating
+                sender_task.result()
+        tail = segmenter.flush()
+        if tail:
+            start_segment(tail, last=True)
+        timings["llm_done_ms"] = _elapsed_ms(started)
+        ready.put_nowait(None)
+        await sender_task
+    finally:
+        # Closes the LLM stream if we stopped early (no-op once it is exhausted)
+        await stream.aclose()
+        if not sender_task.done():
+            sender_task.cancel()
+        while not ready.empty():
+            item = ready.get_nowait()
+            if item is not None:
+                item[2].cancel()
+
+    timings["total_ms"] = _elapsed_ms(started)
+    return {"text": "".join(parts).strip(), "segments": len(segments), "timings": timings}
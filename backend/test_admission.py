@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test realtime admission control: session caps, the waiting room and lag shedding
+Runs standalone (python test_admission.py) or under pytest
+"""
+
+import asyncio
+
+from admission import AdmissionController, AdmissionRejected
+
+
+class _Lag:
+    lag_smoothed = 0.0
+
+
+async def _join(controller, tenant, positions, admitted, name):
+    async def on_position(position, waiting):
+        positions.setdefault(name, []).append(position)
+
+    await controller.admit(tenant, on_position)
+    admitted.append(name)
+
+
+def test_waiting_room_admits_in_order():
+    async def run():
+        controller = AdmissionController(_Lag(), max_sessions=1, tenant_limits={}, update_interval=0.05)
+        positions, admitted = {}, []
+        await _join(controller, "acme", positions, admitted, "first")
+        tasks = [asyncio.create_task(_join(controller, "acme", positions, admitted, name))
+                 for name in ("second", "third")]
+        await asyncio.sleep(0.01)
+        assert positions == {"second": [1], "third": [2]}
+
+        controller.release("acme")
+        await asyncio.sleep(0.01)
+        assert admitted == ["first", "second"]
+        await asyncio.sleep(0.06)
+        assert positions["third"][-1] == 1
+
+        controller.release("acme")
+        await asyncio.gather(*tasks)
+        assert admitted == ["first", "second", "third"]
+        assert controller.stats()["queue_admitted"] == 2
+
+    asyncio.run(run())
+    print("✅ waiting room admits in arrival order with position updates")
+
+
+def test_tenant_cap_does_not_block_other_tenants():
+    async def run():
+        controller = AdmissionController(_Lag(), max_sessions=10, tenant_limits={"acme": 1},
+                                         update_interval=0.05)
+        positions, admitted = {}, []
+        await _join(controller, "acme", positions, admitted, "acme-1")
+        waiting = asyncio.create_task(_join(controller, "acme", positions, admitted, "acme-2"))
+        await asyncio.sleep(0.01)
+        await asyncio.wait_for(_join(controller, "beta", positions, admitted, "beta-1"), timeout=0.2)
+        assert admitted == ["acme-1", "beta-1"]
+
+        controller.release("acme")
+        await asyncio.wait_for(waiting, timeout=0.2)
+        assert controller.tenants == {"acme": 1, "beta": 1}
+
+    asyncio.run(run())
+    print("✅ a tenant at its cap waits without blocking other tenants")
+
+
+def test_only_configured_tenants_are_honoured():
+    controller = AdmissionController(_Lag(), tenant_limits={"acme": 5}, known_tenants=["beta"])
+    assert controller.resolve_tenant("acme") == "acme"
+    assert controller.resolve_tenant("beta") == "beta"
+    # Made-up names share the default tenant's cap and metrics label
+    assert controller.resolve_tenant("attacker-123") == "default"
+    assert controller.resolve_tenant(None) == "default" and controller.resolve_tenant("default") == "default"
+    assert controller.stats()["unknown_tenants"] == 1
+    print("✅ unknown tenant names fall back to the default tenant")
+
+
+def test_loop_lag_sheds_and_rejects():
+    async def run():
+        lag = _Lag()
+        controller = AdmissionController(lag, max_sessions=10, tenant_limits={}, update_interval=0.02,
+                                         shed_lag_ms=100, reject_lag_ms=500)
+        positions, admitted = {}, []
+
+        lag.lag_smoothed = 0.2
+        waiting = asyncio.create_task(_join(controller, "acme", positions, admitted, "held"))
+        await asyncio.sleep(0.05)
+        assert admitted == [] and controller.stats()["overloaded"] == 1
+        lag.lag_smoothed = 0.0
+        await asyncio.wait_for(waiting, timeout=0.2)
+
+        lag.lag_smoothed = 0.6
+        try:
+            await _join(controller, "acme", positions, admitted, "rejected")
+            raise AssertionError("expected AdmissionRejected")
+        except AdmissionRejected:
+            pass
+        assert controller.stats()["rejected_lag"] == 1
+
+    asyncio.run(run())
+    print("✅ loop lag holds new sessions back, then rejects them")
+
+
+def test_dropped_browser_leaves_the_line():
+    async def run():
+        controller = AdmissionController(_Lag(), max_sessions=1, tenant_limits={}, update_interval=0.02)
+        await controller.admit("acme", None)
+
+        async def gone(position, waiting):
+            raise ConnectionResetError("browser gone")
+
+        try:
+            await controller.admit("acme", gone)
+            raise AssertionError("expected ConnectionResetError")
+        except ConnectionResetError:
+            pass
+        assert controller.stats()["waiting"] == 0 and controller.stats()["abandoned"] == 1
+        controller.release("acme")
+        assert controller.active == 0
+
+    asyncio.run(run())
+    print("✅ dropped browsers leave the waiting room")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("[TEST] REALTIME ADMISSION CONTROL")
+    print("=" * 60)
+    test_waiting_room_admits_in_order()
+    test_tenant_cap_does_not_block_other_tenants()
+    test_only_configured_tenants_are_honoured()
+    test_loop_lag_sheds_and_rejects()
+    test_dropped_browser_leaves_the_line()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test input analysis in AIService: inline vs concurrent scheduling and the
+local heuristic analyzer
+Uses a stubbed OpenAI client, no network. Runs standalone or under pytest.
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+from ai_service import AIService
+from input_analyzer import LocalInputAnalyzer
+
+ANALYSIS = {"emotional_tone": "unsure", "technical_depth": "advanced", "clarity": "clear",
+            "intent": "answer", "needs_followup": True, "suggested_response_style": "encouraging"}
+
+
+class _StubCompletions:
+    """Analysis (gpt-3.5-turbo) takes `analysis_delay`; replies take `reply_delay`"""
+
+    def __init__(self, analysis_delay=0.05, reply_delay=0.02):
+        self.analysis_delay = analysis_delay
+        self.reply_delay = reply_delay
+        self.prompts = []
+        self.analysis_calls = 0
+
+    async def create(self, model, messages, **kwargs):
+        if model == "gpt-3.5-turbo":
+            self.analysis_calls += 1
+            call = self.analysis_calls
+            await asyncio.sleep(self.analysis_delay)
+            content = json.dumps({**ANALYSIS, "call": call})
+        else:
+            self.prompts.append(messages)
+            await asyncio.sleep(self.reply_delay)
+            content = "Interesting. Tell me more."
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _service(mode, analyzer="llm", calibration_rate=0.0, **delays):
+    service = AIService("sk-test", model="gpt-4-turbo", analysis_mode=mode, input_analyzer=analyzer,
+                        calibration_rate=calibration_rate)
+    completions = _StubCompletions(**delays)
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return service, completions
+
+
+def test_inline_waits_for_the_analysis():
+    async def run():
+        service, completions = _service("inline")
+        result = await service.generate_conversational_response("I would use a heap")
+        assert result["emotional_tone"] == "unsure"
+        assert "Analysis: The candidate seems unsure" in completions.prompts[0][-1]["content"]
+        assert service.analysis_stats()["fresh"] == 1
+
+    asyncio.run(run())
+    print("✅ inline mode steers the reply with its own analysis")
+
+
+def test_concurrent_applies_the_analysis_to_the_next_turn():
+    async def run():
+        service, completions = _service("concurrent", analysis_delay=0.05, reply_delay=0.01)
+        start = asyncio.get_running_loop().time()
+        await service.generate_conversational_response("I would use a heap")
+        # One round trip on the critical path, not analysis + reply
+        assert asyncio.get_running_loop().time() - start < 0.05
+        assert "Analysis" not in completions.prompts[0][-1]["content"]
+
+        await asyncio.sleep(0.06)
+        assert service.interview_context["candidate_level"] == "advanced"
+        await service.generate_conversational_response("Then pop the smallest")
+        assert "Analysis of their previous answer: The candidate seems unsure" in completions.prompts[1][-1]["content"]
+        assert "encouraging language" in completions.prompts[1][0]["content"]
+
+        stats = service.analysis_stats()
+        assert stats["carried_over"] == 2 and stats["analyses"] == 1
+        service.clear_conversation_history()
+        assert service._pending_analysis is None
+
+    asyncio.run(run())
+    print("✅ concurrent mode keeps one round trip and steers the next turn")
+
+
+def test_late_analysis_does_not_replace_a_newer_one():
+    async def run():
+        service, completions = _service("concurrent", reply_delay=0.01)
+        completions.analysis_delay = 0.1
+        await service.generate_conversational_response("I would use a heap")
+        completions.analysis_delay = 0.01
+        await service.generate_conversational_response("Then pop the smallest")
+        # The second turn's analysis lands first; the first one arrives later and is dropped
+        await asyncio.sleep(0.12)
+        assert service._last_analysis["call"] == 2
+        assert service.analysis_stats()["stale"] == 1
+
+    asyncio.run(run())
+    print("✅ an analysis that finishes late never overwrites a newer turn's")
+
+
+def test_local_analyzer_classifies_answers():
+    analyzer = LocalInputAnalyzer()
+    unsure = analyzer.analyze("Um, I think maybe a hash map? I'm not sure.", audio_duration=4)
+    assert unsure["emotional_tone"] == "unsure" and unsure["suggested_response_style"] == "encouraging"
+    assert unsure["needs_followup"] and unsure["speaking_pace"] == "normal"
+
+    deep = analyzer.analyze("I'd shard Postgres by tenant and use consistent hashing, with read replicas "
+                            "for reporting. The key is idempotent consumers so retries are safe.", audio_duration=12)
+    assert deep["technical_depth"] == "advanced" and deep["emotional_tone"] == "confident"
+    assert deep["speaking_pace"] == "detailed"
+
+    assert analyzer.analyze("Sorry, what do you mean by throughput?")["intent"] == "clarification"
+    assert analyzer.analyze("Hi, nice to meet you!")["intent"] == "small_talk"
+    assert analyzer.analyze("Should I assume the input is sorted?")["intent"] == "question"
+    assert analyzer.stats()["avg_us"] < 1000
+    print(f"✅ local analyzer classifies answers in {analyzer.stats()['avg_us']:.0f}us on average")
+
+
+def test_local_analyzer_skips_the_llm_and_samples_calibration():
+    async def run():
+        service, completions = _service("concurrent", analyzer="local")
+        await service.generate_conversational_response("I'm not sure, maybe a linked list?")
+        # Ready immediately, so it steers its own turn with no analysis call
+        assert completions.analysis_calls == 0
+        assert "Analysis: The candidate seems unsure" in completions.prompts[0][-1]["content"]
+
+        service, completions = _service("concurrent", analyzer="local", calibration_rate=1.0)
+        await service.generate_conversational_response("I'm not sure, maybe a linked list?")
+        await asyncio.sleep(0.06)
+        assert completions.analysis_calls == 1
+        agreement = service.analysis_stats()["local"]["agreement"]
+        assert agreement["emotional_tone"] == 1.0 and agreement["technical_depth"] == 0.0
+
+    asyncio.run(run())
+    print("✅ local analyzer avoids the analysis call; calibration samples the LLM in the background")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("[TEST] AI SERVICE INPUT ANALYSIS")
+    print("=" * 60)
+    test_inline_waits_for_the_analysis()
+    test_concurrent_applies_the_analysis_to_the_next_turn()
+    test_late_analysis_does_not_replace_a_newer_one()
+    test_local_analyzer_classifies_answers()
+    test_local_analyzer_skips_the_llm_and_samples_calibration()
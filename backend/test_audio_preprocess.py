@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Test Whisper upload preprocessing: WAV parsing, downmix, resampling, silence trimming
+Synthetic audio, no network. Runs standalone or under pytest.
+"""
+
+import asyncio
+import io
+import os
+import stat
+import struct
+import tempfile
+import wave
+from types import SimpleNamespace
+
+import numpy as np
+
+import audio_preprocess
+from ai_service import AIService
+from audio_preprocess import encode, parse_wav, prepare_for_whisper, resample
+
+
+def _tone(seconds, rate, freq=220.0, db=-12):
+    t = np.arange(int(seconds * rate)) / rate
+    return np.sin(2 * np.pi * freq * t) * 10 ** (db / 20)
+
+
+def _silence(seconds, rate, db=-70):
+    return np.random.default_rng(0).normal(0, 10 ** (db / 20), int(seconds * rate))
+
+
+def _wav(mono, rate, channels=1):
+    pcm = (np.clip(np.repeat(mono[:, None], channels, axis=1), -1, 1) * 32767).astype("<i2")
+    out = io.BytesIO()
+    with wave.open(out, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(pcm.tobytes())
+    return out.getvalue()
+
+
+def _extensible_float_wav(mono, rate):
+    """WAVE_FORMAT_EXTENSIBLE header around 32-bit float data, with an extra LIST chunk"""
+    data = mono.astype("<f4").tobytes()
+    guid = struct.pack("<H", 3) + b"\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71"
+    fmt = struct.pack("<HHIIHHHHI", 0xFFFE, 1, rate, rate * 4, 4, 32, 22, 32, 4) + guid
+    chunks = b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"LIST" + struct.pack("<I", 4) + b"INFO"
+    chunks += b"data" + struct.pack("<I", len(data)) + data
+    return b"RIFF" + struct.pack("<I", 4 + len(chunks)) + b"WAVE" + chunks
+
+
+def test_parse_wav_layouts():
+    samples, rate = parse_wav(_wav(_tone(0.5, 48000), 48000, channels=2))
+    assert rate == 48000 and samples.shape == (24000, 2)
+    samples, rate = parse_wav(_extensible_float_wav(_tone(0.25, 44100).astype(np.float32), 44100))
+    assert rate == 44100 and samples.shape == (11025, 1) and abs(samples.max() - 10 ** (-12 / 20)) < 0.01
+    assert parse_wav(b"ID3\x03 not a wav") is None
+    print("✅ parses PCM16 stereo and extensible float WAVs, rejects other containers")
+
+
+def test_resample_keeps_speech_band_and_removes_aliases():
+    rate = 48000
+    low = resample(_tone(1, rate, freq=1000).astype(np.float32), rate)
+    high = resample(_tone(1, rate, freq=12000).astype(np.float32), rate)
+    assert len(low) == 16000
+    assert 0.6 < np.sqrt(np.mean(low[200:-200] ** 2)) / (10 ** (-12 / 20) / np.sqrt(2)) < 1.1
+    # 12 kHz would fold back to 4 kHz without the low-pass
+    assert np.sqrt(np.mean(high[200:-200] ** 2)) < 0.01 * 10 ** (-12 / 20)
+    print("✅ 48 kHz -> 16 kHz keeps 1 kHz and filters out 12 kHz")
+
+
+def test_prepare_trims_downmixes_and_reports_savings():
+    rate = 48000
+    audio = _wav(np.concatenate([_silence(1, rate), _tone(2, rate), _silence(1.5, rate)]), rate, channels=2)
+    report = asyncio.run(prepare_for_whisper(audio, codec="wav"))
+    assert report["speech"] and report["codec"] == "wav" and report["filename"] == "audio.wav"
+    with wave.open(io.BytesIO(report["data"])) as wav:
+        assert wav.getframerate() == 16000 and wav.getnchannels() == 1
+        assert abs(wav.getnframes() / 16000 - 2.4) < 0.1
+    # 4.5s of 48 kHz stereo down to 2.4s of 16 kHz mono: about 1/11 of the bytes
+    assert report["saved_bytes"] == report["original_bytes"] - report["bytes"]
+    assert report["bytes"] < report["original_bytes"] / 10
+    assert abs(report["trimmed_seconds"] - 2.1) < 0.1
+    print(f"✅ {report['original_bytes']} -> {report['bytes']} bytes, {report['trimmed_seconds']}s trimmed")
+
+
+def test_silence_and_other_formats():
+    silent = asyncio.run(prepare_for_whisper(_wav(_silence(2, 16000), 16000)))
+    assert not silent["speech"] and silent["bytes"] == 0
+
+    mp3 = b"ID3\x03" + bytes(400)
+    passed = asyncio.run(prepare_for_whisper(mp3))
+    assert passed["data"] == mp3 and passed["filename"] == "audio.mp3" and passed["saved_bytes"] == 0
+
+    # Already trimmed 16 kHz mono speech: nothing to gain, the original bytes go up
+    tight = _wav(_tone(1, 16000), 16000)
+    kept = asyncio.run(prepare_for_whisper(tight, codec="wav"))
+    assert kept["data"] == tight and kept["codec"] == "original"
+    print("✅ silence is not uploaded; non-WAV and already-compact audio pass through")
+
+
+def test_encode_timeout_kills_ffmpeg():
+    spawned = []
+    real_exec = asyncio.create_subprocess_exec
+
+    async def recording_exec(*args, **kwargs):
+        spawned.append(await real_exec(*args, **kwargs))
+        return spawned[-1]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Stand-in for an ffmpeg that hangs
+        hung = os.path.join(tmp, "ffmpeg")
+        with open(hung, "w") as script:
+            script.write("#!/bin/sh\nexec sleep 30\n")
+        os.chmod(hung, os.stat(hung).st_mode | stat.S_IEXEC)
+
+        saved = (audio_preprocess.shutil.which, audio_preprocess.FFMPEG_TIMEOUT, asyncio.create_subprocess_exec)
+        audio_preprocess.shutil.which = lambda name: hung
+        audio_preprocess.FFMPEG_TIMEOUT = 0.2
+        asyncio.create_subprocess_exec = recording_exec
+        try:
+            assert asyncio.run(encode(_wav(_tone(1, 16000), 16000), "flac")) is None
+        finally:
+            audio_preprocess.shutil.which, audio_preprocess.FFMPEG_TIMEOUT, asyncio.create_subprocess_exec = saved
+
+    assert len(spawned) == 1 and spawned[0].returncode is not None
+    print("✅ a hung ffmpeg is killed and reaped on timeout")
+
+
+def test_transcribe_skips_silent_uploads():
+    class _Transcriptions:
+        def __init__(self):
+            self.files = []
+
+        async def create(self, file, **kwargs):
+            self.files.append((file.name, len(file.getvalue())))
+            return SimpleNamespace(text="hello there")
+
+    service = AIService("sk-test", model="gpt-4-turbo")
+    transcriptions = _Transcriptions()
+    service.client = SimpleNamespace(audio=SimpleNamespace(transcriptions=transcriptions))
+
+    async def run():
+        assert await service.transcribe_audio(_wav(_silence(2, 16000), 16000)) == ""
+        report = {}
+        audio = _wav(np.concatenate([_silence(1, 44100), _tone(1, 44100)]), 44100, channels=2)
+        assert await service.transcribe_audio(audio, report=report) == "hello there"
+        return report
+
+    report = asyncio.run(run())
+    assert len(transcriptions.files) == 1 and transcriptions.files[0][1] == report["bytes"]
+    stats = service.upload_stats()
+    assert stats["turns"] == 2 and stats["skipped_silent"] == 1 and stats["saved_ratio"] > 0.8
+    print("✅ transcribe_audio uploads the prepared audio and skips silence")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("[TEST] WHISPER UPLOAD PREPROCESSING")
+    print("=" * 60)
+    test_parse_wav_layouts()
+    test_resample_keeps_speech_band_and_removes_aliases()
+    test_prepare_trims_downmixes_and_reports_savings()
+    test_silence_and_other_formats()
+    test_encode_timeout_kills_ffmpeg()
+    test_transcribe_skips_silent_uploads()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test the server-side instruction cache: skill-set keys, LRU eviction and
+the session.update splice
+No network. Runs standalone or under pytest.
+"""
+
+import json
+
+from guardrails import generate_interview_instructions
+from instruction_cache import InstructionCache, normalize_skills
+
+SKILLS = [{"name": "Python", "reason": "Core language"}, {"name": "SQL", "reason": "Reporting \"quotes\" é"}]
+
+
+def test_keys_follow_normalized_skills():
+    cache = InstructionCache(max_size=4)
+    key, encoded = cache.encoded_instructions(SKILLS)
+    assert json.loads(encoded) == generate_interview_instructions(normalize_skills(SKILLS))
+    # Extra fields, whitespace and string skills normalize to the same set
+    same, _ = cache.encoded_instructions([{"name": " Python ", "reason": "Core language", "level": 3},
+                                          {"name": "SQL", "reason": "Reporting \"quotes\" é"}, {"name": ""}])
+    other, _ = cache.encoded_instructions(["Python"])
+    assert same == key and other != key
+    assert normalize_skills(["Python", 7, None]) == [{"name": "Python", "reason": "Required"}]
+    # A string or dict in place of the list is not iterated into bogus skills
+    assert normalize_skills("Python") == [] and normalize_skills({"name": "Python"}) == []
+    assert InstructionCache().encoded_instructions("Python")[0] == InstructionCache().encoded_instructions([])[0]
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["bytes_reused"] == len(encoded)
+    print("✅ equivalent skill sets share one cache entry")
+
+
+def test_lru_evicts_least_recently_used():
+    cache = InstructionCache(max_size=2)
+    key_a, _ = cache.encoded_instructions(["A"])
+    key_b, _ = cache.encoded_instructions(["B"])
+    cache.encoded_instructions(["A"])  # A is now the most recent
+    key_c, _ = cache.encoded_instructions(["C"])
+    assert list(cache._entries) == [key_a, key_c]
+    assert key_b not in cache._entries and cache.stats()["evictions"] == 1
+
+    cache.encoded_instructions(["B"])
+    assert cache.stats()["misses"] == 4 and list(cache._entries) == [key_c, key_b]
+    print("✅ the least recently used skill set is evicted")
+
+
+def test_session_update_splice_matches_full_serialization():
+    cache = InstructionCache()
+    event = {"event_id": "evt_1", "type": "session.update",
+             "session": {"voice": "alloy", "modalities": ["audio", "text"], "skills": SKILLS,
+                         "turn_detection": {"type": "server_vad", "silence_duration_ms": 500}}}
+    key, frame = cache.session_update(event)
+
+    session = {k: v for k, v in event["session"].items() if k != "skills"}
+    session["instructions"] = generate_interview_instructions(normalize_skills(SKILLS))
+    expected = {"event_id": "evt_1", "type": "session.update", "session": session}
+    assert json.loads(frame) == expected
+    assert frame == json.dumps(expected)
+
+    # Minimal event: no extra fields on either level; a second call hits the cache
+    key_2, frame = cache.session_update({"type": "session.update", "session": {"skills": SKILLS}})
+    assert key_2 == key and cache.stats()["hits"] == 1
+    assert json.loads(frame) == {"type": "session.update",
+                                 "session": {"instructions": session["instructions"]}}
+    assert frame == json.dumps(json.loads(frame))
+
+    # Events that already carry instructions, or no skills, are relayed untouched
+    assert cache.session_update({"type": "session.update", "session": {"instructions": "x", "skills": []}}) is None
+    assert cache.session_update({"type": "session.update", "session": {"voice": "alloy"}}) is None
+    assert cache.session_update({"type": "session.update", "session": "bad"}) is None
+    print("✅ the spliced session.update is valid JSON identical to a full re-serialization")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("[TEST] INSTRUCTION CACHE")
+    print("=" * 60)
+    test_keys_follow_normalized_skills()
+    test_lru_evicts_least_recently_used()
+    test_session_update_splice_matches_full_serialization()
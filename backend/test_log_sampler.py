@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Test realtime proxy log sampling: per-type sample rates, count-only types
+and the overall line budget
+Runs standalone or under pytest.
+"""
+
+from utils.logger import EventLogSampler, parse_sample_rates
+
+
+def test_sample_rates_and_count_only_types():
+    rates = parse_sample_rates("response.audio.delta=3, session.updated=0,bad,x=y")
+    assert rates == {"response.audio.delta": 3, "session.updated": 0}
+
+    sampler = EventLogSampler("test", rates, max_lines_per_sec=1000)
+    logged = [sampler.record("upstream", "response.audio.delta", 10) for _ in range(7)]
+    assert logged == [True, False, True, False, False, True, False]
+    # Rate 0 means count only: not even the first frame is logged
+    assert not any(sampler.record("upstream", "session.updated") for _ in range(3))
+    # Types without a rate are logged every time
+    assert all(sampler.record("client", "response.create") for _ in range(3))
+    assert sampler.counts[("upstream", "session.updated")] == 3 and sampler.bytes["upstream"] == 70
+    print("✅ sample rates pick 1 in N frames and rate 0 never logs")
+
+
+def test_line_budget_suppresses_bursts():
+    sampler = EventLogSampler("test", max_lines_per_sec=2)
+    logged = [sampler.record("client", "input_audio_buffer.append") for _ in range(5)]
+    assert logged == [True, True, False, False, False] and sampler.suppressed == 3
+    assert "3 lines rate-limited" in sampler.summary()
+    print("✅ bursts beyond the line budget are counted as rate-limited")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("[TEST] REALTIME LOG SAMPLING")
+    print("=" * 60)
+    test_sample_rates_and_count_only_types()
+    test_line_budget_suppresses_bursts()
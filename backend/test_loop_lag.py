@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test the event-loop lag monitor: histogram, stall stacks and runtime toggles
+Runs standalone (python test_loop_lag.py) or under pytest
+"""
+
+import asyncio
+import time
+
+from loop_lag import LoopLagMonitor, LagHistogram
+from proxy_metrics import MetricsWriter
+
+
+def _block_the_loop(seconds):
+    time.sleep(seconds)
+
+
+def test_histogram_buckets():
+    histogram = LagHistogram(buckets=(0.01, 0.1))
+    for value in (0.001, 0.05, 0.05, 3.0):
+        histogram.observe(value)
+    assert histogram.cumulative() == [(0.01, 1), (0.1, 3), (float("inf"), 4)]
+
+    writer = MetricsWriter()
+    writer.add_histogram("loop_lag_seconds", "lag", histogram.cumulative(), histogram.sum, histogram.count)
+    text = writer.render()
+    assert "# TYPE loop_lag_seconds histogram" in text
+    assert 'loop_lag_seconds_bucket{le="0.1"} 3' in text
+    assert 'loop_lag_seconds_bucket{le="+Inf"} 4' in text
+    assert "loop_lag_seconds_count 4" in text
+    print("✅ lag histogram renders Prometheus buckets")
+
+
+def test_stall_captures_blocking_stack():
+    async def run():
+        monitor = LoopLagMonitor(interval=0.01, threshold_ms=30)
+        await monitor.start()
+        await asyncio.sleep(0.05)
+        _block_the_loop(0.2)
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+        assert monitor.stalls >= 1 and monitor.lag_max >= 0.15
+        assert monitor.histogram.count == monitor.samples
+        traces = monitor.traces()
+        assert traces and any("_block_the_loop" in line for line in traces[0]["stack"])
+        assert traces[0]["max_ms"] >= 150
+
+    asyncio.run(run())
+    print("✅ a blocked loop is measured and its stack captured")
+
+
+def test_runtime_toggle():
+    async def run():
+        monitor = LoopLagMonitor(interval=0.01, threshold_ms=30)
+        await monitor.start()
+        stats = await monitor.configure(enabled=False)
+        assert not stats["enabled"] and stats["lag_smoothed"] == 0.0
+        samples = monitor.samples
+        _block_the_loop(0.1)
+        await asyncio.sleep(0.05)
+        assert monitor.samples == samples and not monitor.traces()
+
+        stats = await monitor.configure(enabled=True, stack_traces=False, threshold_ms=20)
+        assert stats["enabled"] and not stats["stack_traces"] and stats["threshold_ms"] == 20
+        await asyncio.sleep(0.05)
+        _block_the_loop(0.1)
+        await asyncio.sleep(0.05)
+        assert monitor.samples > samples and monitor.stalls >= 1 and not monitor.traces()
+        await monitor.stop()
+
+    asyncio.run(run())
+    print("✅ monitor and stack capture toggle at runtime")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("[TEST] EVENT-LOOP LAG MONITOR")
+    print("=" * 60)
+    test_histogram_buckets()
+    test_stall_captures_blocking_stack()
+    test_runtime_toggle()
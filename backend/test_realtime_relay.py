@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Test the realtime relay helpers: event-type peeking, queue watermarks and
+the stale-audio drop policy, binary audio framing, and merging of audio appends
+No network. Runs standalone or under pytest.
+"""
+
+import asyncio
+import base64
+import json
+
+from realtime_relay import (
+    RelayQueue, classify_frame, extract_audio_delta, merge_audio_appends, negotiate_binary_audio,
+    peek_event_type, wrap_audio_append, SERVER_INSPECTED_EVENTS,
+)
+
+DELTA = "response.audio.delta"
+
+
+def test_peek_reads_flat_prefixes_and_refuses_the_rest():
+    assert peek_event_type('{"type":"response.audio.delta","delta":"AAAA"}') == DELTA
+    assert peek_event_type('{"event_id": "evt_1", "type" : "session.created", "session": {}}') == "session.created"
+    assert peek_event_type('{\n  "type": "error"}') == "error"
+    # A "type" nested before the top-level one, or escapes in the prefix, are not trusted
+    assert peek_event_type('{"item":{"type":"message"},"type":"conversation.item.created"}') is None
+    assert peek_event_type('{"event_id":"a\\"b","type":"error"}') is None
+    assert peek_event_type('{"type":"resp\\u006fnse.done"}') is None
+    assert peek_event_type('["type","error"]') is None and peek_event_type("") is None
+    # Beyond the peek window the parser gives up instead of scanning the payload
+    assert peek_event_type('{"delta":"' + "A" * 400 + '","type":"response.audio.delta"}') is None
+    print("✅ peek reads the top-level type and refuses nested or escaped prefixes")
+
+
+def test_classify_decodes_only_inspected_events():
+    event_type, msg = classify_frame('{"type":"response.audio.delta","delta":"AAAA"}', SERVER_INSPECTED_EVENTS)
+    assert event_type == DELTA and msg is None
+    event_type, msg = classify_frame('{"type":"response.done","response":{"id":"r1"}}', SERVER_INSPECTED_EVENTS)
+    assert event_type == "response.done" and msg["response"]["id"] == "r1"
+    # Peek refuses, so the frame is decoded to find its type
+    event_type, msg = classify_frame('{"item":{"type":"message"},"type":"conversation.item.created"}',
+                                     SERVER_INSPECTED_EVENTS)
+    assert event_type == "conversation.item.created" and msg["item"]["type"] == "message"
+    assert classify_frame("not json", SERVER_INSPECTED_EVENTS) == ("invalid", None)
+    assert classify_frame("[1, 2]", SERVER_INSPECTED_EVENTS) == ("invalid", None)
+    assert classify_frame(b"\x00\x01", SERVER_INSPECTED_EVENTS) == ("binary", None)
+    print("✅ classify_frame decodes inspected events only")
+
+
+def test_queue_pauses_at_high_watermark_until_low():
+    async def run():
+        queue = RelayQueue(high_watermark=4, low_watermark=1)
+        for n in range(4):
+            await queue.put(f"frame {n}", "response.text.delta")
+        blocked = asyncio.create_task(queue.put("frame 4", "response.text.delta"))
+        await asyncio.sleep(0.01)
+        assert not blocked.done() and queue.pauses == 1
+
+        # Draining to 2 is not enough; the reader resumes at the low watermark
+        queue.get_nowait()
+        queue.get_nowait()
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        queue.get_nowait()
+        await asyncio.sleep(0.01)
+        assert blocked.done() and len(queue) == 2
+        assert [await queue.get() for _ in range(2)] == [("response.text.delta", "frame 3"),
+                                                         ("response.text.delta", "frame 4")]
+        assert queue.stats()["max_depth"] == 4 and queue.dropped == 0
+
+    asyncio.run(run())
+    print("✅ a full queue pauses the reader until the writer drains to the low watermark")
+
+
+def test_queue_drops_oldest_stale_audio_only():
+    async def run():
+        queue = RelayQueue(high_watermark=3, low_watermark=1, droppable=frozenset({DELTA}))
+        await queue.put("audio 0", DELTA)
+        await queue.put("done 0", "response.done")
+        await queue.put("audio 1", DELTA)
+        # Full: new audio evicts the oldest queued audio instead of waiting
+        await queue.put("audio 2", DELTA)
+        assert [frame for _, frame in queue._frames] == ["done 0", "audio 1", "audio 2"]
+        assert queue.dropped == 1 and queue.pauses == 0
+
+        # Control events are never dropped and never cause drops: they wait
+        blocked = asyncio.create_task(queue.put("done 1", "response.done"))
+        await asyncio.sleep(0.01)
+        assert not blocked.done() and queue.dropped == 1
+        queue.get_nowait()
+        queue.get_nowait()
+        await asyncio.sleep(0.01)
+        assert blocked.done()
+        assert [frame for _, frame in queue._frames] == ["audio 2", "done 1"]
+
+        # Nothing droppable left to evict: audio waits too
+        queue = RelayQueue(high_watermark=1, low_watermark=0, droppable=frozenset({DELTA}))
+        await queue.put("done", "response.done")
+        blocked = asyncio.create_task(queue.put("audio", DELTA))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        queue.get_nowait()
+        await asyncio.sleep(0.01)
+        assert blocked.done() and queue.dropped == 0
+
+    asyncio.run(run())
+    print("✅ only stale output audio is dropped under backpressure")
+
+
+def test_binary_audio_negotiation_and_framing():
+    assert negotiate_binary_audio(None, []) == (False, False, None)
+    assert negotiate_binary_audio("in", []) == (True, False, None)
+    assert negotiate_binary_audio("BOTH", []) == (True, True, None)
+    assert negotiate_binary_audio(None, ["realtime", "binary-audio"]) == (True, True, "binary-audio")
+
+    # Binary PCM from the browser goes upstream as a regular append event
+    frame = wrap_audio_append(b"\xff\x7f\x00\x80")
+    assert json.loads(frame) == {"type": "input_audio_buffer.append", "audio": "/38AgA=="}
+    assert peek_event_type(frame) == "input_audio_buffer.append"
+
+    # Output audio deltas are unwrapped to PCM without a full decode
+    delta = '{"type":"response.audio.delta","event_id":"e1","delta":"/38AgA==","item_id":"i1"}'
+    assert extract_audio_delta(delta) == b"\xff\x7f\x00\x80"
+    assert extract_audio_delta('{"type":"response.audio.delta","delta":"not base64!"}') is None
+    assert extract_audio_delta('{"item":{"delta":"AAAA"}}') is None
+    print("✅ binary audio is negotiated per connection and framed without JSON decoding")
+
+
+def test_merge_audio_appends_coalesces_and_handles_padding():
+    chunks = [bytes(range(n, n + 6)) for n in (0, 6, 12)]  # 6 bytes -> 8 base64 chars, no padding
+    parts = [base64.b64encode(chunk).decode("ascii") for chunk in chunks]
+    merged = merge_audio_appends(parts)
+    event = json.loads(merged)
+    assert event == {"type": "input_audio_buffer.append", "audio": "".join(parts)}
+    assert base64.b64decode(event["audio"]) == b"".join(chunks)
+
+    # A padded part in the middle cannot be concatenated as text
+    chunks = [b"\x01\x02\x03\x04", b"\x05\x06", b"\x07\x08\x09"]
+    parts = [base64.b64encode(chunk).decode("ascii") for chunk in chunks]
+    assert parts[0].endswith("==")
+    event = json.loads(merge_audio_appends(parts))
+    assert base64.b64decode(event["audio"], validate=True) == b"".join(chunks)
+
+    # Padding on the last part only is still valid base64 when concatenated
+    parts = [base64.b64encode(b"\x00\x01\x02").decode("ascii"), base64.b64encode(b"\x03").decode("ascii")]
+    event = json.loads(merge_audio_appends(parts))
+    assert event["audio"] == "".join(parts) and base64.b64decode(event["audio"]) == b"\x00\x01\x02\x03"
+
+    assert peek_event_type(merged) == "input_audio_buffer.append"
+    print("✅ appends coalesce as text when unpadded and re-encode when padding is in the way")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("[TEST] REALTIME RELAY HELPERS")
+    print("=" * 60)
+    test_peek_reads_flat_prefixes_and_refuses_the_rest()
+    test_classify_decodes_only_inspected_events()
+    test_queue_pauses_at_high_watermark_until_low()
+    test_queue_drops_oldest_stale_audio_only()
+    test_binary_audio_negotiation_and_framing()
+    test_merge_audio_appends_coalesces_and_handles_padding()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test the shared session registry backends
+The Redis backend runs against fake_redis_server.py; it is skipped when the
+redis package is not installed. Runs standalone or under pytest.
+"""
+
+import asyncio
+
+from fake_redis_server import start_server
+from session_store import InMemorySessionStore, RedisSessionStore, NodeRegistry, REDIS_AVAILABLE
+
+
+class _Session:
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.client = "127.0.0.1:5000"
+        self.started_at = 0.0
+
+
+async def _check_store(store):
+    await store.start()
+    try:
+        sessions = {}
+        node_a = NodeRegistry(store, sessions, node_id="node-a", address="wss://a.example")
+        node_b = NodeRegistry(store, {}, node_id="node-b")
+
+        sessions["s1"] = _Session("s1")
+        await node_a.register(sessions["s1"])
+
+        # Affinity: node-b sees that s1 lives on node-a, node-a sees it as its own
+        owner = await node_b.owner("s1")
+        assert owner["node"] == "node-a" and owner["address"] == "wss://a.example"
+        assert await node_a.owner("s1") is None
+        assert await node_b.owner("missing") is None
+        assert (await node_a.drain_status())["node_sessions"] == 1
+
+        # Draining is per node and visible to every worker of that node
+        status = await node_a.drain()
+        assert status["draining"] and node_a.draining
+        since = node_a.draining_since
+        worker_2 = NodeRegistry(store, {}, node_id="node-a")
+        await worker_2._refresh()
+        assert worker_2.draining_since == since
+        await node_b._refresh()
+        assert not node_b.draining
+
+        # Repeated drain requests keep the original start time
+        await node_a.drain()
+        assert node_a.draining_since == since
+        await node_a.drain(False)
+        assert not node_a.draining
+
+        # Two workers on one node: a sibling worker must not treat s1 as its own
+        sibling = NodeRegistry(store, {}, node_id="node-a", worker_id=node_a.worker_id + 1)
+        owner = await sibling.owner("s1")
+        assert owner["node"] == "node-a" and owner["worker"] == node_a.worker_id
+
+        await node_a.unregister("s1")
+        del sessions["s1"]
+        assert await node_b.owner("s1") is None
+        assert (await node_a.drain_status())["node_sessions"] == 0
+    finally:
+        await store.close()
+
+
+async def _check_expiry(store):
+    await store.start()
+    try:
+        await store.register("s2", {"node": "node-a"})
+        assert await store.node_sessions("node-a") == 1
+        await asyncio.sleep(1.2)
+        assert await store.lookup("s2") is None
+        assert await store.node_sessions("node-a") == 0
+    finally:
+        await store.close()
+
+
+class _Socket:
+    def __init__(self):
+        self.closes = 0
+
+    async def close(self, code=1000, reason=""):
+        self.closes += 1
+
+
+def test_drain_closes_each_session_once():
+    async def run():
+        sessions = {"s1": _Session("s1"), "s2": _Session("s2")}
+        for session in sessions.values():
+            session.client_ws = _Socket()
+        registry = NodeRegistry(InMemorySessionStore(), sessions, node_id="node-a")
+        # Heartbeats keep firing while the relays notice their sockets closed
+        for _ in range(3):
+            await registry._close_remaining()
+        assert [s.client_ws.closes for s in sessions.values()] == [1, 1]
+        assert registry.stats()["drain_closed"] == 2
+
+    asyncio.run(run())
+    print("✅ drain closes and counts each session once")
+
+
+def test_memory_store():
+    asyncio.run(_check_store(InMemorySessionStore()))
+    asyncio.run(_check_expiry(InMemorySessionStore(ttl=1)))
+    print("✅ in-memory registry")
+
+
+def test_redis_store():
+    if not REDIS_AVAILABLE:
+        print("⏭️ redis package not installed, skipping Redis registry")
+        return
+
+    async def run():
+        server = await start_server(port=0)
+        url = f"redis://127.0.0.1:{server.sockets[0].getsockname()[1]}/0"
+        try:
+            await _check_store(RedisSessionStore(url=url))
+            await _check_expiry(RedisSessionStore(url=url, ttl=1))
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(run())
+    print("✅ Redis registry (fake server)")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("[TEST] SHARED SESSION REGISTRY")
+    print("=" * 60)
+    test_memory_store()
+    test_drain_closes_each_session_once()
+    test_redis_store()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Test async skill extraction: concurrency cap, timeouts and cancellation
+Uses a stubbed OpenAI client, no network. Runs standalone or under pytest.
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+from ai_skill_extractor import SkillExtractor, ExtractionBusy
+from skill_cache import SkillCache, description_key
+from skill_taxonomy import LocalSkillExtractor, MultiPatternIndex
+
+CLEAR_DESCRIPTION = """Backend Engineer. Strong Python skills are required.
+Must have 5+ years of experience with PostgreSQL and Python.
+Deep expertise in Kubernetes is essential.
+Nice to have: Terraform."""
+
+AMBIGUOUS_DESCRIPTION = """We need a generalist. Experience with Java, Go (golang), Ruby, PHP and Kotlin.
+Strong communication skills."""
+
+REPLY = json.dumps({"skills": [{"name": "Python", "importance": "critical", "reason": "core"}],
+                    "summary": "Backend role"})
+
+
+class _StubCompletions:
+    """chat.completions stand-in that sleeps `delay` seconds per call"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+        self.cancelled = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        self.last_request = kwargs
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.running -= 1
+        message = SimpleNamespace(content=REPLY)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class _DictStore:
+    """Database stand-in with the skill_extractions methods"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def get_skill_extraction(self, key, max_age):
+        return self.rows.get(key)
+
+    def save_skill_extraction(self, key, result):
+        self.rows[key] = result
+        return True
+
+
+def _extractor(delay=0.05, **kwargs):
+    extractor = SkillExtractor(api_key="sk-test", **kwargs)
+    completions = _StubCompletions(delay)
+    extractor.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return extractor, completions
+
+
+def test_concurrency_cap_and_busy():
+    async def run():
+        extractor, completions = _extractor(delay=0.1, concurrency=2, queue_timeout=0.15)
+        results = await asyncio.gather(*[extractor.extract(f"job {n}") for n in range(5)],
+                                       return_exceptions=True)
+        ok = [r for r in results if isinstance(r, dict)]
+        busy = [r for r in results if isinstance(r, ExtractionBusy)]
+        assert len(ok) == 4 and len(busy) == 1, results
+        assert ok[0]["skills"][0]["name"] == "Python"
+        assert completions.max_running == 2
+        # The endpoint's own terse prompt and token budget, not the sync helper's
+        assert completions.last_request["max_tokens"] == 500
+        assert "Respond only with valid JSON" in completions.last_request["messages"][0]["content"]
+        stats = extractor.stats()
+        assert stats["completed"] == 4 and stats["rejected_busy"] == 1 and stats["in_flight"] == 0
+
+    asyncio.run(run())
+    print("✅ extractions are capped and overflow is turned away")
+
+
+def test_timeout_and_cancel_release_slots():
+    async def run():
+        extractor, completions = _extractor(delay=1.0, concurrency=1, timeout=0.05)
+        try:
+            await extractor.extract("slow job")
+            raise AssertionError("expected TimeoutError")
+        except asyncio.TimeoutError:
+            pass
+
+        task = asyncio.create_task(extractor.extract("abandoned job"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        assert completions.cancelled == 2 and completions.running == 0
+
+        completions.delay = 0
+        assert (await extractor.extract("fast job"))["success"]
+        stats = extractor.stats()
+        assert stats["timed_out"] == 1 and stats["cancelled"] == 1 and stats["completed"] == 1
+
+    asyncio.run(run())
+    print("✅ timeouts and cancellation abort the OpenAI call and free the slot")
+
+
+def test_cache_key_folds_case_and_whitespace():
+    assert description_key("Senior  Python\nEngineer ") == description_key("senior python engineer")
+    assert description_key("Python engineer") != description_key("Python engineer", namespace="other-model")
+    assert description_key("Python engineer") != description_key("Go engineer")
+    print("✅ cache keys ignore case and whitespace")
+
+
+def test_cache_ttl_lru_and_database_tier():
+    store = _DictStore()
+    cache = SkillCache(store, max_size=2, ttl=60)
+    result = {"success": True, "skills": [{"name": "SQL"}], "summary": ""}
+    cache.put("Job A", result)
+    cache.put("Job B", result)
+    cache.put("Job C", result)
+    assert cache.get("job   a") == result
+    stats = cache.stats()
+    # "Job A" was evicted from memory but is still in the database; reloading it evicts "Job B"
+    assert stats["db_hits"] == 1 and stats["evictions"] == 2 and stats["entries"] == 2
+
+    cache.put("failed", {"success": False, "skills": []})
+    assert cache.get("failed") is None and len(store.rows) == 3
+
+    memory_only = SkillCache(None, ttl=-1)
+    memory_only.put("Job D", result)
+    assert memory_only.get("Job D") is None and memory_only.stats()["expired"] == 1
+    print("✅ cache evicts LRU entries, expires by TTL and falls back to the database")
+
+
+def test_extractor_serves_repeats_from_cache():
+    async def run():
+        extractor, completions = _extractor(delay=0.01, cache=SkillCache(_DictStore()))
+        first = await extractor.extract("Backend engineer, Python and SQL")
+        again = await extractor.extract("backend engineer,  python and sql")
+        assert first == again and completions.calls == 1
+        stats = extractor.stats()
+        assert stats["cached"] == 1 and stats["completed"] == 1
+        assert extractor.cache.stats()["hits"] == 1
+
+    asyncio.run(run())
+    print("✅ repeated descriptions skip the OpenAI call")
+
+
+def test_batch_dedupes_and_streams_in_completion_order():
+    async def run():
+        extractor, completions = _extractor(delay=0.02, concurrency=4, cache=SkillCache(_DictStore()))
+        descriptions = ["Job A", "job  a", "Job B", "Job C", "JOB B"]
+        seen = []
+        async for indexes, result in extractor.extract_many(descriptions, concurrency=2):
+            assert result["success"]
+            seen.append(sorted(indexes))
+        assert sorted(seen) == [[0, 1], [2, 4], [3]]
+        assert completions.calls == 3 and completions.max_running == 2
+        assert extractor.stats()["batch_duplicates"] == 2
+
+        # Closing the stream early cancels what is still running
+        completions.delay = 1.0
+        stream = extractor.extract_many(["Job D", "Job E", "Job F"], concurrency=2)
+        task = asyncio.create_task(stream.__anext__())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await stream.aclose()
+        assert completions.running == 0 and extractor.in_flight == 0
+
+    asyncio.run(run())
+    print("✅ batches dedupe descriptions, bound concurrency and cancel on close")
+
+
+def test_multi_pattern_index_matches_whole_words():
+    index = MultiPatternIndex([("he", "he"), ("she", "she"), ("hers", "hers"), ("java", "java"),
+                               ("java 17", "java 17"), ("c++", "c++")])
+    text = "ushers: she knows java 17, c++ and javascript"
+    found = [(text[start:end], payload) for start, end, payload in index.find(text)]
+    assert ("she", "she") in found and ("java", "java") in found and ("c++", "c++") in found
+    assert all(word not in ("he", "hers") for word, _ in found)
+    longest = [payload for _, _, payload in index.find_longest(text)]
+    assert longest == ["she", "java 17", "c++"]
+    print("✅ multi-pattern index finds word-bounded, longest matches")
+
+
+def test_local_tier_answers_clear_cases_and_escalates_the_rest():
+    local = LocalSkillExtractor(enabled=True)
+    result = local.extract(CLEAR_DESCRIPTION)
+    assert result and result["source"] == "local"
+    assert [skill["name"] for skill in result["skills"]] == ["Python", "PostgreSQL", "Kubernetes"]
+    assert result["skills"][0]["importance"] == "critical"
+    assert local.extract(AMBIGUOUS_DESCRIPTION) is None
+    # Cues match whole words: "deep learning" and "mustard" are not requirements
+    assert not any(entry["required"] for entry in local.score("Deep learning researcher. Pytorch, tensorflow."))
+    assert not local.score("Mustard seed startup. Python, SQL.")[0]["required"]
+    assert local.score("Python is a must-have. SQL.")[0]["required"]
+    assert local.stats()["answered"] == 1 and local.stats()["escalated"] == 1
+
+    async def run():
+        extractor, completions = _extractor(delay=0.01, local=local)
+        assert (await extractor.extract(CLEAR_DESCRIPTION))["source"] == "local"
+        assert "source" not in await extractor.extract(AMBIGUOUS_DESCRIPTION)
+        assert completions.calls == 1 and extractor.stats()["local"] == 1
+
+    asyncio.run(run())
+    print("✅ local tier answers clear-cut descriptions and escalates ambiguous ones")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("[TEST] ASYNC SKILL EXTRACTION")
+    print("=" * 60)
+    test_concurrency_cap_and_busy()
+    test_timeout_and_cancel_release_slots()
+    test_cache_key_folds_case_and_whitespace()
+    test_cache_ttl_lru_and_database_tier()
+    test_extractor_serves_repeats_from_cache()
+    test_batch_dedupes_and_streams_in_completion_order()
+    test_multi_pattern_index_matches_whole_words()
+    test_local_tier_answers_clear_cases_and_escalates_the_rest()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test the streaming speech pipeline: sentence segmentation, in-order
+ai_audio_chunk delivery and time-to-first-audio
+Uses a stubbed AIService, no network. Runs standalone or under pytest.
+"""
+
+import asyncio
+import base64
+
+from ai_service import AIService
+from speech_pipeline import SentenceSegmenter, stream_spoken_response
+
+REPLY = ("Great. That sounds like a solid approach to caching. "
+         "How did you decide on the eviction policy, e.g. LRU versus LFU? "
+         "And what would you change next time")
+
+
+class _StubAIService:
+    """Streams REPLY a few characters at a time; TTS takes longer for the first segment"""
+
+    def __init__(self, token_delay=0.01, tts_delays=(0.15, 0.02, 0.02), reply=REPLY):
+        self.token_delay = token_delay
+        self.reply = reply
+        self.tts_texts = []
+        self.tts_delays = list(tts_delays)
+        self.tts_calls = 0
+        self.tts_cancelled = 0
+        self.tokens_sent = 0
+        self.stream_closed = False
+
+    async def stream_conversational_response(self, user_input, audio_duration=0):
+        try:
+            for start in range(0, len(self.reply), 6):
+                await asyncio.sleep(self.token_delay)
+                self.tokens_sent += 1
+                yield self.reply[start:start + 6]
+        finally:
+            self.stream_closed = True
+
+    async def text_to_speech(self, text, partial=False):
+        self.tts_texts.append((text, partial))
+        delay = self.tts_delays[min(self.tts_calls, len(self.tts_delays) - 1)]
+        self.tts_calls += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.tts_cancelled += 1
+            raise
+        return f"mp3:{text}".encode("utf-8")
+
+
+def test_segmenter_merges_short_sentences_and_skips_abbreviations():
+    segmenter = SentenceSegmenter(min_chars=20, max_chars=80)
+    segments = []
+    for start in range(0, len(REPLY), 5):
+        segments += segmenter.feed(REPLY[start:start + 5])
+    assert segments == ["Great. That sounds like a solid approach to caching.",
+                        "How did you decide on the eviction policy, e.g. LRU versus LFU?"]
+    assert segmenter.flush() == "And what would you change next time"
+    assert segmenter.flush() is None
+
+    long = SentenceSegmenter(min_chars=10, max_chars=40)
+    cut = long.feed("This answer keeps going on and on, with no full stop in sight at all ")
+    assert cut == ["This answer keeps going on and on,"]
+    print("✅ segmenter merges short sentences, respects abbreviations and cuts run-ons")
+
+
+def test_chunks_arrive_in_order_before_generation_finishes():
+    service = _StubAIService()
+    sent = []
+
+    async def send(chunk):
+        sent.append(chunk)
+
+    result = asyncio.run(stream_spoken_response(service, "I used Redis", send))
+    assert [chunk["seq"] for chunk in sent] == [0, 1, 2]
+    assert all(chunk["type"] == "ai_audio_chunk" for chunk in sent)
+    assert base64.b64decode(sent[0]["audio"]).decode().startswith("mp3:Great.")
+    assert result["text"] == REPLY and result["segments"] == 3
+
+    timings = result["timings"]
+    # The first sentence is heard while the rest is still being generated
+    assert timings["first_token_ms"] <= timings["first_segment_ms"] < timings["llm_done_ms"]
+    assert timings["first_audio_ms"] < timings["total_ms"]
+    print(f"✅ chunks in order, first audio at {timings['first_audio_ms']:.0f}ms of {timings['total_ms']:.0f}ms")
+
+
+def test_disconnect_stops_generation_and_cancels_tts():
+    service = _StubAIService(token_delay=0.02, tts_delays=(0.01, 0.5, 0.5))
+
+    async def send(chunk):
+        raise ConnectionError("client disconnected")
+
+    async def run():
+        try:
+            await stream_spoken_response(service, "I used Redis", send)
+        except ConnectionError:
+            pass
+        else:
+            raise AssertionError("expected ConnectionError")
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert service.tokens_sent < len(REPLY) // 6
+    assert service.tts_cancelled == service.tts_calls - 1
+    assert service.stream_closed
+    print("✅ disconnect stops generation, closes the LLM stream and cancels pending TTS")
+
+
+def test_run_on_pieces_are_not_spoken_as_questions():
+    reply = ("We replicate writes to a second region and fail over with DNS, and we keep both caches warm "
+             "with a shadow read path so that a failover does not stampede the primary database with "
+             "cross-region traffic, which would otherwise double the latency for every request. Does that answer it")
+    service = _StubAIService(token_delay=0, tts_delays=(0,), reply=reply)
+
+    async def send(chunk):
+        pass
+
+    asyncio.run(stream_spoken_response(service, "How do you fail over?", send))
+    pieces = service.tts_texts
+    assert pieces[0][0].endswith("cross-region traffic,") and pieces[0][1]
+    assert pieces[1] == ("which would otherwise double the latency for every request.", False)
+    assert pieces[2] == ("Does that answer it", False)
+
+    # The TTS clean-up drops the dangling comma instead of appending "?"
+    tts = AIService("sk-test", model="gpt-4-turbo")
+    assert tts._clean_text_for_natural_speech(pieces[0][0], partial=True).endswith("cross-region traffic")
+    assert tts._clean_text_for_natural_speech("Does that answer it") == "Does that answer it?"
+    print("✅ run-on pieces keep a neutral ending; only whole sentences get punctuation fixed up")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("[TEST] STREAMING SPEECH PIPELINE")
+    print("=" * 60)
+    test_segmenter_merges_short_sentences_and_skips_abbreviations()
+    test_chunks_arrive_in_order_before_generation_finishes()
+    test_disconnect_stops_generation_and_cancels_tts()
+    test_run_on_pieces_are_not_spoken_as_questions()
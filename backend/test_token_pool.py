@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test the ephemeral token pool: demand-driven refill, expiry pruning and the
+synchronous fallback when the pool is empty
+Uses a stub mint function, no network. Runs standalone or under pytest.
+"""
+
+import asyncio
+import time
+
+from token_pool import EphemeralTokenPool, EPHEMERAL_POOL_REFRESH_MARGIN
+
+
+class _Minter:
+    def __init__(self, ttl=60.0, fail=False):
+        self.ttl = ttl
+        self.fail = fail
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("upstream unavailable")
+        return {"session_token": f"tok-{self.calls}", "session_id": f"sess-{self.calls}",
+                "expires_at": time.time() + self.ttl}
+
+
+async def _wait_for_ready(pool, count, timeout=2.0):
+    for _ in range(int(timeout / 0.02)):
+        if pool.stats()["ready"] >= count:
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"pool never reached {count} ready tokens: {pool.stats()}")
+
+
+def test_idle_pool_stays_empty_and_refills_after_demand():
+    async def run():
+        mint = _Minter()
+        pool = EphemeralTokenPool(mint, min_size=1, max_size=5)
+        await pool.start()
+        try:
+            # No traffic yet: nothing is minted, even with min_size=1
+            await asyncio.sleep(0.1)
+            assert mint.calls == 0 and pool.target_size() == 0
+
+            first = await pool.acquire()
+            assert first["session_token"] == "tok-1" and pool.stats()["misses"] == 1
+            await _wait_for_ready(pool, 1)
+
+            second = await pool.acquire()
+            assert second["session_token"] == "tok-2" and pool.stats()["hits"] == 1
+        finally:
+            await pool.stop()
+
+    asyncio.run(run())
+    print("✅ an idle pool mints nothing; demand refills it")
+
+
+def test_tokens_near_expiry_are_pruned():
+    async def run():
+        mint = _Minter()
+        pool = EphemeralTokenPool(mint, min_size=0, max_size=5)
+        now = time.time()
+        pool._tokens.extend([
+            {"session_token": "stale", "expires_at": now + EPHEMERAL_POOL_REFRESH_MARGIN - 1},
+            {"session_token": "fresh", "expires_at": now + EPHEMERAL_POOL_REFRESH_MARGIN + 30},
+        ])
+        token = await pool.acquire()
+        assert token["session_token"] == "fresh"
+        assert pool.stats()["expired"] == 1 and pool.stats()["ready"] == 0
+
+        # Everything left is inside the margin: mint on the request path instead
+        pool._tokens.append({"session_token": "stale", "expires_at": time.time() + 1})
+        token = await pool.acquire()
+        assert token["session_token"] == "tok-1" and pool.stats()["expired"] == 2
+
+    asyncio.run(run())
+    print("✅ tokens within the refresh margin are never handed out")
+
+
+def test_empty_pool_falls_back_to_minting():
+    async def run():
+        mint = _Minter()
+        disabled = EphemeralTokenPool(mint, min_size=1, max_size=0)
+        await disabled.start()
+        tokens = [await disabled.acquire() for _ in range(3)]
+        assert [t["session_token"] for t in tokens] == ["tok-1", "tok-2", "tok-3"]
+        assert disabled.stats()["misses"] == 3 and disabled.stats()["target"] == 0
+
+        failing = EphemeralTokenPool(_Minter(fail=True), max_size=0)
+        try:
+            await failing.acquire()
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("expected the mint error on the request path")
+
+    asyncio.run(run())
+    print("✅ an empty or disabled pool mints synchronously and surfaces mint errors")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("[TEST] EPHEMERAL TOKEN POOL")
+    print("=" * 60)
+    test_idle_pool_stays_empty_and_refills_after_demand()
+    test_tokens_near_expiry_are_pruned()
+    test_empty_pool_falls_back_to_minting()
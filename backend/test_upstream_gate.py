@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Test upstream connect retries, the circuit breaker and ordered admission
+Uses a scripted connect function, no network. Runs standalone or under pytest.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from upstream_gate import UpstreamGate, UpstreamUnavailable, CLOSED, OPEN, is_retryable
+
+
+class _FlakyUpstream:
+    """connect() fails while `down` is set and returns a fake socket otherwise"""
+
+    def __init__(self, down=False):
+        self.down = down
+        self.attempts = 0
+
+    async def connect(self):
+        self.attempts += 1
+        await asyncio.sleep(0)
+        if self.down:
+            raise ConnectionRefusedError("upstream down")
+        return _FakeSocket()
+
+
+class _FakeSocket:
+    async def close(self):
+        pass
+
+
+def test_retries_transient_failures():
+    async def run():
+        upstream = _FlakyUpstream(down=True)
+        gate = UpstreamGate(upstream.connect, backoff_base=0.001, attempts=3, failure_threshold=10)
+
+        async def recover():
+            await asyncio.sleep(0.0005)
+            upstream.down = False
+
+        asyncio.create_task(recover())
+        ws = await gate.connect()
+        assert isinstance(ws, _FakeSocket)
+        assert gate.state == CLOSED and gate.stats()["consecutive_failures"] == 0
+        await gate.stop()
+
+    asyncio.run(run())
+    print("✅ transient failures are retried")
+
+
+def test_circuit_opens_and_fast_fails():
+    async def run():
+        upstream = _FlakyUpstream(down=True)
+        gate = UpstreamGate(upstream.connect, backoff_base=0.001, attempts=2, failure_threshold=3, open_seconds=60,
+                            wait_timeout=0.1)
+        for _ in range(2):
+            try:
+                await gate.connect()
+            except (ConnectionRefusedError, UpstreamUnavailable):
+                pass
+        assert gate.state == OPEN
+
+        # No upstream attempts while open: pool refills are refused, candidates time out in line
+        attempts, timed_out = upstream.attempts, gate.stats()["timed_out"]
+        try:
+            await gate.connect(wait=False)
+            raise AssertionError("expected UpstreamUnavailable")
+        except UpstreamUnavailable:
+            pass
+        try:
+            await gate.connect()
+            raise AssertionError("expected UpstreamUnavailable")
+        except UpstreamUnavailable:
+            pass
+        assert upstream.attempts == attempts
+        assert gate.stats()["timed_out"] == timed_out + 1 and gate.waiting() == 0
+        await gate.stop()
+
+    asyncio.run(run())
+    print("✅ open circuit fast-fails")
+
+
+def test_waiting_candidates_admitted_in_order():
+    async def run():
+        upstream = _FlakyUpstream(down=True)
+        gate = UpstreamGate(upstream.connect, backoff_base=0.001, attempts=1, failure_threshold=1, open_seconds=0.05,
+                            wait_timeout=5, admit_concurrency=1)
+        try:
+            await gate.connect()
+        except UpstreamUnavailable:
+            pass
+        assert gate.state == OPEN
+
+        admitted = []
+
+        async def candidate(n):
+            await gate.connect()
+            admitted.append(n)
+
+        tasks = []
+        for n in range(5):
+            tasks.append(asyncio.create_task(candidate(n)))
+            await asyncio.sleep(0.001)
+        assert gate.waiting() == 5
+
+        upstream.down = False
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=5)
+        assert admitted == [0, 1, 2, 3, 4], admitted
+        assert gate.state == CLOSED and gate.stats()["admitted"] == 5
+        await gate.stop()
+
+    asyncio.run(run())
+    print("✅ waiting candidates admitted in arrival order after recovery")
+
+
+def test_background_connect_drops_out_when_the_circuit_opens():
+    async def run():
+        upstream = _FlakyUpstream(down=True)
+        gate = UpstreamGate(upstream.connect, backoff_base=0.001, attempts=2, failure_threshold=1,
+                            open_seconds=10)
+        try:
+            await gate.connect(wait=False)
+        except UpstreamUnavailable:
+            pass
+        else:
+            raise AssertionError("expected UpstreamUnavailable")
+        # A pool refill never takes a place in line ahead of candidates
+        assert gate.state == OPEN and gate.waiting() == 0 and gate.stats()["queued"] == 0
+        await gate.stop()
+
+    asyncio.run(run())
+    print("✅ a wait=False connect gives up when the circuit opens instead of requeuing")
+
+
+def test_retryable_handshake_statuses():
+    class InvalidStatus(Exception):  # websockets >= 14
+        def __init__(self, status):
+            self.response = SimpleNamespace(status_code=status)
+
+    class InvalidStatusCode(Exception):  # legacy websockets client
+        def __init__(self, status):
+            self.status_code = status
+
+    for error_type in (InvalidStatus, InvalidStatusCode):
+        assert not is_retryable(error_type(401)) and not is_retryable(error_type(403))
+        assert is_retryable(error_type(429)) and is_retryable(error_type(503))
+    assert is_retryable(ConnectionRefusedError("upstream down"))
+    print("✅ 401/403 fail fast, 429/5xx and network errors retry, old and new websockets errors")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("[TEST] UPSTREAM RETRY / CIRCUIT BREAKER")
+    print("=" * 60)
+    test_retries_transient_failures()
+    test_circuit_opens_and_fast_fails()
+    test_waiting_candidates_admitted_in_order()
+    test_background_connect_drops_out_when_the_circuit_opens()
+    test_retryable_handshake_statuses()
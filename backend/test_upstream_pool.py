@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test the upstream pre-connect pool against the local fake realtime server
+Runs standalone (python test_upstream_pool.py) or under pytest
+"""
+
+import asyncio
+import json
+
+import websockets
+
+from fake_realtime_server import start_server
+from upstream_pool import UpstreamPool
+
+
+async def _with_pool(check, fills=None, **pool_kwargs):
+    server = await start_server(port=0)
+    port = server.sockets[0].getsockname()[1]
+
+    async def connect():
+        return await websockets.connect(f"ws://127.0.0.1:{port}/v1/realtime",
+                                        subprotocols=["realtime"])
+
+    async def fill_connect():
+        fills.append(1)
+        return await connect()
+
+    pool = UpstreamPool(connect, fill_connect=fill_connect if fills is not None else None, **pool_kwargs)
+    await pool.start()
+    try:
+        await check(pool)
+    finally:
+        await pool.stop()
+        server.close()
+        await server.wait_closed()
+
+
+async def _wait_for_idle(pool, count, timeout=2.0):
+    for _ in range(int(timeout / 0.02)):
+        if pool.stats()["idle"] >= count:
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"pool never reached {count} idle sockets: {pool.stats()}")
+
+
+def test_lease_warm_socket_replays_greeting():
+    async def check(pool):
+        await _wait_for_idle(pool, 2)
+        ws, greeting = await pool.lease()
+        assert json.loads(greeting)["type"] == "session.created"
+
+        # The leased session is unconfigured and fully usable
+        await ws.send(json.dumps({"type": "session.update", "session": {"instructions": "hi"}}))
+        updated = json.loads(await ws.recv())
+        assert updated["type"] == "session.updated"
+        assert updated["session"]["instructions"] == "hi"
+        await ws.close()
+
+        assert pool.stats()["leased_warm"] == 1
+        # The pool refills behind the lease
+        await _wait_for_idle(pool, 2)
+
+    fills = []
+    asyncio.run(_with_pool(check, fills=fills, size=2))
+    # Background refills go through fill_connect (the non-queuing connect in main.py)
+    assert len(fills) >= 3
+    print("✅ warm lease replays session.created")
+
+
+def test_lease_falls_back_to_cold_connect():
+    async def check(pool):
+        ws, greeting = await pool.lease()
+        assert json.loads(greeting)["type"] == "session.created"
+        await ws.close()
+        assert pool.stats()["leased_cold"] == 1
+
+    asyncio.run(_with_pool(check, size=0))
+    print("✅ empty pool connects on demand")
+
+
+def test_idle_sockets_expire():
+    async def check(pool):
+        await _wait_for_idle(pool, 1)
+        await asyncio.sleep(0.3)
+        ws, _ = await pool.lease()
+        await ws.close()
+        assert pool.stats()["expired"] >= 1
+
+    asyncio.run(_with_pool(check, size=1, max_idle=0.2, ping_interval=0.05))
+    print("✅ idle sockets expire")
+
+
+def test_stop_returns_after_a_wakeup():
+    async def check(pool):
+        await _wait_for_idle(pool, 1)
+        await asyncio.sleep(0.05)  # loop is parked in its wakeup wait
+        pool._wakeup.set()  # what lease() does, immediately followed by stop()
+        stopping = asyncio.create_task(pool.stop())
+        done, _ = await asyncio.wait({stopping}, timeout=1.0)
+        assert stopping in done and pool._task is None
+
+    asyncio.run(_with_pool(check, size=1))
+    print("✅ stop() returns even when it races a wakeup")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("[TEST] UPSTREAM PRE-CONNECT POOL")
+    print("=" * 60)
+    test_lease_warm_socket_replays_greeting()
+    test_lease_falls_back_to_cold_connect()
+    test_idle_sockets_expire()
+    test_stop_returns_after_a_wakeup()
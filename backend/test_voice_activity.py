@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test server-side VAD: endpointing, hangover, silence trimming, noise rejection
+Uses synthetic PCM16 (harmonic "voice" over a noise floor). Runs standalone or under pytest.
+"""
+
+import io
+import wave
+
+import numpy as np
+
+from voice_activity import VoiceActivityDetector, pcm_to_wav
+
+RATE = 16000
+CHUNK_BYTES = 2048  # 1024 samples, what the browser sends per audio_chunk
+
+
+def _noise(seconds, db=-60, seed=1):
+    return np.random.default_rng(seed).normal(0, 10 ** (db / 20) * 32768, int(seconds * RATE))
+
+
+def _voice(seconds, db=-20):
+    t = np.arange(int(seconds * RATE)) / RATE
+    harmonics = sum(np.sin(2 * np.pi * f * t) / k for k, f in enumerate((150, 300, 450, 600), 1))
+    envelope = 0.6 + 0.4 * np.sin(2 * np.pi * 4 * t)
+    signal = harmonics * envelope / np.abs(harmonics).max()
+    return signal * 10 ** (db / 20) * 32768 + _noise(seconds, seed=2)
+
+
+def _pcm(*parts):
+    return np.clip(np.concatenate(parts), -32768, 32767).astype("<i2").tobytes()
+
+
+def _run(vad, pcm):
+    """Feed chunk by chunk; (seconds into the stream, utterance seconds) per endpoint"""
+    found = []
+    for offset in range(0, len(pcm), CHUNK_BYTES):
+        utterance = vad.feed(pcm[offset:offset + CHUNK_BYTES])
+        if utterance:
+            found.append(((offset + CHUNK_BYTES) / 2 / RATE, vad.duration(utterance)))
+    return found
+
+
+def test_endpoints_after_hangover_and_trims_silence():
+    # 1s silence, 1.5s speech, 0.3s pause, 1s speech, 2s silence
+    pcm = _pcm(_noise(1), _voice(1.5), _noise(0.3), _voice(1), _noise(2))
+    vad = VoiceActivityDetector(sample_rate=RATE, hangover_ms=700, pad_ms=150)
+    found = _run(vad, pcm)
+    assert len(found) == 1, found
+    endpoint, duration = found[0]
+    # The short pause stays inside the utterance; leading/trailing silence is trimmed to the padding
+    assert abs(duration - (1.5 + 0.3 + 1 + 0.3)) < 0.15
+    assert 3.8 + 0.7 <= endpoint < 3.8 + 0.7 + 0.2
+    assert vad.stats.trimmed_seconds > 0.5
+    print(f"✅ endpoint at {endpoint:.2f}s, utterance {duration:.2f}s (silence trimmed)")
+
+
+def test_hangover_is_tunable():
+    pcm = _pcm(_noise(1), _voice(1.5), _noise(0.3), _voice(1), _noise(2))
+    found = _run(VoiceActivityDetector(sample_rate=RATE, hangover_ms=200), pcm)
+    assert len(found) == 2, found
+    print("✅ a shorter hangover splits the utterance at the pause")
+
+
+def test_noise_blips_and_hiss_are_ignored():
+    hiss = _noise(1.0, db=-42, seed=3)  # loud enough, but white-noise zero-crossing rate
+    pcm = _pcm(_noise(1), _voice(0.1), _noise(1), hiss, _noise(1.5))
+    vad = VoiceActivityDetector(sample_rate=RATE)
+    assert _run(vad, pcm) == []
+    assert vad.flush() is None
+    assert vad.stats.utterances == 0
+    print("✅ short blips and hiss never reach Whisper")
+
+
+def test_flush_returns_speech_in_progress():
+    vad = VoiceActivityDetector(sample_rate=RATE, hangover_ms=700)
+    assert _run(vad, _pcm(_noise(0.5), _voice(1), _noise(0.2))) == []
+    assert vad.in_speech
+    utterance = vad.flush()
+    assert utterance and abs(vad.duration(utterance) - 1.3) < 0.15
+    assert not vad.in_speech
+
+    with wave.open(io.BytesIO(pcm_to_wav(utterance, RATE))) as wav:
+        assert wav.getframerate() == RATE and wav.getnchannels() == 1
+        assert wav.getnframes() == len(utterance) // 2
+    print("✅ flush ends the utterance early and it wraps as WAV")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("[TEST] SERVER-SIDE VAD")
+    print("=" * 60)
+    test_endpoints_after_hangover_and_trims_silence()
+    test_hangover_is_tunable()
+    test_noise_blips_and_hiss_are_ignored()
+    test_flush_returns_speech_in_progress()
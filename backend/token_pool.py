@@ -0,0 +1,155 @@
+"""
+Warm pool of pre-minted OpenAI Realtime ephemeral session tokens
+Hands out a ready token instantly instead of waiting on /v1/realtime/sessions
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Floor kept warm while there is recent demand; an idle pool always drains to empty
+EPHEMERAL_POOL_MIN = int(os.getenv("EPHEMERAL_POOL_MIN", "0"))
+EPHEMERAL_POOL_MAX = int(os.getenv("EPHEMERAL_POOL_MAX", "10"))
+# Tokens this close to expires_at are discarded and replaced
+EPHEMERAL_POOL_REFRESH_MARGIN = float(os.getenv("EPHEMERAL_POOL_REFRESH_MARGIN", "20"))
+# Keep enough tokens to cover this many seconds of demand at the recent rate
+EPHEMERAL_POOL_HORIZON = float(os.getenv("EPHEMERAL_POOL_HORIZON", "15"))
+EPHEMERAL_POOL_RATE_WINDOW = float(os.getenv("EPHEMERAL_POOL_RATE_WINDOW", "120"))
+EPHEMERAL_POOL_TICK = float(os.getenv("EPHEMERAL_POOL_TICK", "2"))
+
+# Used when OpenAI does not return expires_at (ephemeral tokens live ~60s)
+DEFAULT_TOKEN_TTL = 60.0
+
+
+class EphemeralTokenPool:
+    """
+    Keeps a few ephemeral sessions pre-minted in the background.
+
+    `mint` must return a dict with session_token, session_id and
+    expires_at (unix seconds). The pool size follows the recent request
+    rate between min_size and max_size, and is zero when nothing was
+    requested in the rate window (tokens expire in about a minute, so an
+    idle warm pool would mint and discard one every TTL). max_size=0
+    disables pre-minting and acquire() always mints synchronously.
+    """
+
+    def __init__(self, mint: Callable[[], Awaitable[Dict[str, Any]]],
+                 min_size: int = EPHEMERAL_POOL_MIN, max_size: int = EPHEMERAL_POOL_MAX):
+        self.mint = mint
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self._tokens: Deque[Dict[str, Any]] = deque()
+        self._requests: Deque[float] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        self._minting = 0
+        self._stats = {"hits": 0, "misses": 0, "minted": 0, "expired": 0, "mint_errors": 0}
+
+    async def start(self):
+        """Start the background refill loop"""
+        if self.max_size <= 0 or self._task:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._refill_loop())
+        logger.info(f"✅ Ephemeral token pool started (min={self.min_size}, max={self.max_size})")
+
+    async def stop(self):
+        """Stop refilling and drop any unused tokens"""
+        # wait_for() can swallow a cancel that races a wakeup: the flag ends the loop anyway
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._tokens.clear()
+
+    async def acquire(self) -> Dict[str, Any]:
+        """Return a fresh token, from the pool if possible"""
+        now = time.time()
+        self._requests.append(now)
+        self._discard_stale(now)
+        self._wakeup.set()
+
+        # _discard_stale left only tokens with more than the refresh margin to live
+        if self._tokens:
+            self._stats["hits"] += 1
+            return self._tokens.popleft()
+
+        # Pool is empty (cold start or burst): mint on the request path
+        self._stats["misses"] += 1
+        token = await self.mint()
+        self._stats["minted"] += 1
+        return token
+
+    def target_size(self) -> int:
+        """Pool size needed to cover the horizon at the recent request rate"""
+        now = time.time()
+        while self._requests and now - self._requests[0] > EPHEMERAL_POOL_RATE_WINDOW:
+            self._requests.popleft()
+        if not self._requests:
+            return 0
+        rate = len(self._requests) / EPHEMERAL_POOL_RATE_WINDOW
+        wanted = math.ceil(rate * EPHEMERAL_POOL_HORIZON)
+        return max(self.min_size, min(self.max_size, wanted))
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool counters for monitoring"""
+        return {
+            **self._stats,
+            "ready": len(self._tokens),
+            "target": self.target_size() if self.max_size > 0 else 0,
+        }
+
+    def _discard_stale(self, now: float):
+        fresh = deque(t for t in self._tokens if t["expires_at"] - now > EPHEMERAL_POOL_REFRESH_MARGIN)
+        self._stats["expired"] += len(self._tokens) - len(fresh)
+        self._tokens = fresh
+
+    async def _mint_one(self) -> bool:
+        try:
+            token = await self.mint()
+            self._stats["minted"] += 1
+            if len(self._tokens) < self.max_size:
+                self._tokens.append(token)
+            return True
+        except Exception as e:
+            self._stats["mint_errors"] += 1
+            logger.warning(f"⚠️ Ephemeral token pre-mint failed: {e}")
+            return False
+        finally:
+            self._minting -= 1
+
+    async def _refill_loop(self):
+        while self._running:
+            self._discard_stale(time.time())
+            missing = self.target_size() - len(self._tokens) - self._minting
+            if missing > 0:
+                self._minting += missing
+                results = await asyncio.gather(*(self._mint_one() for _ in range(missing)))
+                if not any(results):
+                    # Upstream is failing; don't hammer it every tick
+                    await asyncio.sleep(EPHEMERAL_POOL_TICK * 5)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=EPHEMERAL_POOL_TICK)
+            except asyncio.TimeoutError:
+                pass
+
+
+def token_expiry(session: Dict[str, Any]) -> float:
+    """expires_at from a /v1/realtime/sessions response, or a conservative default"""
+    client_secret = session.get("client_secret")
+    if isinstance(client_secret, dict) and client_secret.get("expires_at"):
+        return float(client_secret["expires_at"])
+    return time.time() + DEFAULT_TOKEN_TTL
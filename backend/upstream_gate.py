@@ -0,0 +1,254 @@
+"""
+Retry, circuit breaker and ordered admission for upstream realtime connects
+During an OpenAI brownout, connects are retried with jittered backoff; once
+failures pile up the circuit opens so candidates stop hammering upstream and
+wait in line instead. A background probe closes the circuit again and the
+waiting candidates are admitted in arrival order, a few at a time.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_CONNECT_ATTEMPTS = int(os.getenv("UPSTREAM_CONNECT_ATTEMPTS", "3"))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.25"))
+UPSTREAM_BACKOFF_CAP = float(os.getenv("UPSTREAM_BACKOFF_CAP", "4"))
+# Consecutive failed attempts that open the circuit
+UPSTREAM_BREAKER_THRESHOLD = int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", "5"))
+# First open period; doubles after each failed probe up to the max
+UPSTREAM_BREAKER_OPEN_SECONDS = float(os.getenv("UPSTREAM_BREAKER_OPEN_SECONDS", "5"))
+UPSTREAM_BREAKER_MAX_OPEN_SECONDS = float(os.getenv("UPSTREAM_BREAKER_MAX_OPEN_SECONDS", "60"))
+# Candidates allowed to wait for recovery, and for how long
+UPSTREAM_WAITING_MAX = int(os.getenv("UPSTREAM_WAITING_MAX", "200"))
+UPSTREAM_WAITING_TIMEOUT = float(os.getenv("UPSTREAM_WAITING_TIMEOUT", "30"))
+# Waiting candidates connecting at once after recovery
+UPSTREAM_ADMIT_CONCURRENCY = int(os.getenv("UPSTREAM_ADMIT_CONCURRENCY", "4"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class UpstreamUnavailable(Exception):
+    """Upstream is down and the candidate could not (or may not) wait for it"""
+
+
+class _CircuitOpened(Exception):
+    pass
+
+
+def backoff_delay(attempt: int, base: float = UPSTREAM_BACKOFF_BASE, cap: float = UPSTREAM_BACKOFF_CAP) -> float:
+    """Full-jitter exponential backoff before retry number `attempt` (1-based)"""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def is_retryable(error: Exception) -> bool:
+    """Handshake rejections like 401/403 won't heal by retrying; 408/429/5xx and network errors might"""
+    # websockets >= 14 raises InvalidStatus (error.response.status_code); the
+    # legacy client raises InvalidStatusCode (error.status_code)
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is None:
+        status = getattr(error, "status_code", None)
+    return status is None or status >= 500 or status in (408, 429)
+
+
+class UpstreamGate:
+    """
+    Wraps a connect coroutine factory. connect() connects directly while
+    the circuit is closed and nobody is waiting; otherwise the caller
+    joins a FIFO waiting room and connects when admitted.
+    """
+
+    def __init__(self, connect: Callable[[], Awaitable[Any]],
+                 attempts: int = UPSTREAM_CONNECT_ATTEMPTS,
+                 backoff_base: float = UPSTREAM_BACKOFF_BASE,
+                 backoff_cap: float = UPSTREAM_BACKOFF_CAP,
+                 failure_threshold: int = UPSTREAM_BREAKER_THRESHOLD,
+                 open_seconds: float = UPSTREAM_BREAKER_OPEN_SECONDS,
+                 max_open_seconds: float = UPSTREAM_BREAKER_MAX_OPEN_SECONDS,
+                 max_waiting: int = UPSTREAM_WAITING_MAX,
+                 wait_timeout: float = UPSTREAM_WAITING_TIMEOUT,
+                 admit_concurrency: int = UPSTREAM_ADMIT_CONCURRENCY):
+        self._connect = connect
+        self.attempts = max(1, attempts)
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.state = CLOSED
+        self._failures = 0
+        self._open_for = open_seconds
+        self._opened_at: Optional[float] = None
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._slots = asyncio.Semaphore(admit_concurrency)
+        self._wakeup = asyncio.Event()
+        self._admit_task: Optional[asyncio.Task] = None
+        self._probe_task: Optional[asyncio.Task] = None
+        self._stats = {"connects": 0, "retries": 0, "failures": 0, "opened": 0, "probes": 0,
+                       "queued": 0, "admitted": 0, "rejected": 0, "timed_out": 0}
+
+    def available(self) -> bool:
+        """True when a connect would go straight upstream"""
+        return self.state == CLOSED and not self._waiters
+
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def connect(self, wait: bool = True):
+        """
+        Connect upstream, retrying transient failures. Raises
+        UpstreamUnavailable if the circuit is open and wait is False, the
+        waiting room is full, or recovery takes longer than wait_timeout.
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        front = False
+        while True:
+            queued = not self.available()
+            if queued:
+                if not wait:
+                    self._stats["rejected"] += 1
+                    raise UpstreamUnavailable(f"upstream circuit {self.state}")
+                await self._wait_turn(deadline, front)
+            try:
+                return await self._connect_with_retry()
+            except _CircuitOpened:
+                # The circuit opened under us: keep our place at the head of the line
+                front = True
+            finally:
+                if queued:
+                    self._slots.release()
+
+    async def stop(self):
+        for task in (self._admit_task, self._probe_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._admit_task = self._probe_task = None
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_exception(UpstreamUnavailable("shutting down"))
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "state": self.state, "circuit_open": int(self.state != CLOSED),
+                "consecutive_failures": self._failures,
+                "waiting": len(self._waiters),
+                "open_for": self._open_for if self.state != CLOSED else 0.0}
+
+    async def _wait_turn(self, deadline: float, front: bool):
+        """Wait in line until admitted; on return the caller holds an admission slot"""
+        if len(self._waiters) >= self.max_waiting:
+            self._stats["rejected"] += 1
+            raise UpstreamUnavailable("upstream unavailable and the waiting room is full")
+        future = asyncio.get_running_loop().create_future()
+        if front:
+            self._waiters.appendleft(future)
+        else:
+            self._waiters.append(future)
+        self._stats["queued"] += 1
+        self._ensure_admitter()
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(future, timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self._stats["timed_out"] += 1
+            raise UpstreamUnavailable(f"upstream did not recover within {self.wait_timeout:.0f}s")
+        except BaseException:
+            # Admitted at the same moment we were cancelled: hand the slot back
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self._slots.release()
+            raise
+        finally:
+            if future in self._waiters:
+                self._waiters.remove(future)
+
+    async def _connect_with_retry(self):
+        for attempt in range(1, self.attempts + 1):
+            if self.state != CLOSED:
+                raise _CircuitOpened()
+            self._stats["connects"] += 1
+            try:
+                ws = await self._connect()
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self._record_failure(e)
+                if self.state != CLOSED:
+                    raise _CircuitOpened()
+                if attempt == self.attempts:
+                    raise
+                self._stats["retries"] += 1
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+                logger.warning(f"⚠️ Upstream connect failed ({e}), retry {attempt}/{self.attempts - 1} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+            else:
+                self._failures = 0
+                return ws
+
+    def _record_failure(self, error: Exception):
+        self._stats["failures"] += 1
+        self._failures += 1
+        if self.state == CLOSED and self._failures >= self.failure_threshold:
+            self._open(error)
+
+    def _open(self, error: Exception):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._stats["opened"] += 1
+        logger.error(f"🔌 Upstream circuit OPEN after {self._failures} failures ({error}); "
+                     f"probing again in {self._open_for:.1f}s")
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.create_task(self._probe_loop())
+
+    async def _probe_loop(self):
+        while self.state != CLOSED:
+            await asyncio.sleep(self._open_for * random.uniform(0.8, 1.2))
+            self.state = HALF_OPEN
+            self._stats["probes"] += 1
+            try:
+                ws = await self._connect()
+            except Exception as e:
+                self._open_for = min(self._open_for * 2, self.max_open_seconds)
+                self.state = OPEN
+                logger.warning(f"⚠️ Upstream probe failed ({e}), circuit stays open for {self._open_for:.1f}s")
+                continue
+            try:
+                await ws.close()
+            except Exception:
+                pass
+            self.state = CLOSED
+            self._failures = 0
+            self._open_for = self.open_seconds
+            logger.info(f"✅ Upstream recovered after {time.monotonic() - self._opened_at:.1f}s, "
+                        f"admitting {len(self._waiters)} waiting candidates")
+            self._wakeup.set()
+
+    def _ensure_admitter(self):
+        if self._admit_task is None or self._admit_task.done():
+            self._admit_task = asyncio.create_task(self._admit_loop())
+
+    async def _admit_loop(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._waiters and self.state == CLOSED:
+                await self._slots.acquire()
+                if self.state != CLOSED or not self._waiters:
+                    self._slots.release()
+                    break
+                future = self._waiters.popleft()
+                if future.done():
+                    self._slots.release()
+                    continue
+                self._stats["admitted"] += 1
+                future.set_result(None)
@@ -0,0 +1,184 @@
+"""
+Pre-connect pool for upstream OpenAI Realtime WebSockets
+Keeps a few sockets already through DNS+TLS+upgrade so a candidate
+joining /ws/realtime is relayed to OpenAI without waiting on the handshake.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from websockets.protocol import State
+
+logger = logging.getLogger(__name__)
+
+# 0 disables pre-connecting; every client then connects on demand
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", "0"))
+# Idle pooled sockets older than this are closed and replaced
+UPSTREAM_POOL_MAX_IDLE = float(os.getenv("UPSTREAM_POOL_MAX_IDLE", "120"))
+UPSTREAM_POOL_PING_INTERVAL = float(os.getenv("UPSTREAM_POOL_PING_INTERVAL", "15"))
+UPSTREAM_POOL_PING_TIMEOUT = float(os.getenv("UPSTREAM_POOL_PING_TIMEOUT", "5"))
+# How long to wait for the session.created greeting after connecting
+UPSTREAM_GREETING_TIMEOUT = float(os.getenv("UPSTREAM_GREETING_TIMEOUT", "10"))
+
+
+class PooledUpstream:
+    """An upstream socket plus the session.created frame it greeted us with"""
+
+    def __init__(self, ws, greeting: Optional[str]):
+        self.ws = ws
+        self.greeting = greeting
+        self.created_at = time.monotonic()
+        self.last_ping = self.created_at
+
+    def is_open(self) -> bool:
+        return self.ws.state is State.OPEN
+
+
+class UpstreamPool:
+    """
+    Pool of pre-established, not-yet-configured OpenAI Realtime sessions.
+
+    OpenAI sends session.created as soon as the socket opens, so the pool
+    reads and keeps that frame; lease() returns it alongside the socket and
+    the proxy replays it to the browser, which sees the usual handshake.
+    """
+
+    def __init__(self, connect: Callable[[], Awaitable[Any]], size: int = UPSTREAM_POOL_SIZE,
+                 max_idle: float = UPSTREAM_POOL_MAX_IDLE,
+                 ping_interval: float = UPSTREAM_POOL_PING_INTERVAL,
+                 can_fill: Callable[[], bool] = lambda: True,
+                 fill_connect: Optional[Callable[[], Awaitable[Any]]] = None):
+        self.connect = connect
+        # Checked before pre-connecting, so refills never compete with candidates;
+        # fill_connect (default: connect) must not queue for the upstream either
+        self.can_fill = can_fill
+        self.fill_connect = fill_connect or connect
+        self.size = size
+        self.max_idle = max_idle
+        self.ping_interval = ping_interval
+        self._idle: Deque[PooledUpstream] = deque()
+        self._connecting = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+        self._stats = {"leased_warm": 0, "leased_cold": 0, "opened": 0,
+                       "expired": 0, "unhealthy": 0, "connect_errors": 0}
+
+    async def start(self):
+        """Start keeping the pool filled"""
+        if self.size <= 0 or self._task:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._maintain_loop())
+        logger.info(f"✅ Upstream pre-connect pool started (size={self.size}, max_idle={self.max_idle}s)")
+
+    async def stop(self):
+        """Stop the maintenance loop and close idle sockets"""
+        # wait_for() can swallow a cancel that races a wakeup: the flag ends the loop anyway
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._idle:
+            await self._discard(self._idle.popleft())
+
+    async def lease(self) -> Tuple[Any, Optional[str]]:
+        """
+        Hand out an upstream socket and its buffered session.created frame.
+        Falls back to connecting on demand when no warm socket is available.
+        """
+        self._wakeup.set()
+        while self._idle:
+            pooled = self._idle.popleft()
+            if pooled.is_open() and time.monotonic() - pooled.created_at < self.max_idle:
+                self._stats["leased_warm"] += 1
+                return pooled.ws, pooled.greeting
+            self._stats["expired"] += 1
+            await self._discard(pooled)
+
+        self._stats["leased_cold"] += 1
+        return await self.open()
+
+    async def open(self, connect: Optional[Callable[[], Awaitable[Any]]] = None) -> Tuple[Any, Optional[str]]:
+        """Connect a fresh upstream socket and wait for its greeting"""
+        ws = await (connect or self.connect)()
+        self._stats["opened"] += 1
+        greeting = None
+        try:
+            greeting = await asyncio.wait_for(ws.recv(), timeout=UPSTREAM_GREETING_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Upstream sent no greeting before timeout")
+        except Exception:
+            await self._close(ws)
+            raise
+        return ws, greeting
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool counters for monitoring"""
+        return {**self._stats, "idle": len(self._idle), "size": self.size}
+
+    async def _fill_one(self):
+        try:
+            ws, greeting = await self.open(self.fill_connect)
+            self._idle.append(PooledUpstream(ws, greeting))
+        except Exception as e:
+            self._stats["connect_errors"] += 1
+            logger.warning(f"⚠️ Upstream pre-connect failed: {e}")
+        finally:
+            self._connecting -= 1
+
+    async def _ping(self, pooled: PooledUpstream) -> bool:
+        try:
+            pong_waiter = await pooled.ws.ping()
+            await asyncio.wait_for(pong_waiter, timeout=UPSTREAM_POOL_PING_TIMEOUT)
+            pooled.last_ping = time.monotonic()
+            return True
+        except Exception:
+            return False
+
+    async def _maintain_loop(self):
+        while self._running:
+            for pooled in list(self._idle):
+                # Skip sockets lease() handed out while we were awaiting
+                if pooled not in self._idle:
+                    continue
+                now = time.monotonic()
+                if not pooled.is_open():
+                    self._stats["unhealthy"] += 1
+                elif now - pooled.created_at >= self.max_idle:
+                    self._stats["expired"] += 1
+                elif now - pooled.last_ping >= self.ping_interval and not await self._ping(pooled):
+                    self._stats["unhealthy"] += 1
+                else:
+                    continue
+                if pooled in self._idle:
+                    self._idle.remove(pooled)
+                    await self._discard(pooled)
+
+            missing = self.size - len(self._idle) - self._connecting
+            if missing > 0 and self.can_fill():
+                self._connecting += missing
+                await asyncio.gather(*(self._fill_one() for _ in range(missing)))
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=min(self.ping_interval, 5.0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _discard(self, pooled: PooledUpstream):
+        await self._close(pooled.ws)
+
+    async def _close(self, ws):
+        try:
+            await ws.close()
+        except Exception:
+            pass
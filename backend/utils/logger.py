@@ -2,8 +2,13 @@
 Logging configuration
 """
 import logging
+import queue
 import sys
+import time
+from collections import defaultdict
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
 
 def setup_logger(name: str, level: str = "INFO") -> logging.Logger:
     """Setup logger with consistent formatting"""
@@ -29,4 +34,107 @@ def setup_logger(name: str, level: str = "INFO") -> logging.Logger:
     # Prevent propagation to root logger
     logger.propagate = False
     
-    return logger
\ No newline at end of file
+    return logger
+
+
+def start_queue_logging() -> QueueListener:
+    """
+    Move the root logger's handlers behind a QueueHandler so that log calls
+    made on the event loop only enqueue the record; a background thread
+    does the actual (blocking) writes. Call stop() on the returned listener
+    at shutdown to flush.
+    """
+    root = logging.getLogger()
+    handlers = [h for h in root.handlers if not isinstance(h, QueueHandler)]
+    log_queue = queue.SimpleQueue()
+
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def parse_sample_rates(spec: str) -> Dict[str, int]:
+    """Parse "type=N,type=N" into {type: N}; N=0 means count only, never log"""
+    rates = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        event_type, rate = item.split("=", 1)
+        try:
+            rates[event_type.strip()] = max(0, int(rate))
+        except ValueError:
+            continue
+    return rates
+
+
+class EventLogSampler:
+    """
+    Per-session event counters with sampled, rate-limited logging.
+
+    record() counts every frame and says whether this one deserves its own
+    log line: the first event of each type does, after that one in every N
+    per the type's sample rate (types at rate 0 are only counted), and never
+    more than max_lines_per_sec overall. flush() emits the counters as one
+    line.
+    """
+
+    def __init__(self, label: str, sample_rates: Optional[Dict[str, int]] = None,
+                 max_lines_per_sec: float = 20.0):
+        self.label = label
+        self.sample_rates = sample_rates or {}
+        self.max_lines_per_sec = max_lines_per_sec
+        self.counts: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.bytes: Dict[str, int] = defaultdict(int)
+        self.suppressed = 0
+        self.started_at = time.monotonic()
+        self._tokens = max_lines_per_sec
+        self._last_refill = self.started_at
+
+    def record(self, direction: str, event_type: str, size: int = 0) -> bool:
+        """Count one frame; return True if it should be logged individually"""
+        key = (direction, event_type)
+        self.counts[key] += 1
+        self.bytes[direction] += size
+        count = self.counts[key]
+
+        rate = self.sample_rates.get(event_type, 1)
+        if rate == 0 or (count > 1 and count % rate != 0):
+            return False
+
+        now = time.monotonic()
+        self._tokens = min(self.max_lines_per_sec,
+                           self._tokens + (now - self._last_refill) * self.max_lines_per_sec)
+        self._last_refill = now
+        if self._tokens < 1:
+            self.suppressed += 1
+            return False
+        self._tokens -= 1
+        return True
+
+    def summary(self) -> str:
+        """One-line summary of everything recorded so far"""
+        parts = []
+        for direction in sorted(self.bytes):
+            events = sorted(
+                ((t, n) for (d, t), n in self.counts.items() if d == direction),
+                key=lambda item: -item[1],
+            )
+            total = sum(n for _, n in events)
+            detail = " ".join(f"{t}={n}" for t, n in events)
+            parts.append(f"{direction}: {total} frames/{self.bytes[direction]} bytes [{detail}]")
+        elapsed = time.monotonic() - self.started_at
+        return (f"{self.label} summary after {elapsed:.1f}s - " + "; ".join(parts)
+                + f"; {self.suppressed} lines rate-limited")
+
+    def flush(self, logger: logging.Logger):
+        """Log the summary line and reset the counters"""
+        if self.counts:
+            logger.info(self.summary())
+        self.counts.clear()
+        self.bytes.clear()
+        self.suppressed = 0
+        self.started_at = time.monotonic()
@@ -0,0 +1,209 @@
+"""
+Server-side voice activity detection for the audio_chunk WebSocket path
+PCM16 mono chunks are cut into short frames; per-frame energy (dBFS) and
+zero-crossing rate are computed for all new frames at once with NumPy. A
+frame is speech when it is louder than the tracked noise floor by a margin
+and not hiss-like (high zero-crossing rate) unless it is much louder. An
+utterance starts after VAD_START_MS of speech and ends after VAD_HANGOVER_MS
+of silence; it is returned trimmed to the speech plus VAD_PAD_MS each side.
+"""
+
+import io
+import logging
+import math
+import os
+import wave
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SERVER_VAD = os.getenv("SERVER_VAD", "true").lower() == "true"
+# PCM16 mono sample rate of audio_chunk data
+AUDIO_SAMPLE_RATE = int(os.getenv("AUDIO_SAMPLE_RATE", "16000"))
+VAD_FRAME_MS = int(os.getenv("VAD_FRAME_MS", "30"))
+# Speech needed to open an utterance, and silence needed to close it
+VAD_START_MS = int(os.getenv("VAD_START_MS", "90"))
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "700"))
+# Audio kept before and after the speech when trimming
+VAD_PAD_MS = int(os.getenv("VAD_PAD_MS", "150"))
+# Utterances with less speech than this are dropped as noise
+VAD_MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", "250"))
+# Utterances are cut here even if the candidate keeps talking
+VAD_MAX_UTTERANCE_S = float(os.getenv("VAD_MAX_UTTERANCE_S", "30"))
+# Speech must be this far above the noise floor, and never below VAD_MIN_DBFS
+VAD_MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "10"))
+VAD_MIN_DBFS = float(os.getenv("VAD_MIN_DBFS", "-50"))
+# Zero-crossing rate above which quiet frames count as hiss, not voice
+VAD_ZCR_MAX = float(os.getenv("VAD_ZCR_MAX", "0.35"))
+# Hiss-like frames still count as speech this far above the threshold (fricatives)
+LOUD_DB = 12.0
+# How fast the noise floor may rise, in dB per second of audio
+NOISE_RISE_DB_PER_S = 3.0
+
+
+def frame_features(samples: np.ndarray, frame_samples: int):
+    """(energy dBFS, zero-crossing rate) per frame of an int16 array"""
+    frames = samples[:len(samples) // frame_samples * frame_samples].reshape(-1, frame_samples)
+    x = frames.astype(np.float32) / 32768.0
+    energy_db = 10.0 * np.log10(np.mean(x * x, axis=1) + 1e-10)
+    zcr = np.count_nonzero(np.diff(np.signbit(x), axis=1), axis=1) / frame_samples
+    return energy_db, zcr
+
+
+def pcm_to_wav(pcm: bytes, sample_rate: int = AUDIO_SAMPLE_RATE) -> bytes:
+    """Wrap PCM16 mono in a WAV container (what Whisper expects)"""
+    out = io.BytesIO()
+    with wave.open(out, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return out.getvalue()
+
+
+class VadStats:
+    """Totals across connections for /health"""
+
+    def __init__(self):
+        self.utterances = 0
+        self.discarded = 0
+        self.forced = 0
+        self.speech_seconds = 0.0
+        self.trimmed_seconds = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "utterances": self.utterances,
+            "discarded": self.discarded,
+            "forced": self.forced,
+            "speech_seconds": round(self.speech_seconds, 1),
+            "trimmed_seconds": round(self.trimmed_seconds, 1),
+        }
+
+
+class VoiceActivityDetector:
+    """
+    One per connection. feed() takes raw PCM16 chunks and returns an
+    utterance (trimmed PCM16) when the speaker stops; flush() ends the
+    current utterance early (e.g. the client says it stopped speaking).
+    """
+
+    def __init__(self, sample_rate: int = AUDIO_SAMPLE_RATE, frame_ms: int = VAD_FRAME_MS,
+                 start_ms: int = VAD_START_MS, hangover_ms: int = VAD_HANGOVER_MS, pad_ms: int = VAD_PAD_MS,
+                 min_speech_ms: int = VAD_MIN_SPEECH_MS, max_utterance_s: float = VAD_MAX_UTTERANCE_S,
+                 margin_db: float = VAD_MARGIN_DB, min_dbfs: float = VAD_MIN_DBFS,
+                 zcr_max: float = VAD_ZCR_MAX, stats: Optional[VadStats] = None):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.start_frames = max(1, math.ceil(start_ms / frame_ms))
+        self.hangover_frames = max(1, math.ceil(hangover_ms / frame_ms))
+        self.pad_frames = pad_ms // frame_ms
+        self.min_speech_frames = math.ceil(min_speech_ms / frame_ms)
+        self.max_frames = int(max_utterance_s * 1000 / frame_ms)
+        self.margin_db = margin_db
+        self.min_dbfs = min_dbfs
+        self.zcr_max = zcr_max
+        self.stats = stats or VadStats()
+        self.noise_db: Optional[float] = None
+        self._buffer = bytearray()
+        self._classified = 0
+        self._run = 0
+        self._speech_start: Optional[int] = None
+        self._last_speech = 0
+
+    @property
+    def in_speech(self) -> bool:
+        return self._speech_start is not None
+
+    def duration(self, pcm: bytes) -> float:
+        return len(pcm) / 2 / self.sample_rate
+
+    def threshold(self) -> float:
+        if self.noise_db is None:
+            return self.min_dbfs
+        return max(self.min_dbfs, self.noise_db + self.margin_db)
+
+    def classify(self, samples: np.ndarray) -> np.ndarray:
+        """Speech/non-speech per frame; also updates the noise floor"""
+        energy_db, zcr = frame_features(samples, self.frame_samples)
+        if not len(energy_db):
+            return np.zeros(0, dtype=bool)
+        threshold = self.threshold()
+        speech = (energy_db > threshold) & ((zcr < self.zcr_max) | (energy_db > threshold + LOUD_DB))
+        # Minimum tracking: drops to quiet frames at once, rises slowly through speech
+        quietest = float(energy_db.min())
+        if self.noise_db is None or quietest < self.noise_db:
+            self.noise_db = quietest
+        else:
+            seconds = len(energy_db) * self.frame_ms / 1000
+            self.noise_db = min(quietest, self.noise_db + NOISE_RISE_DB_PER_S * seconds)
+        return speech
+
+    def feed(self, pcm: bytes) -> Optional[bytes]:
+        """Add a chunk; returns an utterance once its hangover has elapsed"""
+        self._buffer.extend(pcm)
+        frame_bytes = self.frame_samples * 2
+        total_frames = len(self._buffer) // frame_bytes
+        if total_frames <= self._classified:
+            return None
+        # Copy out the unclassified frames: a view would pin the bytearray against resizing
+        new = np.frombuffer(bytes(self._buffer[self._classified * frame_bytes:total_frames * frame_bytes]),
+                            dtype="<i2")
+        speech = self.classify(new)
+
+        for i, is_speech in enumerate(speech.tolist(), start=self._classified):
+            self._classified = i + 1
+            if self._speech_start is None:
+                self._run = self._run + 1 if is_speech else 0
+                if self._run >= self.start_frames:
+                    self._speech_start = i - self._run + 1
+                    self._last_speech = i
+                continue
+            if is_speech:
+                self._last_speech = i
+            if i - self._last_speech >= self.hangover_frames:
+                return self._cut(i + 1)
+            if i + 1 - self._speech_start >= self.max_frames:
+                self.stats.forced += 1
+                return self._cut(i + 1)
+
+        if self._speech_start is None:
+            # Idle: keep only the pre-roll needed for padding
+            keep = self.pad_frames + self._run
+            drop = self._classified - keep
+            if drop > 0:
+                del self._buffer[:drop * frame_bytes]
+                self._classified -= drop
+        return None
+
+    def flush(self) -> Optional[bytes]:
+        """End the current utterance now; None if there was no speech"""
+        utterance = self._cut(self._classified) if self._speech_start is not None else None
+        self._buffer.clear()
+        self._classified = 0
+        self._run = 0
+        return utterance
+
+    def _cut(self, consumed: int) -> Optional[bytes]:
+        """Take the current utterance and drop the first `consumed` frames"""
+        frame_bytes = self.frame_samples * 2
+        start = max(0, self._speech_start - self.pad_frames)
+        end = min(self._classified, self._last_speech + 1 + self.pad_frames)
+        speech_frames = self._last_speech + 1 - self._speech_start
+        utterance = bytes(self._buffer[start * frame_bytes:end * frame_bytes])
+
+        del self._buffer[:consumed * frame_bytes]
+        self._classified -= consumed
+        self._speech_start = None
+        self._run = 0
+
+        if speech_frames < self.min_speech_frames:
+            self.stats.discarded += 1
+            return None
+        self.stats.utterances += 1
+        self.stats.speech_seconds += speech_frames * self.frame_ms / 1000
+        self.stats.trimmed_seconds += (consumed - (end - start)) * self.frame_ms / 1000
+        return utterance